@@ -0,0 +1,91 @@
+"""
+Compares the default and lean browser profiles page by page: load time, requests made and blocked, and bytes received.
+Each profile loads every URL in its own fresh Chrome session, after one untimed warm-up load, so that neither profile
+benefits from the other's cache. Needs Chrome.
+
+Usage: python3 benchmarks/browser_profiles.py URL [URL ...] [--repeat 3] [--visible] [--output browser_profiles.json]
+e.g. the Rightmove homepage, a search results URL and a property URL.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY)
+
+from driver_pool import BrowserProfile, create_chrome_driver, record_page_load  # noqa: E402
+
+
+def page_kind(url: str) -> str:
+    """
+    Names the kind of page a URL is, as the scraper labels its page loads.
+    """
+    if "/properties/" in url:
+        return "property"
+    if "find.html" in url:
+        return "search"
+    return "home"
+
+
+def measure(profile: BrowserProfile, urls: List[str], repeat: int) -> Dict[str, Dict]:
+    """
+    Loads every URL repeat times in one session.
+
+    Returns:
+    Dict[str, Dict]: For each URL, the median load time, and the requests made and blocked and bytes received on its
+                     last load.
+    """
+    driver = create_chrome_driver(profile)
+    try:
+        results = {}
+        for url in urls:
+            driver.get(url)
+            record_page_load(driver, page_kind(url), profile.name)
+            seconds = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                driver.get(url)
+                seconds.append(time.perf_counter() - start)
+                requests_made, blocked, received = record_page_load(driver, page_kind(url), profile.name)
+            results[url] = {
+                "seconds": statistics.median(seconds),
+                "requests": requests_made,
+                "blocked": blocked,
+                "kilobytes": received / 1024,
+            }
+        return results
+    finally:
+        driver.quit()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare page load times of the default and lean browser profiles.")
+    parser.add_argument("urls", nargs="+", help="Pages to load.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed loads of each page per profile.")
+    parser.add_argument("--visible", action="store_true", help="Show the browser windows.")
+    parser.add_argument("--output", help="Optionally write the results to this JSON file.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    profiles = [BrowserProfile(headless=not args.visible), BrowserProfile.lean(headless=not args.visible)]
+    results = {profile.name: measure(profile, args.urls, args.repeat) for profile in profiles}
+
+    print(f"{'page':10} {'default s':>10} {'lean s':>8} {'saved':>7} {'requests':>9} {'blocked':>8} {'KB':>14}")
+    for url in args.urls:
+        default, lean = results["default"][url], results["lean"][url]
+        saved = 1 - lean["seconds"] / default["seconds"] if default["seconds"] else 0.0
+        print(
+            f"{page_kind(url):10} {default['seconds']:10.2f} {lean['seconds']:8.2f} {saved:7.0%} "
+            f"{default['requests']:4d}/{lean['requests']:<4d} {lean['blocked']:8d} "
+            f"{default['kilobytes']:6.0f}/{lean['kilobytes']:<7.0f}"
+        )
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
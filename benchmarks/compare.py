@@ -0,0 +1,53 @@
+"""
+Compares two benchmark results files written by run.py and flags regressions.
+
+Usage: python3 benchmarks/compare.py baseline.json results.json [--threshold 1.2]
+"""
+
+import argparse
+import json
+import sys
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> int:
+    """
+    Prints the median time of every benchmark in both files and the ratio between them.
+
+    Returns:
+    int: The number of benchmarks slower than the baseline by more than the threshold ratio.
+    """
+    regressions = 0
+    print(f"{'benchmark':28} {'baseline ms':>12} {'current ms':>12} {'ratio':>7}")
+    for name, result in current["benchmarks"].items():
+        previous = baseline["benchmarks"].get(name)
+        if not previous or "skipped" in previous or "skipped" in result:
+            continue
+        ratio = result["median_seconds"] / previous["median_seconds"] if previous["median_seconds"] else float("inf")
+        flag = ""
+        if ratio > threshold:
+            regressions += 1
+            flag = "  REGRESSION"
+        print(
+            f"{name:28} {previous['median_seconds'] * 1000:12.2f} {result['median_seconds'] * 1000:12.2f} "
+            f"{ratio:7.2f}{flag}"
+        )
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare two benchmark results files.")
+    parser.add_argument("baseline", help="Results of the reference version.")
+    parser.add_argument("current", help="Results of the version under test.")
+    parser.add_argument(
+        "--threshold", type=float, default=1.2, help="Ratio of current to baseline time counted as a regression."
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+    sys.exit(1 if compare(baseline, current, args.threshold) else 0)
@@ -0,0 +1,353 @@
+"""
+Deterministic stand-ins for everything the pipeline normally fetches: search result pages, property pages with a
+window.PAGE_MODEL, floorplan images, an isoline, a postcode table and a geocoder. They mirror the shape of the live
+pages closely enough for the real parsing code to run on them, and are generated from a seed so that every run of the
+benchmarks sees the same data.
+"""
+
+import csv
+import io
+import json
+import random
+import re
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import shapely
+from shapely.geometry import Point, mapping
+
+RESULTS_PER_PAGE = 24
+MAX_RESULT_PAGES = 42
+
+# Commute target used by the isoline fixture, in Canary Wharf
+TARGET = {"location": "Canada Square, London, E14 5AB", "latitude": 51.5049, "longitude": -0.0195}
+
+# Postcode districts used for listing addresses, with a rough centre for each
+DISTRICTS = {
+    "E14": (51.5080, -0.0180),
+    "E1": (51.5170, -0.0600),
+    "E3": (51.5290, -0.0220),
+    "E16": (51.5090, 0.0230),
+    "SE10": (51.4800, -0.0050),
+    "SE16": (51.4950, -0.0500),
+    "N1": (51.5380, -0.0990),
+    "NW1": (51.5350, -0.1430),
+}
+
+STREETS = [
+    "Westferry Road", "Marsh Wall", "Commercial Road", "Roman Road", "Royal Victoria Dock", "Greenwich High Road",
+    "Jamaica Road", "Upper Street", "Camden Road", "New Providence Wharf, Fairmont Avenue", "Canning Town",
+    "Royal Wharf", "Bethnal Green Road", "High Street", "Stratosphere Tower", "Pennyfields",
+]
+
+# Letters used in the inward part of a postcode
+POSTCODE_LETTERS = "ABDEFGHJLNPQRSTUWXYZ"
+
+SUMMARIES = [
+    "A bright two bedroom apartment with a private balcony and concierge.",
+    "Spacious flat moments from the station, offered furnished.",
+    "Modern development with gym and residents' lounge.",
+    "Room in a house share, bills included.",
+    "Newly refurbished split-level flat with river views.",
+]
+
+FLOORPLAN_TEXTS = [
+    "Approx. Gross Internal Area {sq_ft} sq ft / {sq_m} sq m",
+    "Total floor area {sq_m} sq.m. ({sq_ft} sq.ft.) approx",
+    "GROSS INTERNAL AREA: {sq_ft} SQ FT ({sq_m} SQ M)",
+]
+
+
+def make_listings(count: int, seed: int = 1, floorplans: bool = True) -> List[Dict]:
+    """
+    Builds the listings served by the stand-in site.
+
+    Args:
+    count (int): Number of listings.
+    seed (int): Seed for the random generator.
+    floorplans (bool): Whether listings may have a floorplan.
+
+    Returns:
+    List[Dict]: One dict per listing, with the fields the fixtures below are built from.
+    """
+    rng = random.Random(seed)
+    # Coordinates come from their own generator, so adding them did not change the other fields
+    coordinates_rng = random.Random(seed + 1)
+    listings = []
+    districts = list(DISTRICTS)
+    for index in range(count):
+        district = rng.choice(districts)
+        sq_ft = rng.randint(450, 1400)
+        postcode = f"{district} {rng.randint(1, 9)}{rng.choice(POSTCODE_LETTERS)}{rng.choice(POSTCODE_LETTERS)}"
+        lat, lon = DISTRICTS[district]
+        listings.append(
+            {
+                "id": 100000000 + index,
+                "price": rng.randrange(1800, 3600, 25),
+                "bedrooms": rng.randint(1, 4),
+                "bathrooms": rng.choice([1, 1, 2, 2, 3]),
+                "address": f"{rng.choice(STREETS)}, London, {postcode}",
+                "district": district,
+                "summary": rng.choice(SUMMARIES),
+                "floorplans": int(floorplans and rng.random() < 0.7),
+                "sq_ft": sq_ft,
+                "floorplan_text": rng.choice(FLOORPLAN_TEXTS).format(sq_ft=sq_ft, sq_m=round(sq_ft / 10.7639, 1)),
+                "let_available_date": rng.choice(["Now", "01/03/2024", "15/01/2024", None]),
+                "latitude": round(lat + coordinates_rng.uniform(-0.01, 0.01), 6),
+                "longitude": round(lon + coordinates_rng.uniform(-0.015, 0.015), 6),
+            }
+        )
+    return listings
+
+
+def _card(listing: Dict) -> Dict:
+    """
+    Builds a search result card, as found in jsonModel["properties"].
+    """
+    return {
+        "id": listing["id"],
+        "bedrooms": listing["bedrooms"],
+        "bathrooms": listing["bathrooms"],
+        "numberOfFloorplans": listing["floorplans"],
+        "summary": listing["summary"],
+        "displayAddress": listing["address"],
+        "propertyUrl": f"/properties/{listing['id']}#/?channel=RES_LET",
+        "price": {
+            "amount": listing["price"],
+            "frequency": "monthly",
+            "displayPrices": [{"displayPrice": f"£{listing['price']:,} pcm", "displayPriceQualifier": ""}],
+        },
+        "propertySubType": "Flat",
+        "location": {"latitude": listing["latitude"], "longitude": listing["longitude"]},
+    }
+
+
+def _html(script: str, padding: int) -> str:
+    """
+    Wraps an inline script in a page, padded with markup to about the size of a live page.
+    """
+    filler = '<div class="propertyCard-filler">' + "x" * 200 + "</div>\n"
+    return (
+        "<!DOCTYPE html><html><head><title>Rightmove</title></head><body>\n"
+        + filler * (padding // len(filler))
+        + f"<script>{script}</script>\n</body></html>"
+    )
+
+
+def search_page_html(listings: List[Dict], index: int = 0, total: Optional[int] = None, padding: int = 150_000) -> str:
+    """
+    Builds a search results page with its window.jsonModel.
+
+    Args:
+    listings (List[Dict]): Every listing matching the search.
+    index (int): Offset of the first result on the page.
+    total (int): The result count to report. Defaults to the number of listings.
+    padding (int): Approximate size of the markup around the model, in bytes.
+
+    Returns:
+    str: The page HTML.
+    """
+    total = len(listings) if total is None else total
+    visible = listings[: RESULTS_PER_PAGE * MAX_RESULT_PAGES]
+    page = visible[index : index + RESULTS_PER_PAGE]
+    next_index = index + RESULTS_PER_PAGE
+    model = {
+        "properties": [_card(listing) for listing in page],
+        "resultCount": f"{total:,}",
+        "pagination": {
+            "total": -(-len(visible) // RESULTS_PER_PAGE),
+            "next": str(next_index) if next_index < len(visible) else None,
+        },
+    }
+    return _html(f"window.jsonModel = {json.dumps(model)}", padding)
+
+
+def property_page_html(listing: Dict, base_url: str, padding: int = 150_000) -> str:
+    """
+    Builds a property page with its window.PAGE_MODEL.
+
+    Args:
+    listing (Dict): The listing.
+    base_url (str): The stand-in site's URL, for the floorplan image URL.
+    padding (int): Approximate size of the markup around the model, in bytes.
+
+    Returns:
+    str: The page HTML.
+    """
+    page_model = {
+        "propertyData": {
+            "id": str(listing["id"]),
+            "address": {"displayAddress": listing["address"]},
+            "bathrooms": listing["bathrooms"],
+            "prices": {"primaryPrice": f"£{listing['price']:,} pcm"},
+            "location": {"latitude": listing["latitude"], "longitude": listing["longitude"]},
+            "lettings": {
+                "letAvailableDate": listing["let_available_date"],
+                "deposit": listing["price"] * 6 // 5,
+                "furnishType": "Furnished",
+                "letType": "Long term",
+            },
+            "floorplans": [{"url": f"{base_url}/floorplans/{listing['id']}.png", "caption": "Floorplan"}]
+            if listing["floorplans"]
+            else [],
+        }
+    }
+    return _html(f"window.PAGE_MODEL = {json.dumps(page_model)};", padding)
+
+
+def floorplan_png(text: str) -> bytes:
+    """
+    Draws a floorplan-like image with the given area text.
+
+    Returns:
+    bytes: PNG data.
+    """
+    from PIL import Image, ImageDraw, ImageFont
+
+    image = Image.new("RGB", (1200, 900), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((100, 100, 1100, 700), outline="black", width=6)
+    draw.line((600, 100, 600, 700), fill="black", width=4)
+    try:
+        font = ImageFont.load_default(size=32)
+    except TypeError:
+        # Pillow < 10.1 has a single fixed-size default font
+        font = ImageFont.load_default()
+    draw.text((180, 350), "Reception / Kitchen", fill="black", font=font)
+    draw.text((700, 350), "Bedroom", fill="black", font=font)
+    draw.text((150, 780), text, fill="black", font=font)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def isoline_geojson(radius_degrees: float = 0.03) -> Dict:
+    """
+    Builds an isoline around the commute target: a disc with a separate component, like the islands of a transit
+    isoline.
+
+    Returns:
+    Dict: A GeoJSON FeatureCollection in the shape Geoapify returns.
+    """
+    centre = Point(TARGET["longitude"], TARGET["latitude"])
+    geometry = shapely.union_all(
+        [centre.buffer(radius_degrees, quad_segs=64), Point(-0.1430, 51.5350).buffer(radius_degrees / 3, quad_segs=32)]
+    )
+    return {
+        "type": "FeatureCollection",
+        "features": [{"type": "Feature", "properties": {"mode": "approximated_transit"}, "geometry": mapping(geometry)}],
+    }
+
+
+def postcode_table_csv(listings: List[Dict], seed: int = 1) -> str:
+    """
+    Builds a postcode centroid table covering every listing's postcode and the commute target's.
+
+    Returns:
+    str: CSV with postcode, latitude and longitude columns, as read by PostcodeTableBackend.
+    """
+    rng = random.Random(seed)
+    rows = {"E14 5AB": (TARGET["latitude"], TARGET["longitude"])}
+    for listing in listings:
+        postcode = listing["address"].rsplit(", ", 1)[1]
+        if postcode not in rows:
+            lat, lon = DISTRICTS[listing["district"]]
+            rows[postcode] = (lat + rng.uniform(-0.01, 0.01), lon + rng.uniform(-0.015, 0.015))
+
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["postcode", "latitude", "longitude"])
+    for postcode, (lat, lon) in rows.items():
+        writer.writerow([postcode, f"{lat:.6f}", f"{lon:.6f}"])
+    return output.getvalue()
+
+
+class FakeGeocoderBackend:
+    name = "fake"
+
+    def geocode(self, address: str) -> Optional[Tuple[float, float]]:
+        """
+        Places an address deterministically within a few kilometres of the commute target, without any network.
+        """
+        digest = zlib.crc32(address.encode())
+        return (
+            TARGET["latitude"] + ((digest & 0xFFFF) / 0xFFFF - 0.5) * 0.1,
+            TARGET["longitude"] + ((digest >> 16) / 0xFFFF - 0.5) * 0.15,
+        )
+
+
+class StandInSite:
+    def __init__(self, listings: List[Dict]) -> None:
+        """
+        Initialize a local HTTP server that stands in for Rightmove, serving search results, property pages and
+        floorplan images built from the given listings.
+
+        Search results honour the price and bedroom filters and the 42 page cap, so sharding behaves as it would live.
+        """
+        self.listings = listings
+        self.by_id = {str(listing["id"]): listing for listing in listings}
+        self._floorplans: Dict[str, bytes] = {}
+        self._floorplans_lock = threading.Lock()
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                body, content_type = site.respond(self.path)
+                self.send_response(200 if body is not None else 404)
+                body = body if body is not None else b"Not found"
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self._thread = threading.Thread(target=self.server.serve_forever, name="stand-in-site", daemon=True)
+
+    def respond(self, path: str) -> Tuple[Optional[bytes], str]:
+        """
+        Builds the response body and content type for a request path, or None if there is no such page.
+        """
+        url = urlsplit(path)
+        if url.path == "/property-to-rent/find.html":
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            matches = [
+                listing
+                for listing in self.listings
+                if int(query.get("minPrice") or 0) <= listing["price"] <= int(query.get("maxPrice") or 10**9)
+                and int(query.get("minBedrooms") or 0) <= listing["bedrooms"] <= int(query.get("maxBedrooms") or 99)
+            ]
+            html = search_page_html(matches, index=int(query.get("index", 0)))
+            return html.encode(), "text/html; charset=utf-8"
+
+        match = re.fullmatch(r"/properties/(\d+)", url.path)
+        if match and match.group(1) in self.by_id:
+            return property_page_html(self.by_id[match.group(1)], self.base_url).encode(), "text/html; charset=utf-8"
+
+        match = re.fullmatch(r"/floorplans/(\d+)\.png", url.path)
+        if match and match.group(1) in self.by_id:
+            with self._floorplans_lock:
+                if match.group(1) not in self._floorplans:
+                    self._floorplans[match.group(1)] = floorplan_png(self.by_id[match.group(1)]["floorplan_text"])
+                return self._floorplans[match.group(1)], "image/png"
+
+        if url.path == "/":
+            return b"<!DOCTYPE html><html><body>Rightmove stand-in</body></html>", "text/html; charset=utf-8"
+        return None, "text/plain"
+
+    def __enter__(self) -> "StandInSite":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.server.shutdown()
+        self.server.server_close()
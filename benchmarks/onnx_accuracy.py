@@ -0,0 +1,132 @@
+"""
+Compares the quantised ONNX Runtime floorplan backend with the PyTorch one on fixture floorplans: the answers each
+gives, how often they agree, time per image and peak memory. Every image goes to the model, bypassing the regex tier
+and the answer cache, so that the comparison is of the models alone.
+
+Each backend runs in its own process so that their peak memory is measured separately. The first run exports and
+quantises the model, which counts towards the ONNX backend's load time and memory; run it again for steady-state
+figures. Needs Tesseract, PyTorch and onnxruntime.
+
+Usage: python3 benchmarks/onnx_accuracy.py [--images 40] [--threads 4] [--output onnx_accuracy.json]
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY)
+
+import yaml  # noqa: E402
+
+import fixtures  # noqa: E402
+from floorplan_analyser import SQ_FT_PER_SQ_M  # noqa: E402
+
+
+def run_backend(backend: str, image_paths: List[str], question: str, threads: Optional[int]) -> Dict:
+    """
+    Answers the question for every image with one backend. Runs in a fresh process.
+
+    Returns:
+    Dict: The areas in image order, model load time, time per image and peak resident memory.
+    """
+    sys.path.insert(0, REPOSITORY)
+    from floorplan_analyser import FloorplanAnalyser
+
+    analyser = FloorplanAnalyser(
+        backend=backend, onnx_directory=os.path.join(REPOSITORY, "cache", "onnx"), intra_op_threads=threads
+    )
+    start = time.perf_counter()
+    analyser.model
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    answers = analyser.extract_areas(question, image_paths, use_regex=False)
+    seconds = time.perf_counter() - start
+    return {
+        "areas": [answers[image_path].area for image_path in image_paths],
+        "load_seconds": load_seconds,
+        "ms_per_image": seconds / len(image_paths) * 1000,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def is_close(area: float, expected: float, tolerance: float = 0.02) -> bool:
+    return abs(area - expected) <= tolerance * expected
+
+
+def compare(listings: List[Dict], results: Dict[str, Dict]) -> Dict:
+    """
+    Summarises each backend's accuracy against the fixtures' areas, and how often the backends agree.
+
+    An answer counts as correct if it is within 2% of the area in sq ft or in sq m, as the model reads whichever the
+    floorplan prints first.
+    """
+    summary = {}
+    for backend, result in results.items():
+        correct = sum(
+            is_close(area, listing["sq_ft"]) or is_close(area, listing["sq_ft"] / SQ_FT_PER_SQ_M)
+            for area, listing in zip(result["areas"], listings)
+        )
+        summary[backend] = {
+            "correct": correct / len(listings),
+            "load_seconds": round(result["load_seconds"], 2),
+            "ms_per_image": round(result["ms_per_image"], 1),
+            "peak_rss_mb": round(result["peak_rss_mb"]),
+        }
+    if len(results) == 2:
+        first, second = (result["areas"] for result in results.values())
+        summary["agreement"] = sum(is_close(a, b, 0.01) for a, b in zip(first, second)) / len(listings)
+    return summary
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare the PyTorch and quantised ONNX floorplan backends.")
+    parser.add_argument("--images", type=int, default=40, help="Number of fixture floorplans.")
+    parser.add_argument("--threads", type=int, default=None, help="Threads per inference on ONNX Runtime.")
+    parser.add_argument("--output", help="Optionally write the results to this JSON file.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with open(os.path.join(REPOSITORY, "config.yaml"), "r") as file:
+        question = yaml.safe_load(file)["qa_prompt"]
+
+    listings = fixtures.make_listings(args.images, seed=7)
+    directory = tempfile.mkdtemp(prefix="floorplans-")
+    try:
+        image_paths = []
+        for listing in listings:
+            image_path = os.path.join(directory, f"{listing['id']}.png")
+            with open(image_path, "wb") as file:
+                file.write(fixtures.floorplan_png(listing["floorplan_text"]))
+            image_paths.append(image_path)
+
+        results = {}
+        for backend in ("pytorch", "onnx"):
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                results[backend] = executor.submit(run_backend, backend, image_paths, question, args.threads).result()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    summary = compare(listings, results)
+    print(f"{'backend':10} {'correct':>8} {'ms/image':>9} {'load s':>7} {'peak MB':>8}")
+    for backend in ("pytorch", "onnx"):
+        row = summary[backend]
+        print(
+            f"{backend:10} {row['correct']:8.0%} {row['ms_per_image']:9.1f} {row['load_seconds']:7.1f} "
+            f"{row['peak_rss_mb']:8d}"
+        )
+    print(f"Backends agree on {summary['agreement']:.0%} of floorplans.")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"summary": summary, "results": results}, file, indent=2)
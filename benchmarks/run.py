@@ -0,0 +1,424 @@
+"""
+Times each stage of the pipeline on recorded-style fixtures, with no network access, and writes the results to a JSON
+file so that they can be compared between versions.
+
+Usage: python3 benchmarks/run.py [--output benchmarks/results.json] [--only keyword_filtering end_to_end]
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY)
+
+import yaml  # noqa: E402
+
+import fixtures  # noqa: E402
+from floorplan_analyser import extract_area_from_text  # noqa: E402
+from geocoding import Geocoder  # noqa: E402
+from instrumentation import metrics  # noqa: E402
+from page_model import PageModel  # noqa: E402
+from rightmove_api import extract_embedded_json, property_from_card  # noqa: E402
+from rightmove_scraper import RightmoveScraper  # noqa: E402
+from travel_time import IsochroneMapAnalyser  # noqa: E402
+
+
+def load_settings() -> Dict:
+    """
+    Reads the scraper settings from the repository's config.yaml, so the benchmarks use the real exclusion lists.
+    """
+    with open(os.path.join(REPOSITORY, "config.yaml"), "r") as file:
+        return yaml.safe_load(file)
+
+
+def create_scraper(config: Dict, **kwargs) -> RightmoveScraper:
+    """
+    Builds a scraper from the config's scraper settings. Nothing is fetched until a search runs.
+    """
+    settings = config["scraper_settings"]
+    return RightmoveScraper(
+        location="Benchmark",
+        min_price=settings["min_price"],
+        max_price=settings["max_price"],
+        min_bedrooms=settings["min_bedrooms"],
+        max_bedrooms=settings["max_bedrooms"],
+        min_bathrooms=settings["min_bathrooms"],
+        property_type=settings["property_type"],
+        min_let_date=settings["min_let_date"],
+        floorplan_required=settings["floorplan_required"],
+        max_days_since_added=settings["max_days_since_added"],
+        exclude=settings["exclude"],
+        exclude_descriptions=settings.get("exclude_descriptions"),
+        include=settings.get("include"),
+        exclude_postcode_districts=settings.get("exclude_postcode_districts"),
+        search_backend="http",
+        **kwargs,
+    )
+
+
+def measure(func: Callable[[], object], items: int, repeat: int, warmup: int = 1) -> Dict:
+    """
+    Times repeated calls of func.
+
+    Args:
+    func (Callable): The work to time. Called warmup + repeat times.
+    items (int): Number of items func processes per call, for the per-item time.
+    repeat (int): Number of timed calls.
+    warmup (int): Number of untimed calls first.
+
+    Returns:
+    Dict: Timings in seconds.
+    """
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        "repeat": repeat,
+        "items": items,
+        "mean_seconds": statistics.mean(timings),
+        "median_seconds": statistics.median(timings),
+        "min_seconds": min(timings),
+        "max_seconds": max(timings),
+        "stdev_seconds": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "per_item_seconds": statistics.median(timings) / items if items else None,
+    }
+
+
+def bench_search_page_parse(context: Dict) -> Dict:
+    """
+    Decoding a search results page and building the property details from its cards, as the http backend does.
+    """
+    scraper = create_scraper(context["config"])
+    html = fixtures.search_page_html(context["listings"])
+
+    def run():
+        model = extract_embedded_json(html, "window.jsonModel")
+        for card in model["properties"]:
+            property_detail = property_from_card(card)
+            scraper.passes_card_filters(
+                property_detail["address"],
+                int(property_detail["bathrooms"]),
+                property_detail["has_floorplan"],
+                property_detail["summary"],
+            )
+
+    return measure(run, fixtures.RESULTS_PER_PAGE, context["repeat"] * 20)
+
+
+def bench_keyword_filtering(context: Dict) -> Dict:
+    """
+    The keyword filter on every listing's address.
+    """
+    scraper = create_scraper(context["config"])
+    addresses = [listing["address"] for listing in context["listings"]]
+
+    def run():
+        for address in addresses:
+            scraper.keyword_filtering(address)
+
+    return measure(run, len(addresses), context["repeat"])
+
+
+def bench_page_model_parse(context: Dict) -> Dict:
+    """
+    Extracting a property page's window.PAGE_MODEL from the undecoded response body and reading its letting details and
+    floorplans, as the letting details stage does.
+    """
+    html = fixtures.property_page_html(context["listings"][0], "http://127.0.0.1").encode()
+
+    def run():
+        page_model = PageModel.from_html(html)
+        page_model.letting_details()
+        page_model.floorplan_urls()
+
+    return measure(run, 1, context["repeat"] * 100)
+
+
+def _travel_analyser(context: Dict) -> IsochroneMapAnalyser:
+    """
+    Builds an analyser with the fake geocoder and the isoline fixture.
+    """
+    from shapely.geometry import shape
+
+    analyser = IsochroneMapAnalyser(geocoder=Geocoder(fixtures.FakeGeocoderBackend()))
+    analyser.set_isochrone_map(shape(fixtures.isoline_geojson()["features"][0]["geometry"]))
+    return analyser
+
+
+def bench_is_within_isochrone(context: Dict) -> Dict:
+    """
+    One address at a time, as before batching.
+    """
+    analyser = _travel_analyser(context)
+    addresses = [listing["address"] for listing in context["listings"]]
+
+    def run():
+        for address in addresses:
+            analyser.is_within_isochrone(address)
+
+    return measure(run, len(addresses), context["repeat"])
+
+
+def bench_is_within_isochrone_many(context: Dict) -> Dict:
+    """
+    Every address in one batch.
+    """
+    analyser = _travel_analyser(context)
+    addresses = [listing["address"] for listing in context["listings"]]
+    return measure(lambda: analyser.is_within_isochrone_many(addresses), len(addresses), context["repeat"])
+
+
+def bench_floor_area_from_text(context: Dict) -> Dict:
+    """
+    Reading the floor area from OCR text with regular expressions, the tier that runs before the QA model.
+    """
+    texts = [f"Bedroom 3.2m x 4.1m Kitchen {listing['floorplan_text']}" for listing in context["listings"]]
+
+    def run():
+        for text in texts:
+            extract_area_from_text(text)
+
+    return measure(run, len(texts), context["repeat"])
+
+
+def bench_get_answer(context: Dict) -> Dict:
+    """
+    FloorplanAnalyser.get_answer on floorplan images, uncached: OCR, then the regex tier or the QA model.
+    """
+    from floorplan_analyser import FloorplanAnalyser
+
+    listings = context["listings"][:8]
+    directory = tempfile.mkdtemp(prefix="floorplans-")
+    image_paths = []
+    for listing in listings:
+        image_path = os.path.join(directory, f"{listing['id']}.png")
+        with open(image_path, "wb") as file:
+            file.write(fixtures.floorplan_png(listing["floorplan_text"]))
+        image_paths.append(image_path)
+
+    analyser = FloorplanAnalyser()
+    question = context["config"]["qa_prompt"]
+
+    def run():
+        for image_path in image_paths:
+            analyser.get_answer(question, image_path)
+
+    try:
+        return measure(run, len(image_paths), max(1, context["repeat"] // 5), warmup=0)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_end_to_end(context: Dict) -> Dict:
+    """
+    A full run of main.main against the stand-in site, from location lookup to properties.csv.
+    """
+    import main as pipeline_main
+    from rightmove_api import LocationIdentifierCache
+
+    config = context["config"]
+    listings = context["listings"]
+    working_directory = tempfile.mkdtemp(prefix="benchmark-")
+    previous_directory = os.getcwd()
+
+    with fixtures.StandInSite(listings) as site:
+        try:
+            os.chdir(working_directory)
+            with open("postcodes.csv", "w") as file:
+                file.write(fixtures.postcode_table_csv(listings))
+
+            boroughs = ["Benchmark East", "Benchmark Docklands"]
+            run_config = dict(
+                config,
+                images_directory="images",
+                cache_directory="cache",
+                target_location="",
+                commute_targets=[{"location": fixtures.TARGET["location"], "travel_time": 1800}],
+                geocoding={"backend": "postcode_table", "postcode_table": "postcodes.csv"},
+                floorplan_model_server="",
+                listing_store={"incremental": False},
+                detail_fetching={"concurrency": 16},
+                http={"requests_per_second": 0, "max_concurrency": 16},
+                instrumentation={"report_directory": ""},
+                london_boroughs=boroughs,
+                scraper_settings=dict(
+                    config["scraper_settings"],
+                    search_backend="http",
+                    base_url=site.base_url,
+                    max_days_since_added="Anytime",
+                    # Cover every listing, so large searches are sharded as they would be live
+                    min_price="1800",
+                    max_price="3600",
+                    min_bedrooms="1",
+                    max_bedrooms="4",
+                    min_let_date="01/02/2024",
+                    floorplan_required=False,
+                ),
+            )
+            with open("config.yaml", "w") as file:
+                yaml.safe_dump(run_config, file)
+
+            # Location identifiers come from the cache, so Chrome is never started
+            location_cache = LocationIdentifierCache(os.path.join("cache", "location_identifiers.sqlite"))
+            for index, borough in enumerate(boroughs):
+                location_cache.set(borough, f"REGION^{index}")
+            location_cache.close()
+
+            # The isoline comes from the cache, keyed by the target's geocoded position
+            postcode_table = {row[0]: row for row in (line.split(",") for line in open("postcodes.csv"))}
+            _, lat, lon = postcode_table["E14 5AB"]
+            os.makedirs(os.path.join("cache", "isolines"), exist_ok=True)
+            isoline_name = f"{float(lat):.6f}_{float(lon):.6f}_approximated_transit_1800.geojson"
+            with open(os.path.join("cache", "isolines", isoline_name), "w") as file:
+                json.dump(fixtures.isoline_geojson(), file)
+
+            metrics.reset()
+            start = time.perf_counter()
+            pipeline_main.main("config.yaml")
+            elapsed = time.perf_counter() - start
+
+            found = 0
+            if os.path.exists("properties.csv"):
+                with open("properties.csv") as file:
+                    found = sum(1 for _ in file) - 1
+        finally:
+            os.chdir(previous_directory)
+            shutil.rmtree(working_directory, ignore_errors=True)
+
+    report = metrics.report()
+    return {
+        "repeat": 1,
+        "items": len(listings),
+        "mean_seconds": elapsed,
+        "median_seconds": elapsed,
+        "min_seconds": elapsed,
+        "max_seconds": elapsed,
+        "stdev_seconds": 0.0,
+        "per_item_seconds": elapsed / len(listings),
+        "properties_found": found,
+        "stage_seconds": {
+            histogram["labels"]["stage"]: histogram["sum"]
+            for histogram in report["histograms"]
+            if histogram["name"] == "stage_seconds"
+        },
+        "network_bytes": {
+            counter["labels"]["source"]: counter["value"]
+            for counter in report["counters"]
+            if counter["name"] == "network_bytes_total"
+        },
+    }
+
+
+BENCHMARKS = {
+    "search_page_parse": bench_search_page_parse,
+    "keyword_filtering": bench_keyword_filtering,
+    "page_model_parse": bench_page_model_parse,
+    "is_within_isochrone": bench_is_within_isochrone,
+    "is_within_isochrone_many": bench_is_within_isochrone_many,
+    "floor_area_from_text": bench_floor_area_from_text,
+    "get_answer": bench_get_answer,
+    "end_to_end": bench_end_to_end,
+}
+
+
+def skip_reason(name: str, context: Dict) -> Optional[str]:
+    """
+    Returns why a benchmark cannot run in this environment, or None if it can.
+    """
+    needs_ocr = name == "get_answer" or (name == "end_to_end" and context["floorplans"])
+    if needs_ocr and not shutil.which("tesseract"):
+        return "tesseract is not installed"
+    return None
+
+
+def git_revision() -> Optional[str]:
+    """
+    Returns the current commit, or None outside a git checkout.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPOSITORY, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(names: List[str], listings: int, repeat: int, floorplans: bool) -> Dict:
+    """
+    Runs the named benchmarks.
+
+    Returns:
+    Dict: The environment, and the timings or skip reason of each benchmark.
+    """
+    context = {
+        "config": load_settings(),
+        "listings": fixtures.make_listings(listings, floorplans=floorplans),
+        "repeat": repeat,
+        "floorplans": floorplans,
+    }
+    results = {
+        "revision": git_revision(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "listings": listings,
+        "benchmarks": {},
+    }
+    for name in names:
+        reason = skip_reason(name, context)
+        if reason:
+            logging.warning(f"Skipping {name}: {reason}")
+            results["benchmarks"][name] = {"skipped": reason}
+            continue
+        logging.info(f"Running {name}")
+        results["benchmarks"][name] = BENCHMARKS[name](context)
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages offline, against recorded-style fixtures.")
+    parser.add_argument("--output", default=os.path.join(REPOSITORY, "benchmarks", "results.json"), help="Results file.")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Run only these benchmarks.")
+    parser.add_argument("--listings", type=int, default=2000, help="Number of listings in the fixtures.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions of each benchmark.")
+    parser.add_argument(
+        "--no-floorplans",
+        action="store_true",
+        help="Give no listing a floorplan, so the end-to-end run needs neither tesseract nor the QA model.",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    floorplans = not args.no_floorplans
+    names = args.only or list(BENCHMARKS)
+    if floorplans and "end_to_end" in names and not shutil.which("tesseract"):
+        logging.warning("tesseract is not installed, so the end-to-end run uses listings without floorplans.")
+        floorplans = False
+
+    results = run(names, args.listings, args.repeat, floorplans)
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+
+    for name, result in results["benchmarks"].items():
+        if "skipped" in result:
+            print(f"{name:28} skipped: {result['skipped']}")
+        else:
+            per_item = result["per_item_seconds"] * 1e6 if result["per_item_seconds"] else 0.0
+            print(f"{name:28} {result['median_seconds'] * 1000:10.2f} ms  {per_item:10.2f} us/item  ({result['items']} items)")
+    print(f"Results written to {args.output}")
@@ -0,0 +1,342 @@
+import json
+import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Iterator, List, NamedTuple, Optional, Tuple
+from instrumentation import metrics
+
+# Selenium is only imported once a driver is actually launched
+if TYPE_CHECKING:
+    from selenium import webdriver
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+_driver_path_lock = threading.Lock()
+_driver_path: Optional[str] = None
+
+# Requests the lean profile blocks: images, media and fonts, which the scraper never reads, and analytics and ad hosts
+LEAN_BLOCKED_URL_PATTERNS = (
+    "*.jpg",
+    "*.jpeg",
+    "*.png",
+    "*.gif",
+    "*.webp",
+    "*.svg",
+    "*.ico",
+    "*.mp4",
+    "*.webm",
+    "*.m3u8",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*googlesyndication.com*",
+    "*amazon-adsystem.com*",
+    "*facebook.net*",
+    "*hotjar.com*",
+    "*adsrvr.org*",
+    "*criteo.*",
+    "*scorecardresearch.com*",
+)
+
+# Chrome switches of the lean profile, turning off what a scraping session never uses
+LEAN_ARGUMENTS = (
+    "--disable-extensions",
+    "--disable-gpu",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--mute-audio",
+)
+
+
+class BrowserProfile(NamedTuple):
+    name: str = "default"
+    headless: bool = False
+    page_load_strategy: str = "normal"  # "eager" returns from a page load once the DOM is ready, not every resource
+    blocked_url_patterns: Tuple[str, ...] = ()  # URL patterns blocked over the DevTools protocol, with * wildcards
+    arguments: Tuple[str, ...] = ()  # extra Chrome switches
+    user_data_directory: Optional[str] = None  # reused between sessions, one subdirectory per concurrent session
+
+    @classmethod
+    def lean(
+        cls,
+        headless: bool = True,
+        user_data_directory: Optional[str] = None,
+        blocked_url_patterns: Tuple[str, ...] = (),
+    ) -> "BrowserProfile":
+        """
+        A profile that only loads what the scraper reads: headless, eager page loads, no images, media, fonts,
+        analytics or ads, and no extensions or GPU.
+
+        Args:
+        headless (bool): Run Chrome without a visible window.
+        user_data_directory (str): Directory to keep the Chrome profiles in, so accepted cookies persist.
+        blocked_url_patterns (Tuple[str, ...]): URL patterns to block on top of the lean profile's.
+
+        Returns:
+        BrowserProfile: The profile.
+        """
+        return cls(
+            name="lean",
+            headless=headless,
+            page_load_strategy="eager",
+            blocked_url_patterns=LEAN_BLOCKED_URL_PATTERNS + tuple(blocked_url_patterns),
+            arguments=LEAN_ARGUMENTS,
+            user_data_directory=user_data_directory,
+        )
+
+
+def _chromedriver_path() -> str:
+    """
+    Resolves the chromedriver binary once per process, so that ChromeDriverManager is not consulted for every session.
+
+    Returns:
+    str: Path to the chromedriver binary.
+    """
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = ChromeDriverManager().install()
+        return _driver_path
+
+
+def create_chrome_driver(
+    profile: Optional[BrowserProfile] = None, user_data_directory: Optional[str] = None
+) -> "webdriver.Chrome":
+    """
+    Launches a new Chrome WebDriver session.
+
+    The session records its network traffic in Chrome's performance log, which record_page_load reads after each page.
+
+    Args:
+    profile (BrowserProfile): The settings to launch Chrome with. Defaults to a full, visible Chrome.
+    user_data_directory (str): Chrome profile directory for this session. Only one session can use it at a time.
+
+    Returns:
+    WebDriver: An instance of Chrome WebDriver.
+    """
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+
+    profile = profile or BrowserProfile()
+    chrome_options = webdriver.ChromeOptions()
+    if profile.headless:
+        chrome_options.add_argument("--headless=new")
+    for argument in profile.arguments:
+        chrome_options.add_argument(argument)
+    if user_data_directory:
+        os.makedirs(user_data_directory, exist_ok=True)
+        chrome_options.add_argument(f"--user-data-dir={os.path.abspath(user_data_directory)}")
+    chrome_options.page_load_strategy = profile.page_load_strategy
+    chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    driver = webdriver.Chrome(service=Service(_chromedriver_path()), options=chrome_options)
+    if profile.blocked_url_patterns:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(profile.blocked_url_patterns)})
+    return driver
+
+
+def record_page_load(driver: "webdriver.Chrome", page: str, profile: str) -> Tuple[int, int, int]:
+    """
+    Reads the requests made since the last call from the driver's performance log and records them per page type:
+    how many requests the page made, how many the profile blocked, and how many bytes came over the network.
+
+    Args:
+    driver (WebDriver): The driver, as launched by create_chrome_driver.
+    page (str): The kind of page loaded, e.g. "search" or "property".
+    profile (str): Name of the driver's browser profile.
+
+    Returns:
+    Tuple[int, int, int]: Requests made, requests blocked and bytes received.
+    """
+    requests_made = blocked = received = 0
+    try:
+        entries = driver.get_log("performance")
+    except Exception:
+        # Drivers not launched by create_chrome_driver have no performance log
+        return 0, 0, 0
+
+    for entry in entries:
+        message = json.loads(entry["message"])["message"]
+        method = message.get("method")
+        if method == "Network.requestWillBeSent":
+            requests_made += 1
+        elif method == "Network.loadingFinished":
+            received += int(message["params"].get("encodedDataLength") or 0)
+        elif method == "Network.loadingFailed" and message["params"].get("blockedReason"):
+            blocked += 1
+
+    metrics.increment("browser_requests_total", requests_made, page=page, profile=profile)
+    metrics.increment("browser_blocked_requests_total", blocked, page=page, profile=profile)
+    metrics.increment("network_bytes_total", received, source=f"browser_{page}")
+    return requests_made, blocked, received
+
+
+class DriverLease:
+    def __init__(
+        self, driver_factory: Callable[[], "webdriver.Chrome"], profile: str = "default", slot: int = 0
+    ) -> None:
+        """
+        A WebDriver session handed out by a DriverPool. Chrome is only launched when the driver is first used.
+
+        Args:
+        driver_factory (Callable): Factory that launches the Chrome WebDriver.
+        profile (str): Name of the session's browser profile, used to label its page load timings.
+        slot (int): Index of the session's user data directory, unique among the pool's live sessions.
+        """
+        self._driver_factory = driver_factory
+        self.profile = profile
+        self.slot = slot
+        self._driver: Optional["webdriver.Chrome"] = None
+        self.pages_loaded = 0
+        self.broken = False
+
+    @property
+    def driver(self) -> "webdriver.Chrome":
+        """
+        The leased Chrome WebDriver.
+        """
+        if self._driver is None:
+            self._driver = self._driver_factory()
+        return self._driver
+
+    def quit(self) -> None:
+        """
+        Quits the driver if it was ever launched.
+        """
+        if self._driver is not None:
+            self._driver.quit()
+            self._driver = None
+
+
+class DriverPool:
+    def __init__(
+        self,
+        size: int = 1,
+        max_pages_per_driver: int = 0,
+        headless: bool = True,
+        driver_factory: Optional[Callable[[], "webdriver.Chrome"]] = None,
+        profile: Optional[BrowserProfile] = None,
+    ) -> None:
+        """
+        Initialize a pool of long-lived WebDriver sessions that are leased to one borough search at a time.
+
+        Drivers are launched lazily, so a pool never holds more sessions than were actually used concurrently.
+
+        Args:
+        size (int): Maximum number of concurrent Chrome sessions.
+        max_pages_per_driver (int): Recycle a driver after it has loaded this many pages. 0 disables recycling.
+        headless (bool): Run Chrome without a visible window, if no profile is given.
+        driver_factory (Callable): Optional factory used instead of create_chrome_driver.
+        profile (BrowserProfile): Settings to launch Chrome with. Each concurrent session gets its own subdirectory of
+                                  the profile's user data directory, reused by the sessions that replace it.
+        """
+        self.size = max(1, int(size))
+        self.max_pages_per_driver = int(max_pages_per_driver or 0)
+        self.profile = profile or BrowserProfile(headless=headless)
+        self.driver_factory = driver_factory
+        self._free_slots = list(range(self.size))
+        self._idle: "queue.LifoQueue[DriverLease]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._leases: List[DriverLease] = []
+        self._closed = False
+
+    @contextmanager
+    def lease(self) -> Iterator[DriverLease]:
+        """
+        Leases a driver for the duration of a with block, blocking while all drivers are in use.
+
+        A driver whose lease raised is discarded rather than returned to the pool, since its state is unknown.
+
+        Yields:
+        DriverLease: The leased driver together with its page counter.
+        """
+        if self._closed:
+            raise RuntimeError("DriverPool is closed.")
+
+        self._slots.acquire()
+        try:
+            lease = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+
+        try:
+            yield lease
+        except Exception:
+            lease.broken = True
+            raise
+        finally:
+            self._checkin(lease)
+            self._slots.release()
+
+    def _checkout(self) -> DriverLease:
+        """
+        Returns an idle driver, or launches a new one if none are idle.
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                slot = self._free_slots.pop(0)
+                driver_factory = self.driver_factory
+                if driver_factory is None:
+                    user_data_directory = None
+                    if self.profile.user_data_directory:
+                        user_data_directory = os.path.join(self.profile.user_data_directory, f"driver-{slot}")
+                    driver_factory = partial(create_chrome_driver, self.profile, user_data_directory)
+                lease = DriverLease(driver_factory, profile=self.profile.name, slot=slot)
+                self._leases.append(lease)
+            return lease
+
+    def _checkin(self, lease: DriverLease) -> None:
+        """
+        Returns a driver to the pool, quitting it if it is broken or has loaded too many pages.
+        """
+        worn_out = self.max_pages_per_driver and lease.pages_loaded >= self.max_pages_per_driver
+        if lease.broken or worn_out or self._closed:
+            if worn_out:
+                logging.info(f"Recycling driver after {lease.pages_loaded} pages.")
+            self._discard(lease)
+        else:
+            self._idle.put(lease)
+
+    def _discard(self, lease: DriverLease) -> None:
+        """
+        Quits a driver and forgets about it.
+        """
+        try:
+            lease.quit()
+        except Exception as e:
+            logging.warning(f"Error quitting driver: {e}")
+        # The slot's user data directory is free once Chrome has quit
+        with self._lock:
+            if lease in self._leases:
+                self._leases.remove(lease)
+                self._free_slots.append(lease.slot)
+                self._free_slots.sort()
+
+    def close(self) -> None:
+        """
+        Quits every driver owned by the pool.
+        """
+        self._closed = True
+        with self._lock:
+            leases = list(self._leases)
+        for lease in leases:
+            self._discard(lease)
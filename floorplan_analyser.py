@@ -1,75 +1,305 @@
-import requests
-from transformers import pipeline
-import json
-from bs4 import BeautifulSoup
+import hashlib
+import logging
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from instrumentation import metrics
+from kv_cache import SqliteCache
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+WordBoxes = List[Tuple[str, List[int]]]
+
+SQ_FT_PER_SQ_M = 10.7639
+# Plausible floor areas in sq ft, to discard room dimensions and stray numbers
+MIN_AREA_SQ_FT = 100.0
+MAX_AREA_SQ_FT = 20000.0
+AREA_PATTERN = re.compile(
+    r"(?P<number>\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)\s*"
+    r"(?:(?P<sq_ft>sq\.?\s*f(?:ee)?t\.?|sqft|square\s+f(?:ee|oo)t|ft(?:2|²))"
+    r"|(?P<sq_m>sq\.?\s*m(?:etres?|eters?)?\.?|sqm|square\s+met(?:re|er)s?|m(?:2|²)))(?![a-z\d])",
+    re.IGNORECASE,
+)
+TOTAL_PATTERN = re.compile(r"total|gross|internal|approx|\bgia\b", re.IGNORECASE)
+
+
+class AreaAnswer(NamedTuple):
+    area: float
+    tier: str  # "regex" if read from the OCR text, "model" if answered by the QA model
+
+
+def extract_area_from_text(text: str) -> Optional[float]:
+    """
+    Reads the total floor area from a floorplan's OCR text, e.g. "Approx. Gross Internal Area 812 sq ft / 75.4 sq m".
+
+    Areas in sq m are converted to sq ft. When several different areas are printed, e.g. per floor and in total, one
+    labelled as a total is preferred. If the text has no area, or the areas disagree and none is labelled as the total,
+    None is returned so that the caller can fall back to the QA model.
+
+    Args:
+    text (str): The OCR text.
+
+    Returns:
+    float: The floor area in sq ft, or None if it cannot be read unambiguously.
+    """
+    areas = []
+    labelled = []
+    for match in AREA_PATTERN.finditer(text):
+        area = float(match.group("number").replace(",", ""))
+        if match.group("sq_m"):
+            area = round(area * SQ_FT_PER_SQ_M, 1)
+        if not MIN_AREA_SQ_FT <= area <= MAX_AREA_SQ_FT:
+            continue
+        areas.append(area)
+        if TOTAL_PATTERN.search(text[max(0, match.start() - 40) : match.start()]):
+            labelled.append(area)
+
+    candidates = labelled or areas
+    if not candidates:
+        return None
+    # The same area printed in both units counts as one value
+    if max(candidates) - min(candidates) <= 0.02 * max(candidates):
+        return max(candidates)
+    if labelled:
+        # The whole-property total is the largest labelled figure
+        return max(labelled)
+    return None
+
+
+def parse_area(answer: str) -> float:
+    """
+    Extracts the first number from a model answer.
+
+    Args:
+    answer (str): The answer text, e.g. "812 sq ft".
+
+    Returns:
+    float: The number, or 0.0 if the answer contains none.
+    """
+    matches = re.findall(r"\d+\.\d+|\d+", answer.replace(",", ""))
+    return float(matches[0]) if matches else 0.0
+
+
+def image_hash(image_path: str) -> str:
+    """
+    Hashes an image file's contents, so that identical floorplans share cached answers.
+
+    Args:
+    image_path (str): The path to the image.
+
+    Returns:
+    str: Hex digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(image_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 
 class FloorplanAnalyser:
-    def __init__(self, model: str = "impira/layoutlm-document-qa", task: str = "document-question-answering") -> None:
+    # Whether the model runs in this process, as opposed to a model server
+    local_model = True
+
+    def __init__(
+        self,
+        model: str = "impira/layoutlm-document-qa",
+        task: str = "document-question-answering",
+        cache_path: Optional[str] = None,
+        ocr_workers: int = 4,
+        backend: str = "pytorch",
+        onnx_directory: str = "cache/onnx",
+        intra_op_threads: Optional[int] = None,
+    ) -> None:
         """
         Initialize the FloorplanAnalyser with a specified model and task for document-question answering.
 
+        transformers is only imported, and the model only loaded, the first time a floorplan actually needs the model.
+
         Args:
         model (str): The model to use for the document-question answering pipeline.
         task (str): The task type for the pipeline.
+        cache_path (str): Optional path of a SQLite cache of answers, keyed by image contents, question and model.
+        ocr_workers (int): Number of threads running Tesseract OCR ahead of the model.
+        backend (str): "pytorch" runs the model as published. "onnx" runs an int8 quantised ONNX export of it on ONNX
+                       Runtime, which is faster and smaller on CPU at some cost in accuracy; the export is made once and
+                       kept in onnx_directory.
+        onnx_directory (str): Directory the quantised models are kept in.
+        intra_op_threads (int): Threads ONNX Runtime uses for one inference. None lets it use every core.
+
+        Raises:
+        ValueError: If the backend is unknown.
         """
-        self.model = pipeline(model=model, task=task)
+        if backend not in ("pytorch", "onnx"):
+            raise ValueError(f"Unknown inference backend: {backend}")
+        self.backend = backend
+        self.onnx_directory = onnx_directory
+        self.intra_op_threads = intra_op_threads
+        self.model_name = model
+        self.task = task
+        self._model = None
+        self._model_load_lock = threading.Lock()
+        # The pipeline is shared between borough workers, so serialise inference
+        self._model_lock = threading.Lock()
+        self.ocr_workers = ocr_workers
+        self.cache_path = cache_path
+        self.answer_cache = SqliteCache(cache_path, table="floorplan_areas") if cache_path else None
 
-    def download_image(self, image_url: str, filename: str) -> None:
+    @property
+    def model(self):
+        """
+        The document-question answering pipeline, loaded on first use.
         """
-        Downloads an image from a given URL and saves it to a specified file.
+        with self._model_load_lock:
+            if self._model is None:
+                logging.info(f"Loading {self.model_name} ({self.backend}).")
+                if self.backend == "onnx":
+                    from onnx_backend import load_onnx_pipeline
 
-        Args:
-        image_url (str): URL of the image to download.
-        filename (str): Filename to save the downloaded image.
+                    self._model = load_onnx_pipeline(
+                        self.model_name, self.task, self.onnx_directory, self.intra_op_threads
+                    )
+                else:
+                    from transformers import pipeline
+
+                    self._model = pipeline(model=self.model_name, task=self.task)
+        return self._model
+
+    def settings(self) -> Dict:
+        """
+        Returns the keyword arguments that build an analyser like this one, e.g. in a worker process.
         """
-        try:
-            response = requests.get(image_url)
-            response.raise_for_status()
-            with open(filename, "wb") as file:
-                file.write(response.content)
-        except requests.HTTPError as http_err:
-            print(f"HTTP error occurred: {http_err}")
-        except Exception as err:
-            print(f"An error occurred: {err}")
+        return {
+            "model": self.model_name,
+            "task": self.task,
+            "cache_path": self.cache_path,
+            "ocr_workers": self.ocr_workers,
+            "backend": self.backend,
+            "onnx_directory": self.onnx_directory,
+            "intra_op_threads": self.intra_op_threads,
+        }
 
-    def get_floorplan_url(self, property_url: str) -> str:
+    def ocr(self, image_path: str) -> WordBoxes:
         """
-        Constructs the floorplan URL from a given property URL.
+        Runs Tesseract OCR on an image.
 
         Args:
-        property_url (str): The URL of the property.
+        image_path (str): The path to the image.
 
         Returns:
-        str: The modified URL pointing to the property's floorplan.
+        WordBoxes: The words found, each with its bounding box normalised to 0-1000 as the model expects.
+        """
+        from transformers.image_utils import load_image
+        from transformers.pipelines.document_question_answering import apply_tesseract
+
+        with metrics.timed("ocr_seconds"):
+            words, boxes = apply_tesseract(load_image(image_path), lang=None, tesseract_config="")
+        return list(zip(words, boxes))
+
+    def _cache_key(self, question: str, digest: str) -> str:
         """
-        parts = property_url.split("#")
-        floorplan_url = parts[0] + "#/floorplan" + ("?" + parts[1] if len(parts) > 1 else "")
-        return floorplan_url
+        Builds the answer cache key for an image digest. The quantised model can answer differently, so its answers
+        are cached separately.
+        """
+        model = self.model_name if self.backend == "pytorch" else f"{self.model_name}|{self.backend}-int8"
+        return f"{digest}|{model}|{question}"
+
+    def _answer_batch(self, question: str, batch: List[Tuple[str, WordBoxes]], batch_size: int) -> List[float]:
+        """
+        Runs the model on a batch of OCR'd images.
+        """
+        inputs = [{"image": image_path, "question": question, "word_boxes": word_boxes} for image_path, word_boxes in batch]
+        with self._model_lock, metrics.timed("model_batch_seconds"):
+            outputs = self.model(inputs, batch_size=batch_size)
+
+        areas = []
+        for answer in outputs:
+            # A single answer may come back unwrapped
+            answer = [answer] if isinstance(answer, dict) else answer
+            areas.append(parse_area(max(answer, key=lambda x: x["score"])["answer"].strip()) if answer else 0.0)
+        return areas
 
-    def download_property_floorplan(self, property_url: str, image_path: str) -> None:
+    def extract_areas(
+        self, question: str, image_paths: List[str], batch_size: int = 8, use_regex: bool = True
+    ) -> Dict[str, AreaAnswer]:
         """
-        Downloads the floorplan image of a property from its URL.
+        Extracts the floor area from many floorplan images, recording which tier answered.
+
+        Answers already in the cache are returned without touching the images' pixels. The rest are OCR'd once on a
+        thread pool. Where the OCR text states the area unambiguously it is read with regular expressions; only the
+        remaining images go to the QA model, in batches that overlap with OCR of later images.
 
         Args:
-        property_url (str): The URL of the property.
-        image_path (str): Path where the floorplan image will be saved.
+        question (str): The question to be answered based on the floorplan images.
+        image_paths (List[str]): The paths to the floorplan images.
+        batch_size (int): Number of images passed to the model at once.
+        use_regex (bool): Try reading the area from the OCR text before running the model.
+
+        Returns:
+        Dict[str, AreaAnswer]: The area and answering tier for each image path. The area is 0.0 if no answer is found.
         """
-        floorplan_url = self.get_floorplan_url(property_url)
-        headers = requests.utils.default_headers()
-        headers.update({"User-Agent": "My User Agent 1.0"})
+        image_paths = list(dict.fromkeys(image_paths))
+        keys = {image_path: self._cache_key(question, image_hash(image_path)) for image_path in image_paths}
+
+        cached = self.answer_cache.get_many(keys.values()) if self.answer_cache is not None else {}
+        answers = {image_path: AreaAnswer(*cached[key]) for image_path, key in keys.items() if key in cached}
+        # Agents reuse floorplans, so identical images are only analysed once
+        pending = list({keys[image_path]: image_path for image_path in image_paths if image_path not in answers}.values())
+        metrics.cache_lookup("floorplan_answers", len(answers), len(pending))
+        if not pending:
+            return answers
+
+        logging.info(f"Analysing {len(pending)} floorplans, {len(answers)} answers from cache.")
+
+        def answer_batch(batch: List[Tuple[str, WordBoxes]]) -> None:
+            areas = self._answer_batch(question, batch, batch_size)
+            answers.update({image_path: AreaAnswer(area, "model") for (image_path, _), area in zip(batch, areas)})
+
+        with ThreadPoolExecutor(max_workers=self.ocr_workers) as ocr_pool:
+            batch = []
+            # map yields in order, so OCR of later images overlaps inference on earlier batches
+            for image_path, word_boxes in zip(pending, ocr_pool.map(self.ocr, pending)):
+                area = extract_area_from_text(" ".join(word for word, _ in word_boxes)) if use_regex else None
+                if area is not None:
+                    answers[image_path] = AreaAnswer(area, "regex")
+                    continue
 
-        response = requests.get(floorplan_url, headers=headers)
-        soup = BeautifulSoup(response.text, "html.parser")
-        script_tag = soup.find("script", string=lambda t: t and "window.PAGE_MODEL" in t)
+                batch.append((image_path, word_boxes))
+                if len(batch) == batch_size:
+                    answer_batch(batch)
+                    batch = []
+            if batch:
+                answer_batch(batch)
 
-        json_string = script_tag.string.split("=", 1)[1].strip()
-        json_string = json_string.rstrip(";")
+        regex_answers = sum(1 for image_path in pending if answers[image_path].tier == "regex")
+        metrics.increment("floor_area_answers_total", regex_answers, tier="regex")
+        metrics.increment("floor_area_answers_total", len(pending) - regex_answers, tier="model")
+        logging.info(f"Read {regex_answers} floor areas from OCR text, {len(pending) - regex_answers} with the QA model.")
 
-        data = json.loads(json_string)
-        floorplan_image_url = data["propertyData"]["floorplans"][0]["url"]
-        self.download_image(floorplan_image_url, image_path)
+        if self.answer_cache is not None:
+            self.answer_cache.set_many({keys[image_path]: list(answers[image_path]) for image_path in pending})
+
+        answers_by_key = {keys[image_path]: answers[image_path] for image_path in pending}
+        for image_path in image_paths:
+            answers.setdefault(image_path, answers_by_key[keys[image_path]])
+        return answers
+
+    def get_answers(self, question: str, image_paths: List[str], batch_size: int = 8) -> Dict[str, float]:
+        """
+        Answers a question for many floorplan images.
+
+        Args:
+        question (str): The question to be answered based on the floorplan images.
+        image_paths (List[str]): The paths to the floorplan images.
+        batch_size (int): Number of images passed to the model at once.
+
+        Returns:
+        Dict[str, float]: The numerical answer for each image path, or 0.0 if no answer is found.
+        """
+        answers = self.extract_areas(question, image_paths, batch_size=batch_size)
+        return {image_path: answer.area for image_path, answer in answers.items()}
 
     def get_answer(self, question: str, image_path: str) -> float:
         """
@@ -82,10 +312,27 @@ class FloorplanAnalyser:
         Returns:
         float: The numerical answer extracted from the analysis, or 0.0 if no answer is found.
         """
-        answer = self.model(image=image_path, question=question)
-        if not answer:
-            return 0.0
+        return self.get_answers(question, [image_path])[image_path]
+
+
+# Analyser owned by a process pool worker, see init_process_worker
+_process_analyser: Optional[FloorplanAnalyser] = None
+
+
+def init_process_worker(settings: Optional[Dict] = None) -> None:
+    """
+    Process pool initializer that gives each worker process its own FloorplanAnalyser and model.
+
+    Args:
+    settings (Dict): Keyword arguments for the analyser, as returned by FloorplanAnalyser.settings. The answer cache
+                     is shared by all processes.
+    """
+    global _process_analyser
+    _process_analyser = FloorplanAnalyser(**(settings or {}))
+
 
-        answer = max(answer, key=lambda x: x["score"])["answer"].strip()
-        matches = re.findall(r"\d+\.\d+|\d+", answer)
-        return float(matches[0]) if matches else 0.0
+def extract_areas_in_process(question: str, image_paths: List[str], batch_size: int = 8) -> Dict[str, AreaAnswer]:
+    """
+    Runs FloorplanAnalyser.extract_areas in a worker process set up by init_process_worker.
+    """
+    return _process_analyser.extract_areas(question, image_paths, batch_size=batch_size)
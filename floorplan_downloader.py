@@ -0,0 +1,194 @@
+import hashlib
+import logging
+import os
+import tempfile
+from typing import List, Optional
+from urllib.parse import urlsplit
+import requests
+from http_client import HttpClient, http_client
+from instrumentation import metrics
+from kv_cache import SqliteCache
+from page_model import PageModel
+from rightmove_api import property_id_from_url
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# File extensions for the image types floorplans come in
+IMAGE_EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/gif": ".gif", "image/webp": ".webp"}
+
+
+class FloorplanDownloader:
+    def __init__(
+        self,
+        images_directory: str,
+        cache_path: Optional[str] = None,
+        max_dimension: Optional[int] = 2000,
+        all_floorplans: bool = True,
+        client: Optional[HttpClient] = None,
+    ) -> None:
+        """
+        Initialize a downloader that stores each listing's floorplan images once, over the shared HTTP client.
+
+        Images are streamed to disk while being hashed and stored under their content hash, so a plan that agents reuse
+        across listings is kept once. Large images are downscaled before they are stored, to a size that keeps their
+        text legible to OCR. The downloader is safe to share between threads.
+
+        Args:
+        images_directory (str): Directory the images are stored in.
+        cache_path (str): Optional SQLite file remembering which images each listing and image URL resolved to, so
+                          that they are not fetched again on later runs.
+        max_dimension (int): Longest side, in pixels, images are downscaled to. None keeps them at full size.
+        all_floorplans (bool): Download every floorplan of a listing, not just the first.
+        client (HttpClient): The client to download with. Defaults to the shared client.
+        """
+        os.makedirs(images_directory, exist_ok=True)
+        self.images_directory = images_directory
+        self.max_dimension = max_dimension
+        self.all_floorplans = all_floorplans
+        self.client = client or http_client
+        self.listing_cache = SqliteCache(cache_path, table="floorplan_listings") if cache_path else None
+        self.image_cache = SqliteCache(cache_path, table="floorplan_image_urls") if cache_path else None
+
+    def floorplan_urls(self, property_url: str) -> List[str]:
+        """
+        Reads the floorplan image URLs from a property page's window.PAGE_MODEL.
+
+        Args:
+        property_url (str): The URL of the property.
+
+        Returns:
+        List[str]: The floorplan image URLs.
+        """
+        with metrics.timed("floorplan_download_seconds", step="page"):
+            response = self.client.get(property_url.split("#")[0])
+        response.raise_for_status()
+        metrics.increment("network_bytes_total", len(response.content), source="floorplan_page")
+
+        page_model = PageModel.from_html(response.content)
+        if page_model is None:
+            logging.warning(f"No page model found at {property_url}")
+            return []
+        return page_model.floorplan_urls()
+
+    def _extension(self, image_url: str, content_type: str) -> str:
+        """
+        Picks a file extension from the response's content type, falling back to the URL's.
+        """
+        extension = IMAGE_EXTENSIONS.get(content_type.split(";")[0].strip().lower())
+        if extension:
+            return extension
+        extension = os.path.splitext(urlsplit(image_url).path)[1].lower()
+        return extension if extension in IMAGE_EXTENSIONS.values() else ".jpg"
+
+    def _downscale(self, path: str) -> None:
+        """
+        Shrinks an image in place so that its longest side is at most max_dimension, keeping its format.
+        """
+        from PIL import Image
+
+        with Image.open(path) as image:
+            if not self.max_dimension or max(image.size) <= self.max_dimension:
+                return
+            image_format = image.format
+            image.thumbnail((self.max_dimension, self.max_dimension), Image.LANCZOS)
+            if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            image.save(path, format=image_format, **({"quality": 90} if image_format == "JPEG" else {}))
+
+    def download_image(self, image_url: str) -> Optional[str]:
+        """
+        Downloads an image, storing it under its content hash unless an identical image is already stored.
+
+        Args:
+        image_url (str): URL of the image.
+
+        Returns:
+        str: Path of the stored image, or None if it could not be downloaded.
+        """
+        if self.image_cache is not None:
+            image_path = self.image_cache.get(image_url)
+            if image_path and os.path.exists(image_path):
+                metrics.cache_lookup("floorplan_images", 1, 0)
+                return image_path
+            metrics.cache_lookup("floorplan_images", 0, 1)
+
+        digest = hashlib.sha256()
+        temporary = tempfile.NamedTemporaryFile(dir=self.images_directory, suffix=".part", delete=False)
+        try:
+            with temporary, metrics.timed("floorplan_download_seconds", step="image"):
+                with self.client.get(image_url, stream=True) as response:
+                    response.raise_for_status()
+                    extension = self._extension(image_url, response.headers.get("Content-Type", ""))
+                    # Written as it arrives rather than buffered whole in memory
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        digest.update(chunk)
+                        temporary.write(chunk)
+                        metrics.increment("network_bytes_total", len(chunk), source="floorplan_image")
+
+            image_path = os.path.join(self.images_directory, digest.hexdigest() + extension)
+            if os.path.exists(image_path):
+                metrics.increment("floorplan_duplicates_total")
+                os.unlink(temporary.name)
+            else:
+                self._downscale(temporary.name)
+                os.replace(temporary.name, image_path)
+        except (requests.RequestException, OSError) as e:
+            logging.warning(f"Failed to download floorplan {image_url}: {e}")
+            if os.path.exists(temporary.name):
+                os.unlink(temporary.name)
+            return None
+
+        if self.image_cache is not None:
+            self.image_cache.set(image_url, image_path)
+        return image_path
+
+    def download_property_floorplans(self, property_url: str, image_urls: Optional[List[str]] = None) -> List[str]:
+        """
+        Downloads a listing's floorplans, reusing images stored on earlier runs.
+
+        Args:
+        property_url (str): The URL of the property.
+        image_urls (List[str]): The floorplan image URLs, if already read from the property's page. Otherwise the page
+                                is fetched to find them.
+
+        Returns:
+        List[str]: Paths of the stored images, without duplicates. Empty if the listing has no floorplan or none
+                   could be downloaded.
+        """
+        property_id = property_id_from_url(property_url)
+        if self.listing_cache is not None:
+            image_paths = self.listing_cache.get(property_id)
+            if image_paths and all(os.path.exists(image_path) for image_path in image_paths):
+                metrics.cache_lookup("floorplan_listings", 1, 0)
+                return image_paths
+            metrics.cache_lookup("floorplan_listings", 0, 1)
+
+        if image_urls is None:
+            try:
+                image_urls = self.floorplan_urls(property_url)
+            except requests.RequestException as e:
+                logging.warning(f"Failed to fetch floorplans of {property_url}: {e}")
+                return []
+
+        image_paths = []
+        complete = True
+        for image_url in image_urls if self.all_floorplans else image_urls[:1]:
+            image_path = self.download_image(image_url)
+            if image_path is None:
+                complete = False
+            elif image_path not in image_paths:
+                image_paths.append(image_path)
+
+        # Listings with a failed download are tried again next time
+        if image_paths and complete and self.listing_cache is not None:
+            self.listing_cache.set(property_id, image_paths)
+        return image_paths
+
+    def close(self) -> None:
+        """
+        Closes the cache.
+        """
+        if self.listing_cache is not None:
+            self.listing_cache.close()
+            self.image_cache.close()
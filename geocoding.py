@@ -0,0 +1,219 @@
+import csv
+import logging
+import re
+from typing import Dict, Iterable, Optional, Tuple
+from geopy.geocoders import Nominatim
+from geopy.exc import GeopyError
+from http_client import http_client
+from instrumentation import metrics
+from kv_cache import SqliteCache
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+Coordinates = Tuple[float, float]
+
+# Full UK postcode, or just its outward code (postcode district), e.g. "E14 9SH" or "E14"
+POSTCODE_PATTERN = re.compile(r"\b([A-Z]{1,2}\d[A-Z\d]?)(?:\s*(\d[A-Z]{2}))?\b")
+
+
+def normalise_address(address: str) -> str:
+    """
+    Normalises an address for use as a cache key, ignoring case, punctuation and spacing.
+
+    Args:
+    address (str): The address to normalise.
+
+    Returns:
+    str: The normalised address.
+    """
+    return " ".join(re.sub(r"[^\w\s]", " ", address.lower()).split())
+
+
+class NominatimBackend:
+    name = "nominatim"
+
+    def __init__(self, user_agent: str = "rightmove-filtering") -> None:
+        """
+        Initialize a geocoding backend using OpenStreetMap's Nominatim service.
+
+        Requests are paced by the shared HTTP client's limits for the Nominatim host, which by default respect
+        Nominatim's usage policy of one request at a time and at most one per second.
+
+        Args:
+        user_agent (str): A user agent string for Nominatim geocoding service.
+        """
+        self.geolocator = Nominatim(user_agent=user_agent)
+        self.url = f"{self.geolocator.scheme}://{self.geolocator.domain}"
+
+    def geocode(self, address: str) -> Optional[Coordinates]:
+        """
+        Geocodes an address.
+
+        Args:
+        address (str): The address to geocode.
+
+        Returns:
+        Coordinates: (latitude, longitude), or None if the address could not be geocoded.
+        """
+        with http_client.throttle(self.url):
+            # The timeout is read per request, so it follows the shared client's current settings
+            location = self.geolocator.geocode(address, timeout=http_client.timeout[1])
+
+        if not location:
+            return None
+        return location.latitude, location.longitude
+
+
+class PostcodeTableBackend:
+    name = "postcode_table"
+
+    def __init__(self, path: str) -> None:
+        """
+        Initialize an offline geocoding backend from a table of postcode centroids.
+
+        Addresses are matched on a full postcode where they contain one, and otherwise on the centroid of their postcode
+        district. Rightmove display addresses usually end with the district, e.g. "Westferry Road, London, E14".
+
+        Args:
+        path (str): CSV file with postcode, latitude and longitude columns, e.g. the ONS Postcode Directory.
+        """
+        self.postcodes: Dict[str, Coordinates] = {}
+        district_sums: Dict[str, list] = {}
+        with open(path, newline="") as file:
+            for row in csv.DictReader(file):
+                row = {key.strip().lower(): value for key, value in row.items()}
+                try:
+                    postcode = row["postcode"].replace(" ", "").upper()
+                    coordinates = float(row["latitude"]), float(row["longitude"])
+                except (KeyError, ValueError, AttributeError):
+                    continue
+                self.postcodes[postcode] = coordinates
+                sums = district_sums.setdefault(postcode[:-3], [0.0, 0.0, 0])
+                sums[0] += coordinates[0]
+                sums[1] += coordinates[1]
+                sums[2] += 1
+
+        self.districts = {district: (lat / count, lon / count) for district, (lat, lon, count) in district_sums.items()}
+        logging.info(f"Loaded {len(self.postcodes)} postcodes in {len(self.districts)} districts from {path}")
+
+    def geocode(self, address: str) -> Optional[Coordinates]:
+        """
+        Geocodes an address from the postcode it contains.
+
+        Args:
+        address (str): The address to geocode.
+
+        Returns:
+        Coordinates: (latitude, longitude), or None if the address contains no known postcode or district.
+        """
+        # The postcode is normally at the end of the address, so prefer the last match
+        for outward, inward in reversed(POSTCODE_PATTERN.findall(address.upper())):
+            if inward and outward + inward in self.postcodes:
+                return self.postcodes[outward + inward]
+            if outward in self.districts:
+                return self.districts[outward]
+        return None
+
+
+class Geocoder:
+    def __init__(self, backend=None, cache_path: Optional[str] = None, negative_cache_days: Optional[float] = 30) -> None:
+        """
+        Initialize a caching geocoder in front of a pluggable backend.
+
+        Successful results are cached indefinitely. Addresses that could not be geocoded are cached too, for a limited
+        time, so that they are not retried on every run.
+
+        Args:
+        backend: Object with a name attribute and a geocode(address) method returning (latitude, longitude) or None.
+                 Defaults to NominatimBackend.
+        cache_path (str): Optional path of the SQLite cache. Without one, nothing is cached between runs.
+        negative_cache_days (float): Days before an address that could not be geocoded is tried again.
+        """
+        self.backend = backend or NominatimBackend()
+        self.cache = None
+        self.misses_cache = None
+        if cache_path:
+            self.cache = SqliteCache(cache_path, table=f"geocodes_{self.backend.name}")
+            self.misses_cache = SqliteCache(
+                cache_path,
+                table=f"geocode_misses_{self.backend.name}",
+                ttl=negative_cache_days * 86400 if negative_cache_days else None,
+            )
+
+    def _lookup(self, address: str) -> Optional[Coordinates]:
+        """
+        Geocodes an address with the backend and caches the outcome.
+        """
+        try:
+            with metrics.timed("geocode_seconds", backend=self.backend.name):
+                coordinates = self.backend.geocode(address)
+        except GeopyError as e:
+            # Transient service errors are not cached
+            logging.warning(f"Geocoding failed for {address}: {e}")
+            return None
+
+        key = normalise_address(address)
+        if coordinates is None:
+            logging.info(f"Unable to geocode address: {address}")
+            if self.misses_cache is not None:
+                self.misses_cache.set(key, None)
+        elif self.cache is not None:
+            self.cache.set(key, list(coordinates))
+        return coordinates
+
+    def geocode(self, address: str) -> Optional[Coordinates]:
+        """
+        Geocodes an address, using the cache where possible.
+
+        Args:
+        address (str): The address to geocode.
+
+        Returns:
+        Coordinates: (latitude, longitude), or None if the address cannot be geocoded.
+        """
+        return self.geocode_many([address])[address]
+
+    def geocode_many(self, addresses: Iterable[str]) -> Dict[str, Optional[Coordinates]]:
+        """
+        Geocodes many addresses, deduplicating them and reading the cache in bulk before calling the backend.
+
+        Args:
+        addresses (Iterable[str]): The addresses to geocode.
+
+        Returns:
+        Dict[str, Optional[Coordinates]]: (latitude, longitude) or None, keyed by the original address strings.
+        """
+        addresses = list(dict.fromkeys(addresses))
+        keys = {address: normalise_address(address) for address in addresses}
+
+        cached = self.cache.get_many(keys.values()) if self.cache is not None else {}
+        known_misses = self.misses_cache.get_many(keys.values()) if self.misses_cache is not None else {}
+
+        results: Dict[str, Optional[Coordinates]] = {}
+        # Addresses differing only in case or punctuation are looked up once
+        looked_up: Dict[str, Optional[Coordinates]] = {}
+        for address in addresses:
+            key = keys[address]
+            if key in cached:
+                results[address] = tuple(cached[key])
+            elif key in known_misses:
+                results[address] = None
+            else:
+                if key not in looked_up:
+                    looked_up[key] = self._lookup(address)
+                results[address] = looked_up[key]
+
+        from_cache = sum(1 for key in keys.values() if key in cached or key in known_misses)
+        metrics.cache_lookup("geocodes", from_cache, len(looked_up))
+        if looked_up:
+            logging.info(f"Geocoded {len(looked_up)} new addresses, {from_cache} from cache.")
+        return results
+
+    def close(self) -> None:
+        """
+        Closes the cache.
+        """
+        if self.cache is not None:
+            self.cache.close()
+            self.misses_cache.close()
@@ -0,0 +1,354 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from instrumentation import metrics
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Responses that mean the host is overloaded or briefly unavailable, and are worth retrying
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Hosts with a published usage policy. Nominatim allows at most one request per second.
+HOST_DEFAULTS = {
+    "nominatim.openstreetmap.org": {"requests_per_second": 1.0, "burst": 1, "max_concurrency": 1},
+}
+
+
+def host_of(url: str) -> str:
+    """
+    Returns the host requests to a URL are limited by, e.g. "www.rightmove.co.uk".
+    """
+    return urlsplit(url).netloc.lower()
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        """
+        Initialize a token bucket limiting the rate requests start at.
+
+        Args:
+        rate (float): Tokens added per second. 0 disables limiting.
+        burst (int): Most tokens the bucket holds, i.e. requests that may start at once after a quiet spell.
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Takes a token, sleeping until one is available.
+
+        Returns:
+        float: Seconds spent waiting.
+        """
+        with self._lock:
+            now = time.monotonic()
+            delay = max(self._paused_until - now, 0.0)
+            if self.rate:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                # Tokens may go negative: each waiter reserves the next token and sleeps until it is due
+                self._tokens -= 1
+                delay = max(delay, -self._tokens / self.rate)
+        if delay:
+            time.sleep(delay)
+        return delay
+
+    def pause(self, seconds: float) -> None:
+        """
+        Holds back every request for a while, e.g. as long as a 429 response's Retry-After header asks.
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class AdaptiveConcurrency:
+    def __init__(
+        self, max_limit: int, min_limit: int = 1, decrease_factor: float = 0.5, slow_seconds: Optional[float] = None
+    ) -> None:
+        """
+        Initialize an AIMD limit on the requests in flight to one host.
+
+        The limit starts at max_limit. Each response that is neither an error nor slow raises it by 1/limit, about one
+        per round of requests; each overload (429 or 5xx, a connection error or timeout, or a response slower than
+        slow_seconds) multiplies it by decrease_factor. Overloads within one response time of the last decrease count
+        once, as they are usually the same burst seen by every request in flight.
+
+        Args:
+        max_limit (int): Most requests in flight.
+        min_limit (int): Fewest requests in flight the limit falls to.
+        decrease_factor (float): Factor the limit is multiplied by on overload.
+        slow_seconds (float): Responses slower than this count as overload. None disables the check.
+        """
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.decrease_factor = decrease_factor
+        self.slow_seconds = slow_seconds
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> None:
+        """
+        Waits until fewer requests are in flight than the limit, then counts one more.
+        """
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, seconds: float, overloaded: bool = False) -> None:
+        """
+        Counts a request as finished and adjusts the limit.
+
+        Args:
+        seconds (float): How long the request took.
+        overloaded (bool): The host answered 429 or 5xx, or did not answer.
+        """
+        overloaded = overloaded or (self.slow_seconds is not None and seconds > self.slow_seconds)
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if overloaded:
+                if now - self._last_decrease > seconds:
+                    self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class HostLimiter:
+    def __init__(
+        self,
+        requests_per_second: float = 4.0,
+        burst: int = 4,
+        max_concurrency: int = 8,
+        slow_seconds: Optional[float] = 10.0,
+    ) -> None:
+        """
+        Initialize the limits on requests to one host: a token bucket for their rate and an adaptive limit on how many
+        are in flight.
+
+        Args:
+        requests_per_second (float): Most requests started per second. 0 disables rate limiting.
+        burst (int): Requests that may start at once after a quiet spell.
+        max_concurrency (int): Most requests in flight.
+        slow_seconds (float): Responses slower than this lower the concurrency limit.
+        """
+        self.bucket = TokenBucket(requests_per_second, burst)
+        self.concurrency = AdaptiveConcurrency(max_concurrency, slow_seconds=slow_seconds)
+
+
+class HttpClient:
+    def __init__(self, **settings) -> None:
+        """
+        Initialize a client shared by every module that makes outbound requests.
+
+        Requests go over one pooled requests.Session. Each host gets a token bucket and an AIMD concurrency limit, so
+        traffic to one host backs off when it answers 429 or 5xx or slows down, and recovers when it is healthy, without
+        holding up traffic to other hosts. Failed requests are retried with exponential backoff and full jitter, and
+        every request has a timeout, so a hung connection cannot stall a stage.
+
+        Traffic that does not go through the session, such as Selenium page loads and geopy, is limited with
+        throttle(url).
+
+        Args:
+        settings: See configure.
+        """
+        self._lock = threading.Lock()
+        self.session = None
+        self.configure(**settings)
+
+    def configure(
+        self,
+        requests_per_second: float = 4.0,
+        burst: int = 4,
+        max_concurrency: int = 8,
+        slow_seconds: Optional[float] = 10.0,
+        hosts: Optional[Dict[str, Dict]] = None,
+        retries: int = 3,
+        backoff_seconds: float = 0.5,
+        max_backoff_seconds: float = 30.0,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        pool_size: int = 16,
+        user_agent: str = "Mozilla/5.0",
+    ) -> None:
+        """
+        Applies new settings, e.g. from the `http` section of config.yaml. Limits already in use are replaced.
+
+        Args:
+        requests_per_second (float): Most requests started per second to each host. 0 disables rate limiting.
+        burst (int): Requests that may start at once to a host after a quiet spell.
+        max_concurrency (int): Most requests in flight to each host.
+        slow_seconds (float): Responses slower than this lower a host's concurrency limit. None disables the check.
+        hosts (Dict[str, Dict]): Per-host overrides of the four settings above, keyed by host name.
+        retries (int): Retries of a request after a connection error, timeout, 429 or 5xx.
+        backoff_seconds (float): Base of the exponential backoff between retries.
+        max_backoff_seconds (float): Longest wait between retries.
+        connect_timeout (float): Seconds to wait for a connection.
+        read_timeout (float): Seconds to wait between bytes of the response.
+        pool_size (int): Maximum number of pooled keep-alive connections per host.
+        user_agent (str): User-Agent header sent with every request.
+        """
+        with self._lock:
+            self.defaults = {
+                "requests_per_second": requests_per_second,
+                "burst": burst,
+                "max_concurrency": max_concurrency,
+                "slow_seconds": slow_seconds,
+            }
+            self.hosts = {**HOST_DEFAULTS, **(hosts or {})}
+            self.retries = retries
+            self.backoff_seconds = backoff_seconds
+            self.max_backoff_seconds = max_backoff_seconds
+            self.timeout = (connect_timeout, read_timeout)
+            self._limiters: Dict[str, HostLimiter] = {}
+
+            if self.session is not None:
+                self.session.close()
+            self.session = requests.Session()
+            self.session.headers.update({"User-Agent": user_agent})
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+
+    def limiter(self, host: str) -> HostLimiter:
+        """
+        Returns the limits on requests to a host, created on first use.
+        """
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = HostLimiter(**{**self.defaults, **self.hosts.get(host, {})})
+                self._limiters[host] = limiter
+            return limiter
+
+    @contextmanager
+    def throttle(self, url: str) -> Iterator[Dict]:
+        """
+        Holds a slot for one request to a URL's host while the block runs, waiting for the host's rate and concurrency
+        limits first. An exception in the block, or setting "overloaded" in the yielded dict, counts as overload.
+
+        Args:
+        url (str): The URL about to be requested.
+
+        Yields:
+        Dict: Outcome of the request, with "overloaded" set to False.
+        """
+        host = host_of(url)
+        limiter = self.limiter(host)
+        limiter.concurrency.acquire()
+        outcome = {"overloaded": False}
+        start = None
+        try:
+            waited = limiter.bucket.acquire()
+            if waited:
+                metrics.observe("http_throttle_seconds", waited, host=host)
+            start = time.monotonic()
+            yield outcome
+        except Exception:
+            outcome["overloaded"] = True
+            raise
+        finally:
+            seconds = time.monotonic() - start if start is not None else 0.0
+            limiter.concurrency.release(seconds, outcome["overloaded"])
+            if outcome["overloaded"]:
+                metrics.increment("http_overloads_total", host=host)
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        Returns the wait before a retry: the server's Retry-After if it gave one in seconds, otherwise a random time
+        up to an exponentially growing cap ("full jitter"), so that clients that failed together do not retry together.
+        """
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff_seconds)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2**attempt))
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a request within the host's limits, retrying connection errors, timeouts, 429 and 5xx responses.
+
+        Args:
+        method (str): HTTP method, e.g. "GET".
+        url (str): The URL.
+        kwargs: Passed on to requests.Session.request. The timeout defaults to the client's.
+
+        Returns:
+        requests.Response: The response. After the last retry, a 429 or 5xx response is returned as it is.
+
+        Raises:
+        requests.RequestException: If the last attempt fails to connect or times out.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        host = host_of(url)
+        for attempt in range(self.retries + 1):
+            try:
+                with self.throttle(url) as outcome, metrics.timed("http_request_seconds", host=host):
+                    response = self.session.request(method, url, **kwargs)
+                    outcome["overloaded"] = response.status_code in RETRY_STATUSES
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.retries:
+                    raise
+                delay = self._backoff(attempt)
+                logging.warning(f"{method} {url} failed ({e}), retrying in {delay:.1f}s")
+                metrics.increment("http_retries_total", host=host, reason=type(e).__name__)
+                time.sleep(delay)
+                continue
+
+            if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                return response
+            delay = self._backoff(attempt, response.headers.get("Retry-After"))
+            if response.status_code == 429:
+                # Every request to the host waits, not just this one
+                self.limiter(host).bucket.pause(delay)
+            logging.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.1f}s")
+            metrics.increment("http_retries_total", host=host, reason=str(response.status_code))
+            response.close()
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        """
+        Closes the pooled connections. The client can still be used; it reconnects as needed.
+        """
+        with self._lock:
+            self.session.close()
+
+
+# Shared by every module, configured from config.yaml by main.py and watch.py
+http_client = HttpClient()
+
+
+def configure_http_client(settings: Optional[Dict]) -> HttpClient:
+    """
+    Applies the `http` section of config.yaml to the shared client.
+
+    Args:
+    settings (Dict): The settings, as accepted by HttpClient.configure. None keeps the defaults.
+
+    Returns:
+    HttpClient: The shared client.
+    """
+    http_client.configure(**(settings or {}))
+    return http_client
@@ -0,0 +1,380 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Prefix of every metric name in the Prometheus textfile
+METRIC_PREFIX = "rightmove"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape_label_value(value) -> str:
+    """
+    Escapes a label value for the Prometheus text exposition format, in which backslashes, double quotes and line
+    feeds must be escaped, e.g. in an address or URL.
+    """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """
+        A latency histogram with fixed buckets, as in Prometheus. Not thread safe on its own; see Metrics.
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates a quantile as the upper bound of the bucket it falls in.
+        """
+        target = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return self.max
+
+    def cumulative_counts(self) -> List[Tuple[str, int]]:
+        """
+        Returns (upper bound, count of observations at or below it) for every bucket, ending with +Inf.
+        """
+        cumulative = 0
+        result = []
+        for bound, count in zip(list(self.buckets) + [float("inf")], self.counts):
+            cumulative += count
+            result.append(("+Inf" if bound == float("inf") else repr(bound), cumulative))
+        return result
+
+
+class Metrics:
+    def __init__(self) -> None:
+        """
+        Initialize a thread-safe registry of counters and latency histograms.
+
+        Recording is a dictionary update under a lock, so it is cheap enough to leave on in every run. Metrics are
+        identified by a name and optional labels, e.g. increment("rejections_total", stage="travel_time").
+        """
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.started = time.time()
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, str]) -> Tuple[str, Labels]:
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        """
+        Adds to a counter.
+
+        Args:
+        name (str): The counter name, e.g. "network_bytes_total".
+        value (float): The amount to add.
+        **labels (str): Labels identifying the series, e.g. source="search".
+        """
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        """
+        Records a latency in a histogram.
+
+        Args:
+        name (str): The histogram name, e.g. "stage_seconds".
+        seconds (float): The observed latency.
+        **labels (str): Labels identifying the series.
+        """
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timed(self, name: str, **labels: str) -> Iterator[None]:
+        """
+        Records the time spent in a with block in a histogram, whether or not it raises.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def cache_lookup(self, cache: str, hits: int, misses: int) -> None:
+        """
+        Counts cache hits and misses, from which the report computes hit rates.
+
+        Args:
+        cache (str): The cache name, e.g. "geocodes".
+        hits (int): Number of lookups answered by the cache.
+        misses (int): Number of lookups that were not.
+        """
+        if hits:
+            self.increment("cache_lookups_total", hits, cache=cache, result="hit")
+        if misses:
+            self.increment("cache_lookups_total", misses, cache=cache, result="miss")
+
+    def reset(self) -> None:
+        """
+        Forgets everything recorded so far.
+        """
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+    def report(self) -> Dict:
+        """
+        Summarises everything recorded so far.
+
+        Returns:
+        Dict: Counters, histograms with quantile estimates, and cache hit rates, ready to be written as JSON.
+        """
+        with self._lock:
+            counters = dict(self.counters)
+            histograms = {
+                key: {
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "max": histogram.max,
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                    "buckets": dict(histogram.cumulative_counts()),
+                }
+                for key, histogram in self.histograms.items()
+            }
+
+        cache_lookups: Dict[str, Dict[str, float]] = {}
+        for (name, labels), value in counters.items():
+            if name == "cache_lookups_total":
+                labels = dict(labels)
+                cache_lookups.setdefault(labels["cache"], {"hit": 0, "miss": 0})[labels["result"]] += value
+
+        return {
+            "started": self.started,
+            "duration_seconds": time.time() - self.started,
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value} for (name, labels), value in sorted(counters.items())
+            ],
+            "histograms": [
+                {"name": name, "labels": dict(labels), **summary} for (name, labels), summary in sorted(histograms.items())
+            ],
+            "cache_hit_rates": {
+                cache: lookups["hit"] / (lookups["hit"] + lookups["miss"]) for cache, lookups in cache_lookups.items()
+            },
+        }
+
+    def prometheus_text(self) -> str:
+        """
+        Formats everything recorded so far for the Prometheus node exporter's textfile collector.
+
+        Returns:
+        str: The metrics in the Prometheus text exposition format.
+        """
+
+        def series(name: str, labels: Labels, extra: Labels = ()) -> str:
+            labels = labels + extra
+            if not labels:
+                return f"{METRIC_PREFIX}_{name}"
+            formatted = ",".join(f'{key}="{_escape_label_value(value)}"' for key, value in labels)
+            return f"{METRIC_PREFIX}_{name}{{{formatted}}}"
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (key, histogram.cumulative_counts(), histogram.sum, histogram.count)
+                for key, histogram in self.histograms.items()
+            )
+
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name} counter")
+                typed.add(name)
+            lines.append(f"{series(name, labels)} {value}")
+        for (name, labels), buckets, total, count in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name} histogram")
+                typed.add(name)
+            for bound, cumulative in buckets:
+                lines.append(f"{series(name + '_bucket', labels, (('le', bound),))} {cumulative}")
+            lines.append(f"{series(name + '_sum', labels)} {total}")
+            lines.append(f"{series(name + '_count', labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, directory: str, name: str = "run_report") -> None:
+        """
+        Writes the report as JSON and as a Prometheus textfile.
+
+        Args:
+        directory (str): Directory for the report files. Created if needed.
+        name (str): Base name of the files, e.g. run_report.json and run_report.prom.
+        """
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{name}.json"), "w") as file:
+            json.dump(self.report(), file, indent=2)
+
+        # Write then rename, so the textfile collector never reads a partial file
+        prometheus_path = os.path.join(directory, f"{name}.prom")
+        with open(prometheus_path + ".tmp", "w") as file:
+            file.write(self.prometheus_text())
+        os.replace(prometheus_path + ".tmp", prometheus_path)
+        logging.info(f"Wrote run report to {directory}")
+
+    def log_summary(self) -> None:
+        """
+        Logs the count, mean and 95th percentile of every histogram, and the cache hit rates.
+        """
+        report = self.report()
+        for histogram in report["histograms"]:
+            labels = ", ".join(f"{key}={value}" for key, value in histogram["labels"].items())
+            mean = histogram["sum"] / histogram["count"] if histogram["count"] else 0.0
+            logging.info(
+                f"{histogram['name']}({labels}): {histogram['count']} calls, "
+                f"mean {mean:.3f}s, p95 <= {histogram['p95']}s, total {histogram['sum']:.1f}s"
+            )
+        for cache, hit_rate in report["cache_hit_rates"].items():
+            logging.info(f"Cache {cache}: {hit_rate:.0%} hit rate")
+
+
+# Run-wide registry that every module records into
+metrics = Metrics()
+
+
+class StageProfiler:
+    def __init__(self, profiler: str = "cProfile") -> None:
+        """
+        Initialize a profiler for one pipeline stage.
+
+        Each call to the wrapped function is profiled separately and the results are merged. Only one call is profiled
+        at a time, as from Python 3.12 only one profiler can be active in a process. Calls made meanwhile on the stage's
+        other worker threads run unprofiled rather than waiting, so profiling a stage does not serialise its workers.
+
+        Args:
+        profiler (str): "cProfile", or "pyinstrument" if it is installed.
+
+        Raises:
+        ValueError: If the profiler is unknown.
+        """
+        if profiler not in ("cProfile", "pyinstrument"):
+            raise ValueError(f"Unknown profiler: {profiler}")
+        self.profiler = profiler
+        self.profiled_calls = 0
+        self.unprofiled_calls = 0
+        self._lock = threading.Lock()
+        self._active = threading.Lock()
+        self._stats = None
+        self._session = None
+
+    def _run_pyinstrument(self, func: Callable, args, kwargs):
+        from pyinstrument import Profiler
+
+        profiler = Profiler()
+        profiler.start()
+        with self._lock:
+            self.profiled_calls += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            session = profiler.stop()
+            with self._lock:
+                self._session = session if self._session is None else type(session).combine(self._session, session)
+
+    def _run_cprofile(self, func: Callable, args, kwargs):
+        import cProfile
+        import pstats
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Another profiling tool is already active, e.g. the whole run is under `python -m cProfile`
+            logging.warning(f"Not profiling this call: {e}")
+            with self._lock:
+                self.unprofiled_calls += 1
+            return func(*args, **kwargs)
+        with self._lock:
+            self.profiled_calls += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            with self._lock:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profile)
+                else:
+                    self._stats.add(profile)
+
+    def wrap(self, func: Callable) -> Callable:
+        """
+        Returns func wrapped so that every call is profiled, unless another call is being profiled at the time.
+        """
+
+        def profiled(*args, **kwargs):
+            if not self._active.acquire(blocking=False):
+                with self._lock:
+                    self.unprofiled_calls += 1
+                return func(*args, **kwargs)
+            try:
+                if self.profiler == "pyinstrument":
+                    return self._run_pyinstrument(func, args, kwargs)
+                return self._run_cprofile(func, args, kwargs)
+            finally:
+                self._active.release()
+
+        return profiled
+
+    def write(self, path: str) -> Optional[str]:
+        """
+        Writes the merged profile: pstats data for cProfile (view with `python -m pstats`), HTML for pyinstrument.
+
+        Args:
+        path (str): Path of the output file, without extension.
+
+        Returns:
+        str: The path written, or None if nothing was profiled.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._lock:
+            if self._session is not None:
+                from pyinstrument.renderers import HTMLRenderer
+
+                path += ".html"
+                with open(path, "w") as file:
+                    file.write(HTMLRenderer().render(self._session))
+            elif self._stats is not None:
+                path += ".pstats"
+                self._stats.dump_stats(path)
+            else:
+                return None
+        logging.info(
+            f"Wrote stage profile to {path}, covering {self.profiled_calls} calls. {self.unprofiled_calls} calls were "
+            f"not profiled, as they overlapped a profiled call or another profiler was active."
+        )
+        return path
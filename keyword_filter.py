@@ -0,0 +1,123 @@
+import re
+from typing import Dict, Iterable, List, Optional
+
+# Marks the end of a keyword in the token trie
+_KEYWORD = ""
+
+# Outward code of a UK postcode, split into area and district, e.g. "E" and "1W" in "E1W 3TJ"
+OUTWARD_CODE_PATTERN = re.compile(r"\b([A-Z]{1,2})(\d[A-Z\d]?)(?:\s*\d[A-Z]{2})?\b")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits text into lower case words, ignoring punctuation, so that "E3," and "e3" are the same token.
+
+    Args:
+    text (str): The text to split.
+
+    Returns:
+    List[str]: The words.
+    """
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+class _TokenTrie:
+    def __init__(self, keywords: Iterable[str]) -> None:
+        """
+        A trie over the words of some keywords, for finding whole-word keyword matches in a single pass over a text.
+
+        Matching walks the trie from each word of the text, so its cost depends on the length of the text and of the
+        longest keyword, but not on how many keywords there are.
+        """
+        self.root: Dict = {}
+        for keyword in keywords:
+            tokens = tokenize(keyword)
+            if not tokens:
+                continue
+            node = self.root
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node[_KEYWORD] = keyword
+
+    def find(self, text: str) -> Optional[str]:
+        """
+        Returns the first keyword found in the text, or None.
+        """
+        if not self.root:
+            return None
+        tokens = tokenize(text)
+        for start in range(len(tokens)):
+            node = self.root
+            for token in tokens[start:]:
+                node = node.get(token)
+                if node is None:
+                    break
+                if _KEYWORD in node:
+                    return node[_KEYWORD]
+        return None
+
+
+class KeywordFilter:
+    def __init__(
+        self,
+        exclude: Iterable[str] = (),
+        exclude_descriptions: Iterable[str] = (),
+        include: Iterable[str] = (),
+        exclude_postcode_districts: Iterable[str] = (),
+    ) -> None:
+        """
+        Initialize a filter that rejects properties by keywords in their address and description.
+
+        Keywords match whole words, ignoring case and punctuation, so "Canning Town" matches "canning town," but "E1"
+        does not match "E14". Everything is compiled once here, so checking a property costs the same however many
+        keywords are configured.
+
+        Args:
+        exclude (Iterable[str]): Keywords that reject a property when found in its address.
+        exclude_descriptions (Iterable[str]): Keywords that reject a property when found in its description.
+        include (Iterable[str]): Keywords that keep a property when found in its address or description, even if it
+                                 matches an exclusion, e.g. a development inside an excluded postcode district.
+        exclude_postcode_districts (Iterable[str]): Postcode districts or areas that reject a property when its address
+                                                    is in them. A district covers its sub-districts ("E1" covers
+                                                    "E1W" but not "E14") and an area covers its districts ("E" covers
+                                                    "E14" but not "EC1A").
+        """
+        self.exclude = _TokenTrie(exclude)
+        self.exclude_descriptions = _TokenTrie(exclude_descriptions)
+        self.include = _TokenTrie(include)
+        self.exclude_postcode_districts = {district.strip().upper() for district in exclude_postcode_districts}
+        self.exclude_postcode_districts.discard("")
+
+    def _excluded_district(self, address: str) -> Optional[str]:
+        """
+        Returns the excluded postcode district or area an address is in, or None.
+        """
+        for area, district in OUTWARD_CODE_PATTERN.findall(address.upper()):
+            outward_code = area + district
+            # The district itself, the district of a sub-district ("E1" for "E1W"), or the whole area
+            candidates = (outward_code, outward_code[:-1] if outward_code[-1].isalpha() else None, area)
+            for candidate in candidates:
+                if candidate in self.exclude_postcode_districts:
+                    return candidate
+        return None
+
+    def excluded_by(self, address: str, description: str = "") -> Optional[str]:
+        """
+        Checks a property's address and description against the filter.
+
+        Args:
+        address (str): The property's display address.
+        description (str): The property's description, e.g. the summary on its search result card.
+
+        Returns:
+        str: The keyword or postcode district that excludes the property, or None if it is kept.
+        """
+        excluded_by = self.exclude.find(address)
+        if excluded_by is None and description:
+            excluded_by = self.exclude_descriptions.find(description)
+        if excluded_by is None and self.exclude_postcode_districts:
+            excluded_by = self._excluded_district(address)
+
+        if excluded_by is not None and (self.include.find(address) or self.include.find(description)):
+            return None
+        return excluded_by
@@ -0,0 +1,142 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+_MISSING = object()
+
+
+class SqliteCache:
+    def __init__(self, path: str, table: str = "cache", ttl: Optional[float] = None) -> None:
+        """
+        Initialize a small persistent key-value cache stored in a SQLite table. Values are stored as JSON.
+
+        The cache is safe to share between threads.
+
+        Args:
+        path (str): Path of the SQLite database file. Parent directories are created if needed.
+        table (str): Name of the table holding this cache, so several caches can share one file.
+        ttl (float): Optional time-to-live in seconds. Expired entries are treated as missing.
+        """
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _is_fresh(self, updated_at: float) -> bool:
+        """
+        Checks an entry's timestamp against the TTL.
+        """
+        return self.ttl is None or time.time() - updated_at <= self.ttl
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """
+        Returns the cached value for a key, or default if it is missing or expired.
+
+        Args:
+        key (str): The cache key.
+        default (Any): Value returned on a miss.
+
+        Returns:
+        Any: The cached value or default.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT value, updated_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or not self._is_fresh(row[1]):
+            return default
+        return json.loads(row[0])
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Returns the cached values for the keys that are present and fresh.
+
+        Args:
+        keys (Iterable[str]): The cache keys.
+
+        Returns:
+        Dict[str, Any]: Cached values keyed by cache key. Missing keys are left out.
+        """
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        # Stay well under SQLite's bound parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            with self._lock:
+                rows = self._connection.execute(
+                    f"SELECT key, value, updated_at FROM {self.table} WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+            found.update({key: json.loads(value) for key, value, updated_at in rows if self._is_fresh(updated_at)})
+        return found
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Stores a JSON-serialisable value under a key.
+
+        Args:
+        key (str): The cache key.
+        value (Any): The value to store. None is a valid value, e.g. for negative caching.
+        """
+        self.set_many({key: value})
+
+    def set_many(self, items: Dict[str, Any]) -> None:
+        """
+        Stores several values in one transaction.
+
+        Args:
+        items (Dict[str, Any]): Values keyed by cache key.
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, updated_at) VALUES (?, ?, ?)",
+                [(key, json.dumps(value), now) for key, value in items.items()],
+            )
+
+    def delete(self, key: str) -> bool:
+        """
+        Removes a key from the cache.
+
+        Args:
+        key (str): The cache key.
+
+        Returns:
+        bool: True if the key was present.
+        """
+        with self._lock, self._connection:
+            cursor = self._connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        return cursor.rowcount > 0
+
+    def clear(self) -> int:
+        """
+        Removes every entry from the cache.
+
+        Returns:
+        int: The number of entries removed.
+        """
+        with self._lock, self._connection:
+            cursor = self._connection.execute(f"DELETE FROM {self.table}")
+        return cursor.rowcount
+
+    def close(self) -> None:
+        """
+        Closes the database connection.
+        """
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,186 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+from instrumentation import metrics
+from rightmove_api import property_id_from_url
+
+PASSED = "passed"
+REJECTED = "rejected"
+
+
+class SeenListings:
+    def __init__(self) -> None:
+        """
+        Initialize a run-wide record of the listings already found, keyed by Rightmove property ID.
+
+        Overlapping search locations return many of the same listings. Checking each listing here straight after the
+        search means only its first sighting goes through the filter stages. The set is safe to share between threads.
+        """
+        self._seen = set()
+        self._lock = threading.Lock()
+        self.duplicates = Counter()
+
+    def first_sighting(self, property_detail: Dict, location: str = "") -> bool:
+        """
+        Records a listing found in the search results.
+
+        Args:
+        property_detail (Dict): The property details read from the search result card.
+        location (str): The search location, used to count duplicates per location.
+
+        Returns:
+        bool: True if this run has not seen the listing before.
+        """
+        property_id = property_id_from_url(property_detail["url"])
+        with self._lock:
+            if property_id in self._seen:
+                self.duplicates[location] += 1
+                metrics.increment("rejections_total", stage="search", reason="duplicate")
+                return False
+            self._seen.add(property_id)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+
+class ListingStore:
+    def __init__(self, path: str) -> None:
+        """
+        Initialize a persistent store of every listing seen, keyed by Rightmove property ID.
+
+        Each listing keeps the fields read from its search result card, the outcome of its last evaluation (passed, or
+        the stage that rejected it) with everything the stages recorded along the way, and when it was first seen, last
+        seen and last evaluated. A listing only needs evaluating again when it is new, its price changed, or its last
+        evaluation did not finish.
+
+        The store is safe to share between threads.
+
+        Args:
+        path (str): Path of the SQLite database file. Parent directories are created if needed.
+        """
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS listings (
+                    property_id TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    price_pcm TEXT NOT NULL,
+                    card TEXT NOT NULL,
+                    outcome TEXT,
+                    rejected_by TEXT,
+                    record TEXT,
+                    first_seen REAL NOT NULL,
+                    last_seen REAL NOT NULL,
+                    evaluated_at REAL
+                )
+                """
+            )
+
+    def record_seen(self, property_detail: Dict) -> bool:
+        """
+        Records a listing found in the search results.
+
+        A price change clears the listing's previous outcome, since a cheaper listing may now be worth a look.
+
+        Args:
+        property_detail (Dict): The property details read from the search result card.
+
+        Returns:
+        bool: True if the listing needs evaluating: it is new, its price changed, or it has no outcome yet.
+        """
+        property_id = property_id_from_url(property_detail["url"])
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT price_pcm, outcome FROM listings WHERE property_id = ?", (property_id,)
+            ).fetchone()
+            if row is None:
+                self._connection.execute(
+                    "INSERT INTO listings (property_id, url, price_pcm, card, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?)",
+                    (property_id, property_detail["url"], property_detail["price_pcm"], json.dumps(property_detail), now, now),
+                )
+                return True
+
+            price_changed = row[0] != property_detail["price_pcm"]
+            if price_changed:
+                self._connection.execute(
+                    """
+                    UPDATE listings SET url = ?, price_pcm = ?, card = ?, last_seen = ?, outcome = NULL, rejected_by = NULL
+                    WHERE property_id = ?
+                    """,
+                    (property_detail["url"], property_detail["price_pcm"], json.dumps(property_detail), now, property_id),
+                )
+            else:
+                self._connection.execute("UPDATE listings SET last_seen = ? WHERE property_id = ?", (now, property_id))
+        return price_changed or row[1] is None
+
+    def record_outcome(self, property_detail: Dict, rejected_by: Optional[str] = None) -> None:
+        """
+        Records the outcome of evaluating a listing, along with everything the stages added to its details.
+
+        Args:
+        property_detail (Dict): The property details, e.g. with its travel time verdict, floor area and letting details.
+        rejected_by (str): Name of the stage that rejected the listing, or None if it passed every stage.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE listings SET outcome = ?, rejected_by = ?, record = ?, evaluated_at = ? WHERE property_id = ?",
+                (
+                    REJECTED if rejected_by else PASSED,
+                    rejected_by,
+                    json.dumps(property_detail),
+                    time.time(),
+                    property_id_from_url(property_detail["url"]),
+                ),
+            )
+
+    def passed_listings(self, seen_within_days: Optional[float] = None) -> List[Dict]:
+        """
+        Returns the recorded details of every listing whose last evaluation passed.
+
+        Args:
+        seen_within_days (float): Optionally leave out listings not seen in the search results for this many days.
+
+        Returns:
+        List[Dict]: The property details, as recorded by record_outcome.
+        """
+        query = "SELECT record FROM listings WHERE outcome = ?"
+        parameters = [PASSED]
+        if seen_within_days:
+            query += " AND last_seen >= ?"
+            parameters.append(time.time() - seen_within_days * 86400)
+        with self._lock:
+            rows = self._connection.execute(query, parameters).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def outcome_counts(self) -> Dict[str, int]:
+        """
+        Counts the stored listings by outcome: passed, the rejecting stage, or pending.
+
+        Returns:
+        Dict[str, int]: Number of listings for each outcome.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT COALESCE(rejected_by, outcome, 'pending'), COUNT(*) FROM listings GROUP BY 1"
+            ).fetchall()
+        return dict(rows)
+
+    def close(self) -> None:
+        """
+        Closes the database connection.
+        """
+        with self._lock:
+            self._connection.close()
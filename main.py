@@ -1,12 +1,27 @@
+import argparse
 import logging
+from contextlib import closing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Optional
+from driver_pool import BrowserProfile, DriverPool
+from floorplan_downloader import FloorplanDownloader
+from http_client import configure_http_client, http_client
+from instrumentation import StageProfiler, metrics
+from listing_store import ListingStore, SeenListings
+from pipeline import Stage, StreamingPipeline
+from records import PropertyBatch
+from rightmove_api import RIGHTMOVE_BASE_URL, LocationIdentifierCache, RightmoveSearchClient
 from rightmove_scraper import RightmoveScraper
-from floorplan_analyser import FloorplanAnalyser
-from travel_time import IsochroneMapAnalyser
-import pandas as pd
 import os
 import yaml
 from tqdm import tqdm
 
+# The analysers pull in transformers, shapely, geopy and pandas, so they are imported when first needed
+if TYPE_CHECKING:
+    from floorplan_analyser import FloorplanAnalyser
+    from geocoding import Geocoder
+    from travel_time import IsochroneMapAnalyser
+
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
@@ -16,104 +31,618 @@ def load_config(config_file):
         return yaml.safe_load(file)
 
 
-def main():
-    config = load_config("config.yaml")
+def create_location_cache(config: dict) -> LocationIdentifierCache:
+    """
+    Opens the persistent location identifier cache in the configured cache directory.
+    """
+    return LocationIdentifierCache(
+        os.path.join(config.get("cache_directory", "cache"), "location_identifiers.sqlite"),
+        ttl_days=config.get("location_cache_ttl_days", 90),
+    )
 
-    # Create 'images' directory if it doesn't exist
-    if not os.path.exists(config["images_directory"]):
-        os.makedirs(config["images_directory"])
 
-    # Initialize floorplan analyser
-    floorplan_analyser = FloorplanAnalyser()
-
-    # Initialize travel time analyser only if target location is provided
-    travel_analyser = None
-    if "target_location" in config and config["target_location"]:
-        logging.info("Using travel time analysis.")
-        travel_analyser = IsochroneMapAnalyser()
-        travel_analyser.create_isochrone_map(config["target_location"], config["travel_time_radius"])
+def create_listing_store(config: dict) -> ListingStore:
+    """
+    Opens the persistent listing store in the configured cache directory.
+    """
+    return ListingStore(os.path.join(config.get("cache_directory", "cache"), "listings.sqlite"))
+
+
+def create_geocoder(config: dict) -> "Geocoder":
+    """
+    Builds the configured geocoding backend behind a persistent cache in the cache directory.
+    """
+    from geocoding import Geocoder, NominatimBackend, PostcodeTableBackend
+
+    geocoding_settings = config.get("geocoding", {})
+    if geocoding_settings.get("backend", "nominatim") == "postcode_table":
+        backend = PostcodeTableBackend(geocoding_settings["postcode_table"])
     else:
+        backend = NominatimBackend()
+    return Geocoder(
+        backend,
+        cache_path=os.path.join(config.get("cache_directory", "cache"), "geocodes.sqlite"),
+        negative_cache_days=geocoding_settings.get("negative_cache_days", 30),
+    )
+
+
+def create_floorplan_analyser(config: dict) -> "FloorplanAnalyser":
+    """
+    Connects to the floorplan model server if one is configured and running, otherwise builds a local analyser.
+
+    Neither loads the model here: the local analyser loads it the first time a floorplan needs it, and the remote one
+    only if the server stops answering.
+    """
+    inference_settings = config.get("inference", {})
+    if inference_settings.get("backend") == "onnx":
+        logging.warning(
+            "The ONNX backend is experimental. Check its answers against the PyTorch backend with "
+            "benchmarks/onnx_accuracy.py before relying on it."
+        )
+    intra_op_threads = inference_settings.get("intra_op_threads", 0)
+    inference_processes = config.get("pipeline", {}).get("inference_processes", 0)
+    if not intra_op_threads and inference_processes:
+        # Share the cores between the worker processes rather than each using all of them
+        intra_op_threads = max(1, (os.cpu_count() or 1) // inference_processes)
+    settings = {
+        "cache_path": os.path.join(config.get("cache_directory", "cache"), "floorplan_answers.sqlite"),
+        "backend": inference_settings.get("backend", "pytorch"),
+        "onnx_directory": os.path.join(config.get("cache_directory", "cache"), "onnx"),
+        "intra_op_threads": intra_op_threads or None,
+    }
+
+    socket_path = config.get("floorplan_model_server")
+    if socket_path:
+        from model_server import RemoteFloorplanAnalyser
+
+        remote_analyser = RemoteFloorplanAnalyser(
+            socket_path, timeout=config.get("floorplan_model_server_timeout", 300), **settings
+        )
+        if remote_analyser.is_available():
+            logging.info(f"Using floorplan model server at {socket_path}.")
+            return remote_analyser
+        logging.warning(f"Floorplan model server at {socket_path} is not running. Loading the model locally.")
+
+    from floorplan_analyser import FloorplanAnalyser
+
+    return FloorplanAnalyser(**settings)
+
+
+def create_travel_analyser(config: dict) -> Optional["IsochroneMapAnalyser"]:
+    """
+    Builds the travel time analyser and its combined isochrone map, or returns None if no commute targets are given.
+    """
+    commute_targets = list(config.get("commute_targets") or [])
+    if config.get("target_location"):
+        commute_targets.append({"location": config["target_location"], "travel_time": config["travel_time_radius"]})
+    if not commute_targets:
         logging.info("No target location provided. Not using travel time analysis.")
+        return None
 
-    final_properties = []
+    from travel_time import IsochroneMapAnalyser
 
-    for borough in config["london_boroughs"]:
-        logging.info(f"Processing borough: {borough}")
-        try:
-            # Initialize the scraper
-            scraper = RightmoveScraper(
-                location=borough,
-                min_price=config["scraper_settings"]["min_price"],
-                max_price=config["scraper_settings"]["max_price"],
-                min_bedrooms=config["scraper_settings"]["min_bedrooms"],
-                max_bedrooms=config["scraper_settings"]["max_bedrooms"],
-                min_bathrooms=config["scraper_settings"]["min_bathrooms"],
-                property_type=config["scraper_settings"]["property_type"],
-                min_let_date=config["scraper_settings"]["min_let_date"],
-                floorplan_required=config["scraper_settings"]["floorplan_required"],
-                max_days_since_added=config["scraper_settings"]["max_days_since_added"],
-                exclude=config["scraper_settings"]["exclude"],
+    logging.info(f"Using travel time analysis for {len(commute_targets)} commute targets.")
+    geocoder = create_geocoder(config)
+    travel_analyser = IsochroneMapAnalyser(
+        geocoder=geocoder,
+        isoline_cache_directory=os.path.join(config.get("cache_directory", "cache"), "isolines"),
+    )
+    try:
+        travel_analyser.create_combined_isochrone_map(commute_targets, match=config.get("commute_match", "all"))
+    except Exception:
+        geocoder.close()
+        raise
+    return travel_analyser
+
+
+def create_browser_profile(config: dict) -> BrowserProfile:
+    """
+    Builds the browser profile Chrome sessions are launched with, "lean" or "default", from the driver pool settings.
+    """
+    pool_settings = config.get("driver_pool", {})
+    headless = pool_settings.get("headless", True)
+    user_data_directory = pool_settings.get("user_data_directory") or None
+    profile = pool_settings.get("profile", "default")
+    if profile == "lean":
+        return BrowserProfile.lean(
+            headless=headless,
+            user_data_directory=user_data_directory,
+            blocked_url_patterns=tuple(pool_settings.get("blocked_url_patterns") or ()),
+        )
+    if profile != "default":
+        raise ValueError(f"Unknown browser profile: {profile}")
+    return BrowserProfile(headless=headless, user_data_directory=user_data_directory)
+
+
+def create_driver_pool(config: dict) -> DriverPool:
+    """
+    Builds the pool of Chrome sessions. Sessions are only started when first leased.
+    """
+    pool_settings = config.get("driver_pool", {})
+    return DriverPool(
+        size=pool_settings.get("size", 1),
+        max_pages_per_driver=pool_settings.get("max_pages_per_driver", 0),
+        profile=create_browser_profile(config),
+    )
+
+
+def create_inference_executor(config: dict, floorplan_analyser) -> Optional[ProcessPoolExecutor]:
+    """
+    Builds a process pool running floorplan inference, each process with its own model, if `inference_processes` is
+    set and the model runs locally. Otherwise returns None and inference runs in this process.
+    """
+    inference_processes = config.get("pipeline", {}).get("inference_processes", 0)
+    if not inference_processes or not floorplan_analyser.local_model:
+        return None
+
+    from floorplan_analyser import init_process_worker
+
+    if floorplan_analyser.backend == "onnx":
+        # Export the quantised model once here, rather than in every worker process at once
+        floorplan_analyser.model
+    return ProcessPoolExecutor(
+        max_workers=inference_processes, initializer=init_process_worker, initargs=(floorplan_analyser.settings(),)
+    )
+
+
+def output_criteria(config: dict) -> dict:
+    """
+    Collects the search criteria that can be checked on a stored property, as keyword arguments for
+    PropertyBatch.filter_mask.
+    """
+    scraper_settings = config["scraper_settings"]
+    return {
+        "min_price": scraper_settings["min_price"],
+        "max_price": scraper_settings["max_price"],
+        "min_bedrooms": scraper_settings["min_bedrooms"],
+        "max_bedrooms": scraper_settings["max_bedrooms"],
+        "min_bathrooms": scraper_settings["min_bathrooms"],
+        "min_area": config["floorplan_area_threshold"],
+    }
+
+
+def create_floorplan_downloader(config: dict) -> FloorplanDownloader:
+    """
+    Builds the floorplan downloader, storing images in the images directory and remembering them in the cache directory.
+    """
+    download_settings = config.get("floorplan_downloads", {})
+    return FloorplanDownloader(
+        config["images_directory"],
+        cache_path=os.path.join(config.get("cache_directory", "cache"), "floorplans.sqlite"),
+        max_dimension=download_settings.get("max_dimension", 2000),
+        all_floorplans=download_settings.get("all_floorplans", True),
+    )
+
+
+def create_scraper(
+    borough: str, config: dict, driver_lease=None, search_client=None, location_cache=None
+) -> RightmoveScraper:
+    """
+    Builds a RightmoveScraper for a borough from the scraper settings in the config.
+    """
+    return RightmoveScraper(
+        location=borough,
+        min_price=config["scraper_settings"]["min_price"],
+        max_price=config["scraper_settings"]["max_price"],
+        min_bedrooms=config["scraper_settings"]["min_bedrooms"],
+        max_bedrooms=config["scraper_settings"]["max_bedrooms"],
+        min_bathrooms=config["scraper_settings"]["min_bathrooms"],
+        property_type=config["scraper_settings"]["property_type"],
+        min_let_date=config["scraper_settings"]["min_let_date"],
+        floorplan_required=config["scraper_settings"]["floorplan_required"],
+        max_days_since_added=config["scraper_settings"]["max_days_since_added"],
+        exclude=config["scraper_settings"]["exclude"],
+        exclude_descriptions=config["scraper_settings"].get("exclude_descriptions"),
+        include=config["scraper_settings"].get("include"),
+        exclude_postcode_districts=config["scraper_settings"].get("exclude_postcode_districts"),
+        driver_lease=driver_lease,
+        search_backend=config["scraper_settings"].get("search_backend", "selenium"),
+        search_client=search_client,
+        location_cache=location_cache,
+        detail_concurrency=config.get("detail_fetching", {}).get("concurrency", 8),
+        shard_workers=config["scraper_settings"].get("shard_workers", 4),
+        base_url=config["scraper_settings"].get("base_url", RIGHTMOVE_BASE_URL),
+    )
+
+
+def build_filter_stages(
+    config,
+    scraper,
+    floorplan_analyser,
+    travel_analyser,
+    deferred,
+    floorplan_downloader,
+    inference_executor=None,
+    listing_store=None,
+) -> list:
+    """
+    Builds the per-property filter stages, ordered from the cheapest rejection to the most expensive.
+
+    Property pages are fetched once, for the letting details, and floorplan_downloader downloads the floorplans from the
+    URLs read from them. Properties whose page could not be fetched over HTTP carry on through the floorplan stages, and their URLs are
+    added to deferred, to be checked in the browser once the search no longer needs it. If a listing store is given,
+    each rejection is recorded in it with the stage's name.
+    """
+    pipeline_settings = config.get("pipeline", {})
+    qa_batch_size = config.get("qa_batch_size", 8)
+
+    def reject(property_detail, stage, reason):
+        metrics.increment("rejections_total", stage=stage, reason=reason)
+        if listing_store is not None:
+            listing_store.record_outcome(property_detail, rejected_by=stage)
+
+    def check_travel_time(batch):
+        # Perform travel time analysis if analyser is initialized, using the listings' own coordinates where they have
+        # them and geocoding the rest of the batch in one go
+        travel_times = [True] * len(batch)
+        if travel_analyser:
+            travel_times = travel_analyser.is_within_isochrone_located(
+                [item["address"] for item in batch],
+                [
+                    (item["latitude"], item["longitude"]) if item.get("latitude") is not None else None
+                    for item in batch
+                ],
             )
 
-            # Perform the search and get property URLs
-            scraper.perform_search()
-            property_details = scraper.get_property_details()
-            # scraper.close()
-        except Exception as e:
-            logging.error(f"Error processing {borough}: {e}")
-            continue
+        passed = []
+        for property_detail, within_travel_time in zip(batch, travel_times):
+            property_detail.update({"within_travel_time": within_travel_time})
+            if within_travel_time:
+                passed.append(property_detail)
+            else:
+                reject(property_detail, "travel_time", "outside_travel_time")
+        return passed
 
-        logging.info(f"Found {len(property_details)} potential properties. Performing additional filtering.")
+    def check_letting_details(batch):
+        # Property pages are fetched concurrently, and parsed once for both the letting details and the floorplans
+        page_models = scraper.fetch_page_models_many([item["url"] for item in batch])
+        passed = []
+        for property_detail in batch:
+            page_model = page_models.get(property_detail["url"])
+            if page_model is None:
+                # Checked in the browser once the pipeline finishes; its floorplans are found by the downloader
+                deferred.add(property_detail["url"])
+                passed.append(property_detail)
+                continue
 
-        for property_detail in tqdm(property_details):
-            # Perform travel time analysis if analyser is initialized
-            within_travel_time = True
-            if travel_analyser:
-                within_travel_time = travel_analyser.is_within_isochrone(property_detail["address"])
+            details = page_model.letting_details()
+            property_detail.update(details)
+            property_detail["floorplan_urls"] = page_model.floorplan_urls()
+            if scraper.letting_details_meet_criteria(details):
+                passed.append(property_detail)
+            else:
+                reject(property_detail, "letting_details", "let_date")
+        return passed
 
-            if not within_travel_time:
+    def download_floorplans(batch):
+        for property_detail in batch:
+            property_detail["floorplan_image_paths"] = []
+            if not property_detail["has_floorplan"]:
                 continue
 
-            if config["scraper_settings"]["floorplan_required"] and not property_detail["has_floorplan"]:
+            property_detail["floorplan_image_paths"] = floorplan_downloader.download_property_floorplans(
+                property_detail["url"], property_detail.get("floorplan_urls")
+            )
+        return batch
+
+    def check_floor_area(batch):
+        image_paths = list(dict.fromkeys(path for item in batch for path in item["floorplan_image_paths"]))
+        if inference_executor is not None:
+            from floorplan_analyser import extract_areas_in_process
+
+            area_answers = inference_executor.submit(
+                extract_areas_in_process, config["qa_prompt"], image_paths, qa_batch_size
+            ).result()
+        else:
+            area_answers = floorplan_analyser.extract_areas(config["qa_prompt"], image_paths, batch_size=qa_batch_size)
+
+        passed = []
+        for property_detail in batch:
+            area, area_source = 0, ""
+            if property_detail["floorplan_image_paths"]:
+                # A listing may have a plan per floor, or one with the total area, so the largest answer is kept
+                area, area_source = max(
+                    (area_answers[image_path] for image_path in property_detail["floorplan_image_paths"]),
+                    key=lambda answer: answer.area,
+                )
+
+            property_detail.update({"area": area, "area_source": area_source})
+            if property_detail["has_floorplan"] and area < config["floorplan_area_threshold"]:
+                reject(property_detail, "floor_area", "below_threshold" if area else "no_area")
                 continue
+            passed.append(property_detail)
+        return passed
+
+    return [
+        Stage("travel_time", check_travel_time, batch_size=pipeline_settings.get("travel_batch_size", 32)),
+        Stage(
+            "letting_details",
+            check_letting_details,
+            workers=pipeline_settings.get("details_workers", 2),
+            batch_size=pipeline_settings.get("details_batch_size", 16),
+        ),
+        Stage("floorplan_download", download_floorplans, workers=pipeline_settings.get("download_workers", 4)),
+        Stage(
+            "floor_area",
+            check_floor_area,
+            workers=pipeline_settings.get("inference_processes", 0) if inference_executor is not None else 1,
+            batch_size=qa_batch_size,
+        ),
+    ]
+
+
+def process_borough(
+    borough,
+    config,
+    driver_pool,
+    search_client,
+    location_cache,
+    floorplan_analyser,
+    travel_analyser,
+    dry_run=False,
+    inference_executor=None,
+    listing_store=None,
+    incremental=False,
+    seen_listings=None,
+    stage_profiler=None,
+    floorplan_downloader=None,
+    on_accepted=None,
+) -> list:
+    """
+    Searches a single borough on a leased driver and returns the properties that pass every filter.
+
+    Search results stream through the filter stages as they are read, rather than after the last results page.
+    In a dry run only the search and the search result filters run, and nothing is returned.
+    Listings already found by another borough's search in this run are dropped before any filter stage.
+    Listings and their outcomes are recorded in the listing store if one is given. In incremental mode, listings the
+    store has already evaluated at their current price are skipped. If on_accepted is given, it is called with each
+    property as soon as it has passed every filter, rather than when the whole borough is done.
+    """
+    logging.info(f"Processing borough: {borough}")
+
+    with driver_pool.lease() as lease:
+        scraper = create_scraper(
+            borough, config, driver_lease=lease, search_client=search_client, location_cache=location_cache
+        )
+        try:
+            # Perform the search
+            scraper.perform_search()
+
+            if dry_run:
+                found = sum(1 for _ in scraper.iter_property_details())
+                logging.info(f"Dry run: found {found} potential properties in {borough}.")
+                return []
+
+            listings = scraper.iter_property_details()
+            if seen_listings is not None:
+                listings = (
+                    property_detail
+                    for property_detail in listings
+                    if seen_listings.first_sighting(property_detail, borough)
+                )
+
+            skipped = [0]
+            if listing_store is not None:
+
+                def new_listings(listings):
+                    for property_detail in listings:
+                        if listing_store.record_seen(property_detail) or not incremental:
+                            yield property_detail
+                        else:
+                            skipped[0] += 1
+                            metrics.increment("rejections_total", stage="listing_store", reason="unchanged")
 
-            area = 0
-            if property_detail["has_floorplan"]:
-                logging.info("Checking floorplan.")
-                property_number = property_detail["url"].split("/properties/")[1].split("/")[0].strip("#")
-                floorplan_image_path = os.path.join("images", f"{property_number}.jpeg")
+                listings = new_listings(listings)
 
-                # Check if the image already exists
-                if not os.path.exists(floorplan_image_path):
-                    floorplan_analyser.download_property_floorplan(property_detail["url"], floorplan_image_path)
+            deferred = set()
+            stages = build_filter_stages(
+                config,
+                scraper,
+                floorplan_analyser,
+                travel_analyser,
+                deferred,
+                floorplan_downloader,
+                inference_executor,
+                listing_store,
+            )
+            if stage_profiler is not None:
+                profile_stage = config["instrumentation"]["profile_stage"]
+                for stage in stages:
+                    if stage.name == profile_stage:
+                        stage.func = stage_profiler.wrap(stage.func)
+            pipeline = StreamingPipeline(stages, queue_size=config.get("pipeline", {}).get("queue_size", 64))
+            borough_properties = []
+            # Closed on the way out, so an exception here also stops the pipeline's threads
+            with closing(pipeline.run(listings)) as passed:
+                for property_detail in tqdm(passed, desc=borough):
+                    property_detail["borough"] = borough
+                    borough_properties.append(property_detail)
+                    # Properties still to be checked in the browser are recorded and reported once they have been
+                    if property_detail["url"] in deferred:
+                        continue
+                    if listing_store is not None:
+                        listing_store.record_outcome(property_detail)
+                    if on_accepted is not None:
+                        on_accepted(property_detail)
+            if skipped[0]:
+                logging.info(f"Skipped {skipped[0]} listings in {borough} already evaluated at their current price.")
+
+            # The browser is free now that the search has finished with it
+            unchecked = [property_detail for property_detail in borough_properties if property_detail["url"] in deferred]
+            if unchecked:
+                logging.info(f"Checking letting details of {len(unchecked)} properties in the browser.")
+                for property_detail in unchecked:
+                    if scraper.meets_criteria(property_detail["url"]):
+                        if listing_store is not None:
+                            listing_store.record_outcome(property_detail)
+                        if on_accepted is not None:
+                            on_accepted(property_detail)
+                        continue
+                    borough_properties.remove(property_detail)
+                    metrics.increment("rejections_total", stage="letting_details", reason="let_date")
+                    if listing_store is not None:
+                        listing_store.record_outcome(property_detail, rejected_by="letting_details")
+        finally:
+            scraper.close()
+
+    return borough_properties
 
-                area = floorplan_analyser.get_answer(config["qa_prompt"], floorplan_image_path)
 
-                if area < config["floorplan_area_threshold"]:
+def main(config_file: str = "config.yaml", dry_run: bool = False, incremental: Optional[bool] = None):
+    config = load_config(config_file)
+    store_settings = config.get("listing_store", {})
+    if incremental is None:
+        incremental = store_settings.get("incremental", False)
+
+    # Create 'images' directory if it doesn't exist
+    if not os.path.exists(config["images_directory"]):
+        os.makedirs(config["images_directory"])
+
+    # Every outbound request shares one connection pool and per-host rate and concurrency limits. Configured before
+    # anything that touches the network, e.g. geocoding the commute targets and fetching their isolines.
+    configure_http_client(config.get("http"))
+
+    # Initialize floorplan analyser
+    floorplan_analyser = None if dry_run else create_floorplan_analyser(config)
+    floorplan_downloader = None if dry_run else create_floorplan_downloader(config)
+
+    # Initialize travel time analyser only if commute targets are provided
+    travel_analyser = None if dry_run else create_travel_analyser(config)
+    driver_pool = create_driver_pool(config)
+
+    search_client = RightmoveSearchClient()
+    location_cache = create_location_cache(config)
+    listing_store = None if dry_run else create_listing_store(config)
+    seen_listings = SeenListings()
+
+    # Optionally profile one filter stage, e.g. to see where floor area inference spends its time
+    instrumentation_settings = config.get("instrumentation", {})
+    stage_profiler = None
+    if instrumentation_settings.get("profile_stage"):
+        stage_profiler = StageProfiler(instrumentation_settings.get("profiler", "cProfile"))
+
+    # Optionally run floorplan inference in worker processes, each with its own model
+    inference_executor = None if dry_run else create_inference_executor(config, floorplan_analyser)
+
+    borough_batches = []
+
+    try:
+        with ThreadPoolExecutor(max_workers=driver_pool.size) as executor:
+            futures = {
+                executor.submit(
+                    process_borough,
+                    borough,
+                    config,
+                    driver_pool,
+                    search_client,
+                    location_cache,
+                    floorplan_analyser,
+                    travel_analyser,
+                    dry_run,
+                    inference_executor,
+                    listing_store,
+                    incremental,
+                    seen_listings,
+                    stage_profiler,
+                    floorplan_downloader,
+                ): borough
+                for borough in config["london_boroughs"]
+            }
+            for future in as_completed(futures):
+                borough = futures[future]
+                # One failed borough must not stop the others
+                try:
+                    # Kept as compact typed columns rather than a dict per property until the output is written
+                    borough_batches.append(PropertyBatch.from_dicts(future.result(), borough))
+                except Exception as e:
+                    logging.error(f"Error processing {borough}: {e}")
                     continue
 
-            logging.info("Checking additional criteria.")
-            if not scraper.meets_criteria(property_detail["url"]):
-                continue
+                logging.info(f"Properties found so far: {sum(len(batch) for batch in borough_batches)}")
 
-            property_detail.update({"area": area, "within_travel_time": within_travel_time})
+        duplicates = sum(seen_listings.duplicates.values())
+        if duplicates:
+            logging.info(
+                f"Skipped {duplicates} listings already found by another borough's search "
+                f"({len(seen_listings)} unique listings): {dict(seen_listings.duplicates)}"
+            )
 
-            final_properties.append(property_detail)
+        if listing_store is not None:
+            logging.info(f"Listing outcomes: {listing_store.outcome_counts()}")
+            if incremental:
+                # Merge this run's finds with the listings that passed on earlier runs
+                earlier = PropertyBatch.from_dicts(listing_store.passed_listings(store_settings.get("output_days")))
+                # Earlier matches may have been found with different settings, so they are checked against these
+                borough_batches = [earlier.take(earlier.filter_mask(**output_criteria(config)))]
+    finally:
+        driver_pool.close()
+        http_client.close()
+        location_cache.close()
+        if travel_analyser is not None:
+            travel_analyser.geocoder.close()
+        if listing_store is not None:
+            listing_store.close()
+        if floorplan_downloader is not None:
+            floorplan_downloader.close()
+        if inference_executor is not None:
+            inference_executor.shutdown()
 
-        logging.info(f"Properties found so far: {len(final_properties)}")
-        scraper.close()
+        metrics.log_summary()
+        report_directory = instrumentation_settings.get("report_directory")
+        if report_directory:
+            metrics.write_report(report_directory)
+            if stage_profiler is not None:
+                stage_profiler.write(
+                    os.path.join(report_directory, f"profile_{instrumentation_settings['profile_stage']}")
+                )
 
+    final_properties = PropertyBatch.concat(borough_batches).sorted_for_output()
     if len(final_properties) > 0:
-        # Create a DataFrame and save to CSV
-        df = pd.DataFrame(final_properties)
-        df.sort_values(by=["price_pcm", "area"], ascending=[True, False], inplace=True)
-        df.drop_duplicates(subset=["url"], inplace=True)
-        logging.info(f"Total properties found: {len(df)}")
-        df = df[["url", "has_floorplan", "price_pcm", "bedrooms", "bathrooms", "address", "area", "within_travel_time"]]
-        df.to_csv("properties.csv", index=False)
-    else:
+        logging.info(f"Total properties found: {len(final_properties)}")
+        output_settings = config.get("output", {})
+        final_properties.write(
+            output_settings.get("path", "properties.csv"), chunk_size=output_settings.get("chunk_size", 10000)
+        )
+    elif not dry_run:
         logging.info("No properties found.")
 
 
+def invalidate_location_cache(config: dict, locations: list) -> None:
+    """
+    Removes cached location identifiers, for all locations if none are given.
+    """
+    location_cache = create_location_cache(config)
+    removed = location_cache.invalidate(locations)
+    location_cache.close()
+    logging.info(f"Removed {removed} cached location identifiers.")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Search Rightmove and filter the results by bathrooms, floor area and commute time.")
+    parser.add_argument("--config", default="config.yaml", help="Path to the config file.")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only run the searches and report how many properties each borough returns. No models are loaded.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        default=None,
+        help="Only evaluate listings that are new or changed price since earlier runs, and merge them with earlier results.",
+    )
+    parser.add_argument(
+        "--invalidate-location-cache",
+        nargs="*",
+        metavar="LOCATION",
+        help="Forget cached location identifiers for the given locations, or for every location if none are given, then exit.",
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.invalidate_location_cache is not None:
+        invalidate_location_cache(load_config(args.config), args.invalidate_location_cache)
+    else:
+        main(args.config, dry_run=args.dry_run, incremental=args.incremental)
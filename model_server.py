@@ -0,0 +1,233 @@
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import tempfile
+from typing import Dict, List, Optional
+from floorplan_analyser import AreaAnswer, FloorplanAnalyser
+from instrumentation import metrics
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+SOCKET_NAME = "rightmove-floorplan-model.sock"
+# Seconds a client waits for the server to answer a request, and to answer a ping
+REQUEST_TIMEOUT_SECONDS = 300.0
+PING_TIMEOUT_SECONDS = 5.0
+
+
+def default_socket_path() -> str:
+    """
+    Returns the default socket path: in the user's runtime directory, e.g. /run/user/1000, or else in a directory
+    under the system temporary directory that only the user can access.
+
+    Raises:
+    PermissionError: If that directory exists but belongs to another user or is open to other users.
+    """
+    runtime_directory = os.environ.get("XDG_RUNTIME_DIR")
+    if not runtime_directory:
+        runtime_directory = os.path.join(tempfile.gettempdir(), f"rightmove-filtering-{os.getuid()}")
+        os.makedirs(runtime_directory, mode=0o700, exist_ok=True)
+        status = os.stat(runtime_directory)
+        if status.st_uid != os.getuid() or stat.S_IMODE(status.st_mode) & 0o077:
+            raise PermissionError(f"{runtime_directory} must belong to this user and be closed to other users.")
+    return os.path.join(runtime_directory, SOCKET_NAME)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        """
+        Answers newline-delimited JSON requests until the client disconnects.
+        """
+        for line in self.rfile:
+            try:
+                response = {"result": self.server.dispatch(json.loads(line))}
+            except Exception as e:
+                logging.exception("Model server request failed.")
+                response = {"error": str(e)}
+            self.wfile.write((json.dumps(response) + "\n").encode())
+            self.wfile.flush()
+
+
+class FloorplanModelServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, analyser: FloorplanAnalyser) -> None:
+        """
+        Initialize a long-lived server that keeps the floorplan model loaded and answers requests over a Unix socket.
+
+        The socket is only accessible to the user running the server, as anyone able to connect could have it read
+        any image the user can read.
+
+        Args:
+        socket_path (str): Path of the Unix socket to listen on. A stale socket file is replaced.
+        analyser (FloorplanAnalyser): The analyser holding the model.
+        """
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, _RequestHandler)
+        self.socket_path = socket_path
+        self.analyser = analyser
+
+    def server_bind(self) -> None:
+        # Created without group or other permissions, so there is no moment at which another user can connect
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+        os.chmod(self.server_address, 0o600)
+
+    def dispatch(self, request: Dict):
+        """
+        Runs a single request.
+
+        Args:
+        request (Dict): The decoded request, with a "method" and its arguments.
+
+        Returns:
+        The JSON-serialisable result.
+
+        Raises:
+        ValueError: If the method is unknown.
+        """
+        method = request.get("method")
+        if method == "ping":
+            return "pong"
+        if method == "extract_areas":
+            answers = self.analyser.extract_areas(
+                request["question"], request["image_paths"], batch_size=request.get("batch_size", 8)
+            )
+            return {image_path: list(answer) for image_path, answer in answers.items()}
+        raise ValueError(f"Unknown method: {method}")
+
+    def server_close(self) -> None:
+        """
+        Closes the server and removes its socket file.
+        """
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class RemoteFloorplanAnalyser(FloorplanAnalyser):
+    local_model = False
+
+    def __init__(
+        self, socket_path: Optional[str] = None, timeout: Optional[float] = REQUEST_TIMEOUT_SECONDS, **settings
+    ) -> None:
+        """
+        Initialize a FloorplanAnalyser that sends floor area extraction to a running FloorplanModelServer.
+
+        Floorplan downloads still happen locally. Nothing model related is loaded in this process unless the server
+        stops answering: a request that fails or times out is run in this process instead, as is every later one.
+
+        Args:
+        socket_path (str): Path of the server's Unix socket. Defaults to default_socket_path().
+        timeout (float): Seconds to wait for the server to answer a request. None waits indefinitely.
+        settings: FloorplanAnalyser settings used if inference falls back to this process, e.g. cache_path.
+        """
+        super().__init__(**settings)
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+        self._use_server = True
+
+    def _call(self, request: Dict, timeout: Optional[float] = None):
+        """
+        Sends one request to the server and returns its result.
+
+        Args:
+        request (Dict): The request, with a "method" and its arguments.
+        timeout (float): Seconds to wait for the answer, if not the analyser's timeout.
+
+        Raises:
+        RuntimeError: If the server reports an error.
+        OSError: If the server cannot be reached, or does not answer in time.
+        """
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(timeout or self.timeout)
+            connection.connect(self.socket_path)
+            with connection.makefile("rwb") as stream:
+                stream.write((json.dumps(request) + "\n").encode())
+                stream.flush()
+                line = stream.readline()
+        if not line:
+            raise ConnectionResetError("Model server closed the connection without answering.")
+        response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError(f"Model server error: {response['error']}")
+        return response["result"]
+
+    def is_available(self) -> bool:
+        """
+        Checks whether the server is running.
+
+        Returns:
+        bool: True if the server answered a ping.
+        """
+        try:
+            return self._call({"method": "ping"}, timeout=PING_TIMEOUT_SECONDS) == "pong"
+        except OSError:
+            return False
+
+    def extract_areas(
+        self, question: str, image_paths: List[str], batch_size: int = 8, use_regex: bool = True
+    ) -> Dict[str, AreaAnswer]:
+        """
+        Extracts the floor area from many floorplan images on the server. See FloorplanAnalyser.extract_areas.
+        """
+        if not image_paths:
+            return {}
+        if not self._use_server:
+            return super().extract_areas(question, image_paths, batch_size=batch_size, use_regex=use_regex)
+        # The server may run from a different working directory
+        absolute_paths = {image_path: os.path.abspath(image_path) for image_path in image_paths}
+        try:
+            result = self._call(
+                {
+                    "method": "extract_areas",
+                    "question": question,
+                    "image_paths": list(absolute_paths.values()),
+                    "batch_size": batch_size,
+                }
+            )
+        except OSError as e:
+            if self._use_server:
+                logging.warning(f"Floorplan model server at {self.socket_path} failed: {e}. Loading the model locally.")
+                metrics.increment("model_server_fallbacks_total", reason=type(e).__name__)
+                self._use_server = False
+            return super().extract_areas(question, image_paths, batch_size=batch_size, use_regex=use_regex)
+        return {image_path: AreaAnswer(*result[absolute_path]) for image_path, absolute_path in absolute_paths.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Keep the floorplan model loaded and serve it over a Unix socket.")
+    parser.add_argument("--socket", help="Path of the Unix socket to listen on, by default in the runtime directory.")
+    parser.add_argument("--cache", default=os.path.join("cache", "floorplan_answers.sqlite"), help="Answer cache path.")
+    parser.add_argument("--backend", choices=["pytorch", "onnx"], default="pytorch", help="Inference backend.")
+    parser.add_argument("--threads", type=int, default=None, help="Threads per inference on ONNX Runtime.")
+    args = parser.parse_args()
+    socket_path = args.socket or default_socket_path()
+
+    analyser = FloorplanAnalyser(
+        cache_path=args.cache,
+        backend=args.backend,
+        onnx_directory=os.path.join("cache", "onnx"),
+        intra_op_threads=args.threads,
+    )
+    # Load the model up front so that the first request is fast
+    analyser.model
+
+    with FloorplanModelServer(socket_path, analyser) as server:
+        logging.info(f"Floorplan model server listening on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logging.info("Shutting down.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import logging
+import os
+from typing import Dict, Optional
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Inputs of LayoutLM's question answering head, in the order of its forward arguments
+INPUT_NAMES = ["input_ids", "bbox", "attention_mask", "token_type_ids"]
+OUTPUT_NAMES = ["start_logits", "end_logits"]
+QUANTIZED_MODEL_FILE = "model.int8.onnx"
+
+
+def model_directory(root: str, model_name: str) -> str:
+    """
+    Returns the directory the exported model is kept in, e.g. cache/onnx/impira--layoutlm-document-qa.
+    """
+    return os.path.join(root, model_name.replace("/", "--"))
+
+
+def export_quantized_model(model, directory: str, opset: int = 14) -> str:
+    """
+    Exports a LayoutLM question answering model to ONNX and quantises its weights to int8, unless already done.
+
+    The model is exported with dynamic batch and sequence axes, then quantised with ONNX Runtime's dynamic
+    quantisation: weights are stored as int8 and activations quantised on the fly, which needs no calibration data.
+    The files are written under temporary names and renamed, so an interrupted export is never mistaken for a finished
+    one.
+
+    Args:
+    model (transformers.PreTrainedModel): The PyTorch model, e.g. the model of a document-question-answering pipeline.
+    directory (str): Directory to keep the quantised model in.
+    opset (int): ONNX opset to export with.
+
+    Returns:
+    str: Path of the quantised model.
+    """
+    quantized_path = os.path.join(directory, QUANTIZED_MODEL_FILE)
+    if os.path.exists(quantized_path):
+        return quantized_path
+
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    class Logits(torch.nn.Module):
+        """
+        Returns the start and end logits as a tuple, which torch.onnx.export can name.
+        """
+
+        def __init__(self, model) -> None:
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, bbox, attention_mask, token_type_ids):
+            outputs = self.model(
+                input_ids=input_ids, bbox=bbox, attention_mask=attention_mask, token_type_ids=token_type_ids
+            )
+            return outputs.start_logits, outputs.end_logits
+
+    os.makedirs(directory, exist_ok=True)
+    exported_path = os.path.join(directory, f"model.{os.getpid()}.onnx")
+    sequence_length = 16
+    example_inputs = (
+        torch.ones((1, sequence_length), dtype=torch.long),
+        torch.zeros((1, sequence_length, 4), dtype=torch.long),
+        torch.ones((1, sequence_length), dtype=torch.long),
+        torch.zeros((1, sequence_length), dtype=torch.long),
+    )
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in INPUT_NAMES + OUTPUT_NAMES}
+
+    logging.info(f"Exporting the floorplan model to ONNX in {directory}.")
+    model.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            Logits(model),
+            example_inputs,
+            exported_path,
+            input_names=INPUT_NAMES,
+            output_names=OUTPUT_NAMES,
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+
+    partial_path = quantized_path + f".{os.getpid()}.part"
+    try:
+        quantize_dynamic(exported_path, partial_path, weight_type=QuantType.QInt8)
+        os.replace(partial_path, quantized_path)
+    finally:
+        for path in (exported_path, partial_path):
+            if os.path.exists(path):
+                os.remove(path)
+    logging.info(f"Quantised the floorplan model to {quantized_path}.")
+    return quantized_path
+
+
+class OnnxQuestionAnsweringModel:
+    def __init__(self, model_path: str, config, intra_op_threads: Optional[int] = None) -> None:
+        """
+        Initialize a stand-in for a transformers question answering model that runs an ONNX model on ONNX Runtime.
+
+        It is called like the PyTorch model, with the tensors a document-question-answering pipeline prepares, and
+        returns the logits as tensors, so the pipeline's OCR, tokenisation and answer decoding are unchanged.
+
+        Args:
+        model_path (str): Path of the ONNX model, as written by export_quantized_model.
+        config (transformers.PretrainedConfig): The original model's config, which the pipeline reads.
+        intra_op_threads (int): Threads ONNX Runtime uses for one inference. None lets it use every core.
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.config = config
+
+    def __call__(self, **inputs) -> Dict:
+        import torch
+
+        feed = {name: tensor.cpu().numpy() for name, tensor in inputs.items() if name in self.input_names}
+        start_logits, end_logits = self.session.run(OUTPUT_NAMES, feed)
+        return {"start_logits": torch.from_numpy(start_logits), "end_logits": torch.from_numpy(end_logits)}
+
+
+def use_onnx_model(pipeline, directory: str, intra_op_threads: Optional[int] = None) -> None:
+    """
+    Switches a document-question-answering pipeline to a quantised ONNX copy of its model, exporting it first if need
+    be. The PyTorch weights are released once the pipeline no longer refers to them.
+
+    Args:
+    pipeline (transformers.Pipeline): The pipeline to switch.
+    directory (str): Directory the quantised model is kept in.
+    intra_op_threads (int): Threads ONNX Runtime uses for one inference. None lets it use every core.
+    """
+    model_path = export_quantized_model(pipeline.model, directory)
+    pipeline.model = OnnxQuestionAnsweringModel(model_path, pipeline.model.config, intra_op_threads)
+
+
+def load_onnx_pipeline(model_name: str, task: str, root: str, intra_op_threads: Optional[int] = None):
+    """
+    Builds a document-question-answering pipeline that runs a quantised ONNX copy of the model.
+
+    Once the quantised model has been exported, the PyTorch weights are not loaded at all: the pipeline is built around
+    an empty model on the meta device, as it only reads the model's config and class.
+
+    Args:
+    model_name (str): The Hugging Face model, e.g. "impira/layoutlm-document-qa".
+    task (str): The pipeline task.
+    root (str): Directory the quantised models are kept in, one subdirectory per model.
+    intra_op_threads (int): Threads ONNX Runtime uses for one inference. None lets it use every core.
+
+    Returns:
+    transformers.Pipeline: The pipeline.
+    """
+    from transformers import AutoConfig, AutoModelForDocumentQuestionAnswering, AutoTokenizer, pipeline
+
+    directory = model_directory(root, model_name)
+    if os.path.exists(os.path.join(directory, QUANTIZED_MODEL_FILE)):
+        import torch
+
+        with torch.device("meta"):
+            model = AutoModelForDocumentQuestionAnswering.from_config(AutoConfig.from_pretrained(model_name))
+        # Marks the model as already placed, as accelerate does, so the pipeline does not try to move its empty weights
+        model.hf_device_map = {"": "cpu"}
+        qa_pipeline = pipeline(task=task, model=model, tokenizer=AutoTokenizer.from_pretrained(model_name))
+    else:
+        qa_pipeline = pipeline(model=model_name, task=task)
+    use_onnx_model(qa_pipeline, directory, intra_op_threads)
+    return qa_pipeline
@@ -0,0 +1,147 @@
+import json
+import logging
+import re
+from typing import Dict, List, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+PAGE_MODEL_VARIABLE = "window.PAGE_MODEL"
+
+# Prices are shown per calendar month or per week, e.g. "£2,150 pcm" or "£495 pw"
+PRICE_PATTERN = re.compile(r"£\s*(?P<amount>\d[\d,]*)(?:\.\d+)?\s*(?P<frequency>pcm|pw)?", re.IGNORECASE)
+WEEKS_PER_MONTH = 52 / 12
+
+
+def parse_price_pcm(text: str) -> Optional[int]:
+    """
+    Parses a displayed rent into pounds per calendar month, e.g. 2150 from "£2,150 pcm" or 2145 from "£495 pw".
+
+    Args:
+    text (str): The displayed price.
+
+    Returns:
+    int: The rent per calendar month, or None if the text does not contain a price.
+    """
+    match = PRICE_PATTERN.search(text or "")
+    if not match:
+        return None
+    amount = int(match.group("amount").replace(",", ""))
+    if (match.group("frequency") or "").lower() == "pw":
+        return round(amount * WEEKS_PER_MONTH)
+    return amount
+
+
+def _model_span(html: Union[str, bytes], variable: str) -> Optional[Tuple[int, int]]:
+    """
+    Locates the object literal assigned to variable by plain substring search, without parsing the page.
+
+    Returns:
+    Tuple[int, int]: Start and end of the literal, ending at the last "}" before the closing script tag. None if the
+                     page does not contain the variable.
+    """
+    if isinstance(html, bytes):
+        variable, opening, closing, script_end = variable.encode(), b"{", b"}", b"</script>"
+    else:
+        opening, closing, script_end = "{", "}", "</script>"
+
+    start = html.find(variable)
+    if start == -1:
+        return None
+    start = html.find(opening, start + len(variable))
+    if start == -1:
+        return None
+    end = html.find(script_end, start)
+    end = html.rfind(closing, start, len(html) if end == -1 else end)
+    if end == -1:
+        return None
+    return start, end + 1
+
+
+def extract_embedded_json(html: Union[str, bytes], variable: str) -> Optional[dict]:
+    """
+    Decodes a JSON object assigned to a global in an inline script, e.g. window.jsonModel or window.PAGE_MODEL.
+
+    The script is found by substring search and only its object literal is decoded, with orjson if it is installed.
+    Scripts that assign more than one global are decoded with the standard library, which stops at the end of the
+    first object.
+
+    Args:
+    html (Union[str, bytes]): The page HTML, decoded or not.
+    variable (str): The assignment target to look for, e.g. "window.jsonModel".
+
+    Returns:
+    dict: The decoded object, or None if the page does not contain it.
+    """
+    span = _model_span(html, variable)
+    if span is None:
+        return None
+    start, end = span
+
+    if orjson is not None:
+        try:
+            return orjson.loads(html[start:end])
+        except orjson.JSONDecodeError:
+            pass
+
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", errors="replace")
+        span = _model_span(html, variable)
+        start = span[0]
+    try:
+        data, _ = json.JSONDecoder().raw_decode(html, start)
+    except json.JSONDecodeError as e:
+        logging.warning(f"Unable to decode {variable}: {e}")
+        return None
+    return data
+
+
+class PageModel:
+    def __init__(self, data: dict) -> None:
+        """
+        Initialize typed accessors over a property page's decoded window.PAGE_MODEL.
+
+        Args:
+        data (dict): The decoded page model.
+        """
+        self.data = data
+        self.property_data = data.get("propertyData") or {}
+
+    @classmethod
+    def from_html(cls, html: Union[str, bytes]) -> Optional["PageModel"]:
+        """
+        Extracts the page model from a property page.
+
+        Args:
+        html (Union[str, bytes]): The page HTML.
+
+        Returns:
+        PageModel: The page model, or None if the page does not contain one.
+        """
+        data = extract_embedded_json(html, PAGE_MODEL_VARIABLE)
+        return cls(data) if data is not None else None
+
+    def floorplan_urls(self) -> List[str]:
+        """
+        Returns:
+        List[str]: The URLs of the property's floorplan images, in the order the page lists them.
+        """
+        floorplans = self.property_data.get("floorplans") or []
+        return [floorplan["url"] for floorplan in floorplans if floorplan.get("url")]
+
+    def letting_details(self) -> Dict[str, str]:
+        """
+        Returns:
+        Dict[str, str]: Let available date, furnish type and let type, as shown under "Letting details".
+        """
+        lettings = self.property_data.get("lettings") or {}
+        return {
+            "let_available_date": lettings.get("letAvailableDate") or "Ask agent",
+            "furnish_type": lettings.get("furnishType") or "",
+            "let_type": lettings.get("letType") or "",
+        }
@@ -0,0 +1,278 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+from instrumentation import metrics
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Marks the end of a stage's input
+_END = object()
+
+# Seconds a thread blocked on a queue waits before checking whether the pipeline has been stopped
+_STOP_CHECK_SECONDS = 0.1
+
+
+def _put(outbox: "queue.Queue", item: Any, stopped: threading.Event) -> bool:
+    """
+    Puts an item on a queue, waiting for room unless the pipeline is stopped.
+
+    Returns:
+    bool: False if the pipeline was stopped before there was room.
+    """
+    while not stopped.is_set():
+        try:
+            outbox.put(item, timeout=_STOP_CHECK_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(inbox: "queue.Queue", stopped: threading.Event) -> Any:
+    """
+    Takes an item from a queue, waiting for one unless the pipeline is stopped.
+
+    Returns:
+    Any: The item, or the end marker if the pipeline was stopped first.
+    """
+    while not stopped.is_set():
+        try:
+            return inbox.get(timeout=_STOP_CHECK_SECONDS)
+        except queue.Empty:
+            continue
+    return _END
+
+
+def _describe(item: Any) -> str:
+    """
+    Names an item in log messages, by its URL if it has one.
+    """
+    if isinstance(item, dict) and "url" in item:
+        return item["url"]
+    return repr(item)[:100]
+
+
+class Stage:
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[List[Any]], List[Any]],
+        workers: int = 1,
+        batch_size: int = 1,
+        batch_timeout: float = 0.5,
+    ) -> None:
+        """
+        A filter stage of a StreamingPipeline.
+
+        Args:
+        name (str): Name used in logs and counters.
+        func (Callable): Takes a batch of items and returns the items that pass, possibly updated. Called from worker threads.
+        workers (int): Number of worker threads running func concurrently.
+        batch_size (int): Maximum number of items passed to func at once.
+        batch_timeout (float): Seconds to wait for a batch to fill up before running func on a partial batch.
+        """
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.batch_size = max(1, int(batch_size))
+        self.batch_timeout = batch_timeout
+        self.received = 0
+        self.passed = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def _record(self, received: int, passed: int, errors: int = 0, seconds: float = 0.0) -> None:
+        """
+        Updates the stage counters, and the run-wide metrics.
+        """
+        with self._lock:
+            self.received += received
+            self.passed += passed
+            self.errors += errors
+        metrics.observe("stage_seconds", seconds, stage=self.name)
+        metrics.increment("stage_items_total", received, stage=self.name, outcome="received")
+        metrics.increment("stage_items_total", passed, stage=self.name, outcome="passed")
+        if errors:
+            metrics.increment("stage_items_total", errors, stage=self.name, outcome="error")
+
+
+class StreamingPipeline:
+    def __init__(self, stages: List[Stage], queue_size: int = 64) -> None:
+        """
+        Initialize a pipeline of filter stages connected by bounded queues.
+
+        Each stage runs on its own worker threads, so items flow through as soon as the source produces them and the
+        end-to-end time approaches that of the slowest stage rather than the sum of all stages. A full queue blocks the
+        stage in front of it, which keeps memory bounded when a downstream stage is slow. Order the stages from the
+        cheapest rejection to the most expensive, so that expensive stages only see items that survived the rest.
+
+        Args:
+        stages (List[Stage]): The stages, in order.
+        queue_size (int): Capacity of each queue between stages.
+        """
+        self.stages = stages
+        self.queue_size = queue_size
+
+    def _next_batch(self, stage: Stage, inbox: "queue.Queue", stopped: threading.Event) -> tuple:
+        """
+        Takes up to batch_size items from a stage's queue, blocking for the first.
+
+        Returns:
+        tuple: The batch, and whether the end marker was seen or the pipeline stopped.
+        """
+        item = _get(inbox, stopped)
+        if item is _END:
+            return [], True
+
+        batch = [item]
+        while len(batch) < stage.batch_size:
+            try:
+                item = inbox.get(timeout=stage.batch_timeout)
+            except queue.Empty:
+                break
+            if item is _END:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run_batch(self, stage: Stage, batch: List[Any]) -> List[Any]:
+        """
+        Runs a stage on a batch, and records how many items passed.
+
+        If the stage raises, the batch is run again an item at a time, so that one bad item does not discard the rest
+        of its batch. Only the items that fail on their own are counted as errors. They pass no further, and have no
+        outcome in the listing store, so an incremental run evaluates them again.
+
+        Returns:
+        List[Any]: The items that passed.
+        """
+        start = time.perf_counter()
+        errors = 0
+        try:
+            passed = stage.func(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                logging.error(f"Error in {stage.name} stage on {_describe(batch[0])}: {e}")
+                passed, errors = [], 1
+            else:
+                logging.warning(f"Error in {stage.name} stage on a batch of {len(batch)}, retrying one at a time: {e}")
+                metrics.increment("stage_batch_retries_total", stage=stage.name)
+                passed = []
+                for item in batch:
+                    try:
+                        passed.extend(stage.func([item]))
+                    except Exception as e:
+                        logging.error(f"Error in {stage.name} stage on {_describe(item)}: {e}")
+                        errors += 1
+        stage._record(len(batch), len(passed), errors=errors, seconds=time.perf_counter() - start)
+        return passed
+
+    def _run_stage(
+        self,
+        stage: Stage,
+        inbox: "queue.Queue",
+        outbox: "queue.Queue",
+        finished: Callable[[], None],
+        stopped: threading.Event,
+    ) -> None:
+        """
+        Worker loop for one thread of a stage.
+        """
+        try:
+            while not stopped.is_set():
+                batch, ended = self._next_batch(stage, inbox, stopped)
+                if batch:
+                    for item in self._run_batch(stage, batch):
+                        if not _put(outbox, item, stopped):
+                            return
+                if ended:
+                    # Let this stage's other workers see the end marker too
+                    _put(inbox, _END, stopped)
+                    break
+        finally:
+            finished()
+
+    def run(self, source: Iterable[Any]) -> Iterator[Any]:
+        """
+        Streams items from a source through every stage.
+
+        Args:
+        source (Iterable[Any]): The items to process, e.g. a generator of search results. It is consumed on its own thread.
+
+        Yields:
+        Any: Items that passed every stage, as soon as they do. If the caller stops iterating early, e.g. on an
+             exception, or closes the generator, every thread stops after its current batch rather than blocking on
+             a full queue.
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = []
+        source_errors: List[Exception] = []
+        stopped = threading.Event()
+
+        def feed() -> None:
+            try:
+                for item in source:
+                    if not _put(queues[0], item, stopped):
+                        break
+            except Exception as e:
+                source_errors.append(e)
+            finally:
+                # Stops a generator source, e.g. one paging through search results on threads of its own
+                close = getattr(source, "close", None)
+                if stopped.is_set() and close is not None:
+                    close()
+                _put(queues[0], _END, stopped)
+
+        threads.append(threading.Thread(target=feed, name="pipeline-source", daemon=True))
+
+        for index, stage in enumerate(self.stages):
+            remaining = [stage.workers]
+            lock = threading.Lock()
+
+            def finished(outbox=queues[index + 1], remaining=remaining, lock=lock) -> None:
+                # The last worker of a stage to finish passes the end marker on
+                with lock:
+                    remaining[0] -= 1
+                    if remaining[0] == 0:
+                        _put(outbox, _END, stopped)
+
+            for worker in range(stage.workers):
+                threads.append(
+                    threading.Thread(
+                        target=self._run_stage,
+                        args=(stage, queues[index], queues[index + 1], finished, stopped),
+                        name=f"pipeline-{stage.name}-{worker}",
+                        daemon=True,
+                    )
+                )
+
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is _END:
+                    break
+                yield item
+        finally:
+            # Also reached when the caller abandons the generator. Emptying the queues wakes the threads blocked on
+            # them, and the stop event keeps them from blocking again.
+            stopped.set()
+            for pipe in queues:
+                while True:
+                    try:
+                        pipe.get_nowait()
+                    except queue.Empty:
+                        break
+
+        for thread in threads:
+            thread.join()
+
+        for stage in self.stages:
+            logging.info(f"Stage {stage.name}: {stage.passed} of {stage.received} passed, {stage.errors} errors.")
+        if source_errors:
+            raise source_errors[0]
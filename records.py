@@ -0,0 +1,273 @@
+import logging
+import os
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Union
+import numpy as np
+from page_model import parse_price_pcm
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Typed columns and their dtypes. Unknown integers are stored as -1 and unknown floats as NaN.
+NUMERIC_COLUMNS = {
+    "price_pcm": np.int32,
+    "bedrooms": np.int16,
+    "bathrooms": np.int16,
+    "area": np.float32,
+    "latitude": np.float64,
+    "longitude": np.float64,
+}
+TEXT_COLUMNS = ("url", "address", "area_source")
+
+# within_travel_time is True, False, or "unknown" when the address could not be located. It is stored as a code and
+# written as text, indexed by code + 1.
+TRAVEL_CODES = {True: 1, False: 0, "unknown": -1}
+TRAVEL_VALUES = np.array(["unknown", "False", "True"], dtype=object)
+
+# Columns of the output file, in order. The URL stays first for open_links.sh.
+OUTPUT_COLUMNS = [
+    "url",
+    "has_floorplan",
+    "price_pcm",
+    "bedrooms",
+    "bathrooms",
+    "address",
+    "area",
+    "area_source",
+    "within_travel_time",
+    "borough",
+]
+
+
+def _to_int(value: Union[str, int, None]) -> int:
+    """
+    Parses a room count, e.g. 2 from "2", or -1 if it is missing.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
+class PropertyBatch:
+    def __init__(self, columns: Dict[str, np.ndarray], boroughs: Sequence[str]) -> None:
+        """
+        Initialize a columnar batch of properties, one NumPy array per field.
+
+        Prices, room counts, areas and coordinates are stored parsed and typed rather than as strings in a dict per
+        property, so a batch takes a fraction of the memory and filters run as vectorised masks over every row.
+
+        Args:
+        columns (Dict[str, np.ndarray]): The typed columns, text columns, has_floorplan, within_travel_time (as codes
+                                         -1, 0 or 1) and borough (as codes into boroughs), all of the same length.
+        boroughs (Sequence[str]): The borough names the borough codes refer to.
+        """
+        self.columns = columns
+        self.boroughs = list(boroughs)
+
+    @classmethod
+    def from_dicts(cls, property_details: Iterable[Dict], borough: str = "") -> "PropertyBatch":
+        """
+        Builds a batch from property details as produced by the scraper and the filter stages.
+
+        Args:
+        property_details (Iterable[Dict]): The property details.
+        borough (str): Borough of the properties whose details do not record one.
+
+        Returns:
+        PropertyBatch: The properties, with their prices and room counts parsed.
+        """
+        property_details = list(property_details)
+        boroughs: Dict[str, int] = {}
+        columns = {
+            "price_pcm": np.fromiter(
+                ((parse_price_pcm(str(item["price_pcm"])) or -1) for item in property_details),
+                dtype=NUMERIC_COLUMNS["price_pcm"],
+                count=len(property_details),
+            ),
+            "bedrooms": np.fromiter(
+                (_to_int(item.get("bedrooms")) for item in property_details),
+                dtype=NUMERIC_COLUMNS["bedrooms"],
+                count=len(property_details),
+            ),
+            "bathrooms": np.fromiter(
+                (_to_int(item.get("bathrooms")) for item in property_details),
+                dtype=NUMERIC_COLUMNS["bathrooms"],
+                count=len(property_details),
+            ),
+            "has_floorplan": np.fromiter(
+                (bool(item.get("has_floorplan")) for item in property_details), dtype=bool, count=len(property_details)
+            ),
+            "within_travel_time": np.fromiter(
+                (TRAVEL_CODES.get(item.get("within_travel_time", True), 1) for item in property_details),
+                dtype=np.int8,
+                count=len(property_details),
+            ),
+            "borough": np.fromiter(
+                (boroughs.setdefault(item.get("borough") or borough, len(boroughs)) for item in property_details),
+                dtype=np.int16,
+                count=len(property_details),
+            ),
+        }
+        for name in ("area", "latitude", "longitude"):
+            columns[name] = np.array(
+                [np.nan if item.get(name) is None else item[name] for item in property_details],
+                dtype=NUMERIC_COLUMNS[name],
+            )
+        for name in TEXT_COLUMNS:
+            columns[name] = np.array([item.get(name) or "" for item in property_details], dtype=object)
+        return cls(columns, list(boroughs))
+
+    @classmethod
+    def concat(cls, batches: Sequence["PropertyBatch"]) -> "PropertyBatch":
+        """
+        Joins batches into one, merging their borough names.
+
+        Args:
+        batches (Sequence[PropertyBatch]): The batches to join.
+
+        Returns:
+        PropertyBatch: Every row of every batch, in order.
+        """
+        if not batches:
+            return cls.from_dicts([])
+
+        boroughs: Dict[str, int] = {}
+        borough_codes = []
+        for batch in batches:
+            remap = np.array([boroughs.setdefault(name, len(boroughs)) for name in batch.boroughs], dtype=np.int16)
+            borough_codes.append(remap[batch.columns["borough"]] if len(remap) else batch.columns["borough"])
+
+        columns = {
+            name: np.concatenate([batch.columns[name] for batch in batches])
+            for name in batches[0].columns
+            if name != "borough"
+        }
+        columns["borough"] = np.concatenate(borough_codes)
+        return cls(columns, list(boroughs))
+
+    def __len__(self) -> int:
+        return len(self.columns["url"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def take(self, rows: np.ndarray) -> "PropertyBatch":
+        """
+        Selects rows by a boolean mask or an array of indices.
+
+        Args:
+        rows (np.ndarray): The mask or indices.
+
+        Returns:
+        PropertyBatch: The selected rows.
+        """
+        return PropertyBatch({name: column[rows] for name, column in self.columns.items()}, self.boroughs)
+
+    def filter_mask(
+        self,
+        min_price: Optional[int] = None,
+        max_price: Optional[int] = None,
+        min_bedrooms: Optional[int] = None,
+        max_bedrooms: Optional[int] = None,
+        min_bathrooms: Optional[int] = None,
+        min_area: Optional[float] = None,
+    ) -> np.ndarray:
+        """
+        Checks every row against the search criteria in one vectorised pass. Rows whose value is unknown for a
+        criterion are kept.
+
+        Args:
+        min_price (int): Minimum rent per calendar month.
+        max_price (int): Maximum rent per calendar month.
+        min_bedrooms (int): Minimum number of bedrooms.
+        max_bedrooms (int): Maximum number of bedrooms.
+        min_bathrooms (int): Minimum number of bathrooms.
+        min_area (float): Minimum floor area, applied to properties with a floorplan, as in the floor area stage.
+
+        Returns:
+        np.ndarray: Boolean array, True for the rows that meet every given criterion.
+        """
+        mask = np.ones(len(self), dtype=bool)
+        price = self.columns["price_pcm"]
+        known_price = price >= 0
+        if min_price is not None:
+            mask &= ~known_price | (price >= int(min_price))
+        if max_price is not None:
+            mask &= ~known_price | (price <= int(max_price))
+
+        bedrooms = self.columns["bedrooms"]
+        if min_bedrooms is not None:
+            mask &= (bedrooms < 0) | (bedrooms >= int(min_bedrooms))
+        if max_bedrooms is not None:
+            mask &= (bedrooms < 0) | (bedrooms <= int(max_bedrooms))
+        if min_bathrooms is not None:
+            bathrooms = self.columns["bathrooms"]
+            mask &= (bathrooms < 0) | (bathrooms >= int(min_bathrooms))
+        if min_area is not None:
+            mask &= ~self.columns["has_floorplan"] | (np.nan_to_num(self.columns["area"]) >= float(min_area))
+        return mask
+
+    def sorted_for_output(self) -> "PropertyBatch":
+        """
+        Sorts by price ascending, then by floor area descending, and drops repeated URLs, keeping the first.
+
+        Returns:
+        PropertyBatch: The sorted, deduplicated rows. Rows with an unknown price come last.
+        """
+        price = self.columns["price_pcm"].astype(np.int64)
+        price[price < 0] = np.iinfo(np.int64).max
+        order = np.lexsort((-np.nan_to_num(self.columns["area"]), price))
+        batch = self.take(order)
+        _, first = np.unique(batch.columns["url"].astype(str), return_index=True)
+        return batch.take(np.sort(first))
+
+    def iter_frames(self, chunk_size: int = 10_000) -> Iterator["pd.DataFrame"]:
+        """
+        Converts the batch to DataFrames of the output columns, a chunk of rows at a time.
+
+        Args:
+        chunk_size (int): Rows per DataFrame.
+
+        Yields:
+        pd.DataFrame: The next chunk of rows.
+        """
+        import pandas as pd
+
+        for start in range(0, len(self), chunk_size):
+            chunk = self.take(slice(start, start + chunk_size))
+            frame = {name: chunk.columns[name] for name in OUTPUT_COLUMNS if name in chunk.columns}
+            frame["price_pcm"] = pd.array(np.where(chunk["price_pcm"] >= 0, chunk["price_pcm"], None), dtype="Int32")
+            frame["bedrooms"] = pd.array(np.where(chunk["bedrooms"] >= 0, chunk["bedrooms"], None), dtype="Int16")
+            frame["bathrooms"] = pd.array(np.where(chunk["bathrooms"] >= 0, chunk["bathrooms"], None), dtype="Int16")
+            frame["within_travel_time"] = TRAVEL_VALUES[chunk["within_travel_time"] + 1]
+            frame["borough"] = pd.Categorical.from_codes(chunk["borough"], categories=self.boroughs)
+            yield pd.DataFrame(frame, columns=OUTPUT_COLUMNS)
+
+    def write(self, path: str, chunk_size: int = 10_000) -> None:
+        """
+        Writes the output columns to a CSV file, or a Parquet file if the path ends in .parquet, a chunk at a time.
+
+        Args:
+        path (str): The output file.
+        chunk_size (int): Rows converted and written at a time.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if path.endswith(".parquet"):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            writer = None
+            try:
+                for frame in self.iter_frames(chunk_size):
+                    table = pa.Table.from_pandas(frame, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(path, table.schema)
+                    writer.write_table(table)
+            finally:
+                if writer is not None:
+                    writer.close()
+        else:
+            with open(path, "w", newline="") as file:
+                for index, frame in enumerate(self.iter_frames(chunk_size)):
+                    frame.to_csv(file, index=False, header=index == 0)
+        logging.info(f"Wrote {len(self)} properties to {path}")
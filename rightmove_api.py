@@ -0,0 +1,324 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin
+from http_client import HttpClient, http_client
+from instrumentation import metrics
+from kv_cache import SqliteCache
+from page_model import extract_embedded_json
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+RIGHTMOVE_BASE_URL = "https://www.rightmove.co.uk"
+
+# Rightmove shows 24 results per page and stops paginating after 42 pages
+RESULTS_PER_PAGE = 24
+MAX_RESULT_PAGES = 42
+MAX_RESULTS = RESULTS_PER_PAGE * MAX_RESULT_PAGES
+
+
+def result_count(model: dict) -> int:
+    """
+    Reads the total number of results for a search from its JSON model, e.g. 1234 from "1,234".
+
+    Args:
+    model (dict): The decoded window.jsonModel of a results page.
+
+    Returns:
+    int: The number of results, or 0 if the model does not say.
+    """
+    try:
+        return int(str(model.get("resultCount") or 0).replace(",", ""))
+    except ValueError:
+        return 0
+
+
+def property_id_from_url(url: str) -> str:
+    """
+    Extracts the Rightmove property ID from a property URL, e.g. "123456789" from
+    "https://www.rightmove.co.uk/properties/123456789#/?channel=RES_LET".
+
+    Args:
+    url (str): URL of the property's page.
+
+    Returns:
+    str: The property ID.
+    """
+    return url.split("/properties/")[1].split("/")[0].split("#")[0].split("?")[0]
+
+
+def property_from_card(card: dict, base_url: str = RIGHTMOVE_BASE_URL) -> Dict[str, str]:
+    """
+    Converts a property from the search results JSON model into the same dict produced by the Selenium scraper.
+
+    Args:
+    card (dict): A single entry of jsonModel["properties"].
+    base_url (str): The site the card came from, used to make its property URL absolute.
+
+    Returns:
+    Dict[str, str]: The property details.
+    """
+    price = card.get("price") or {}
+    display_prices = price.get("displayPrices") or [{}]
+    location = card.get("location") or {}
+    return {
+        "has_floorplan": bool(card.get("numberOfFloorplans")),
+        "url": urljoin(base_url, card.get("propertyUrl", "")),
+        "price_pcm": display_prices[0].get("displayPrice", ""),
+        "bedrooms": str(card.get("bedrooms", "")),
+        "bathrooms": str(card.get("bathrooms") or 0),
+        "address": (card.get("displayAddress") or "").strip(),
+        "summary": (card.get("summary") or "").strip(),
+        "latitude": location.get("latitude"),
+        "longitude": location.get("longitude"),
+    }
+
+
+def fetch_pages_concurrently(urls: Iterable[str], concurrency: int = 8, client: Optional[HttpClient] = None) -> Dict[str, str]:
+    """
+    Fetches many pages concurrently on a thread pool over the shared HTTP client, which limits the rate and
+    concurrency of requests to each host and retries failed requests.
+
+    Args:
+    urls (Iterable[str]): The URLs to fetch. Duplicates are fetched once.
+    concurrency (int): Most requests waiting or in flight at once; the client may allow fewer per host.
+    client (HttpClient): The client to fetch with. Defaults to the shared client.
+
+    Returns:
+    Dict[str, str]: Page HTML keyed by URL. URLs that could not be fetched are left out.
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+    client = client or http_client
+
+    def fetch(url: str) -> Optional[str]:
+        try:
+            response = client.get(url)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logging.warning(f"Failed to fetch {url}: {e}")
+            return None
+        metrics.increment("network_bytes_total", len(response.content), source="property_page")
+        return response.text
+
+    pages = {}
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(urls))) as executor:
+        for url, html in zip(urls, executor.map(fetch, urls)):
+            if html is not None:
+                pages[url] = html
+    return pages
+
+
+class RightmoveSearchClient:
+    def __init__(
+        self, user_agent: Optional[str] = None, timeout: Optional[float] = None, client: Optional[HttpClient] = None
+    ) -> None:
+        """
+        Initialize an HTTP-only client for Rightmove search results, sent over the shared HTTP client.
+
+        The client is thread safe and is intended to be shared by every borough worker.
+
+        Args:
+        user_agent (str): User-Agent header sent with every request. Defaults to the HTTP client's.
+        timeout (float): Per-request timeout in seconds. Defaults to the HTTP client's.
+        client (HttpClient): The client to send requests with. Defaults to the shared client.
+        """
+        self.client = client or http_client
+        self.timeout = timeout
+        self.headers = {"Accept": "text/html,application/xhtml+xml"}
+        if user_agent:
+            self.headers["User-Agent"] = user_agent
+
+    def fetch_search_page(self, search_url: str, index: int = 0) -> dict:
+        """
+        Fetches one page of search results and returns its embedded JSON model.
+
+        Args:
+        search_url (str): The search URL, as built by RightmoveScraper.construct_search_url.
+        index (int): Offset of the first result on the page.
+
+        Returns:
+        dict: The decoded window.jsonModel.
+
+        Raises:
+        ValueError: If the page does not contain a JSON model.
+        """
+        with metrics.timed("page_load_seconds", backend="http"):
+            response = self.client.get(
+                search_url,
+                params={"index": index} if index else None,
+                headers=self.headers,
+                **({"timeout": self.timeout} if self.timeout else {}),
+            )
+        response.raise_for_status()
+        metrics.increment("network_bytes_total", len(response.content), source="search")
+        model = extract_embedded_json(response.content, "window.jsonModel")
+        if model is None:
+            raise ValueError(f"No search results model found at {response.url}")
+        return model
+
+    def iter_result_pages(self, search_url: str, first_page: Optional[dict] = None) -> Iterator[dict]:
+        """
+        Yields the JSON model of every results page for a search, following the pagination.
+
+        Args:
+        search_url (str): The search URL.
+        first_page (dict): The first page's model, if it was already fetched, e.g. to read the result count.
+
+        Yields:
+        dict: The decoded window.jsonModel of each page.
+        """
+        index = 0
+        page_number = 1
+        while True:
+            logging.info(f"Processing page number: {page_number}")
+            if page_number == 1 and first_page is not None:
+                model = first_page
+            else:
+                model = self.fetch_search_page(search_url, index)
+            yield model
+
+            next_index = (model.get("pagination") or {}).get("next")
+            if not model.get("properties") or not next_index:
+                logging.info("Reached final page.")
+                break
+            index = int(next_index)
+            page_number += 1
+
+    def iter_result_pages_many(self, searches: List[Tuple[str, Optional[dict]]], workers: int = 4) -> Iterator[dict]:
+        """
+        Pages through several searches concurrently, yielding each results page as soon as it arrives.
+
+        A search that fails is logged and skipped, so that one bad search does not stop the others.
+
+        Args:
+        searches (List[Tuple[str, Optional[dict]]]): Search URLs, each with its first page's model if already fetched.
+        workers (int): Number of searches paged through at once.
+
+        Yields:
+        dict: The decoded window.jsonModel of each page, in no particular order. If the generator is closed before
+              the last page, the workers stop after the page they are fetching.
+        """
+        pending = queue.Queue()
+        for search in searches:
+            pending.put(search)
+        # Bounded, so that workers wait for the consumer rather than buffering every page
+        pages = queue.Queue(maxsize=workers * 2)
+        finished = object()
+        stopped = threading.Event()
+
+        def put(page) -> bool:
+            # Waits for room on the queue, checking regularly whether the consumer has gone
+            while not stopped.is_set():
+                try:
+                    pages.put(page, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def work() -> None:
+            try:
+                while not stopped.is_set():
+                    try:
+                        search_url, first_page = pending.get_nowait()
+                    except queue.Empty:
+                        break
+                    try:
+                        for model in self.iter_result_pages(search_url, first_page):
+                            if not put(model):
+                                return
+                    except Exception as e:
+                        logging.error(f"Error fetching results for {search_url}: {e}")
+            finally:
+                put(finished)
+
+        workers = max(1, min(workers, len(searches)))
+        for worker in range(workers):
+            threading.Thread(target=work, name=f"search-shard-{worker}", daemon=True).start()
+
+        try:
+            remaining = workers
+            while remaining:
+                model = pages.get()
+                if model is finished:
+                    remaining -= 1
+                else:
+                    yield model
+        finally:
+            # Also reached when the consumer closes the generator early. Emptying the queue wakes the workers blocked
+            # on it, and the stop event keeps them from blocking again.
+            stopped.set()
+            while True:
+                try:
+                    pages.get_nowait()
+                except queue.Empty:
+                    break
+
+
+class LocationIdentifierCache:
+    def __init__(self, path: str, ttl_days: Optional[float] = 90) -> None:
+        """
+        Initialize an on-disk cache of Rightmove location identifiers, keyed by the location search string.
+
+        Args:
+        path (str): Path of the SQLite database file.
+        ttl_days (float): Days after which a cached identifier is looked up again. None keeps identifiers forever.
+        """
+        self.cache = SqliteCache(path, table="location_identifiers", ttl=ttl_days * 86400 if ttl_days else None)
+
+    @staticmethod
+    def _key(location: str) -> str:
+        """
+        Normalises a location string, since the typeahead ignores case and surrounding whitespace.
+        """
+        return " ".join(location.lower().split())
+
+    def get(self, location: str) -> Optional[str]:
+        """
+        Returns the cached identifier for a location, or None on a miss.
+
+        Args:
+        location (str): The location search string.
+
+        Returns:
+        str: The location identifier, e.g. "REGION^61417".
+        """
+        location_identifier = self.cache.get(self._key(location))
+        metrics.cache_lookup("location_identifiers", int(location_identifier is not None), int(location_identifier is None))
+        return location_identifier
+
+    def set(self, location: str, location_identifier: str) -> None:
+        """
+        Stores the identifier for a location.
+
+        Args:
+        location (str): The location search string.
+        location_identifier (str): The identifier read from the search URL.
+        """
+        self.cache.set(self._key(location), location_identifier)
+
+    def invalidate(self, locations: Optional[Iterable[str]] = None) -> int:
+        """
+        Removes cached identifiers so they are looked up again on the next run.
+
+        Args:
+        locations (Iterable[str]): Locations to forget. If empty or None, the whole cache is cleared.
+
+        Returns:
+        int: The number of identifiers removed.
+        """
+        if not locations:
+            return self.cache.clear()
+        return sum(self.cache.delete(self._key(location)) for location in locations)
+
+    def close(self) -> None:
+        """
+        Closes the underlying database.
+        """
+        self.cache.close()
@@ -1,20 +1,46 @@
 import logging
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException
-from selenium.webdriver.common.action_chains import ActionChains
-from utils import word_ngrams
+from contextlib import closing
+from driver_pool import DriverLease, create_chrome_driver, record_page_load
+from rightmove_api import (
+    MAX_RESULTS,
+    RIGHTMOVE_BASE_URL,
+    LocationIdentifierCache,
+    RightmoveSearchClient,
+    fetch_pages_concurrently,
+    property_from_card,
+    property_id_from_url,
+    result_count,
+)
+from http_client import http_client
+from instrumentation import metrics
+from page_model import PageModel
+from keyword_filter import KeywordFilter
 import re
 import datetime
-from typing import List, Dict
+from typing import TYPE_CHECKING, Iterator, List, Dict, Optional, Tuple
+
+# Selenium is imported where it is used, so the http backend with cached location identifiers never pays for it
+if TYPE_CHECKING:
+    from selenium import webdriver
+    from selenium.webdriver.support.ui import WebDriverWait
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+# Prices Rightmove's rental search accepts as minPrice and maxPrice, in pounds per month, as listed in its price
+# dropdowns. Other values may be snapped to a step or ignored, so searches are only split at these.
+PRICE_STEPS = (
+    100, 150, 200, 250, 300, 350, 400, 450, 500, 600, 700, 800, 900, 1000, 1100, 1200, 1250, 1300, 1400, 1500, 1750,
+    2000, 2250, 2500, 2750, 3000, 3500, 4000, 4500, 5000, 5500, 6000, 6500, 7000, 8000, 9000, 10000, 12500, 15000,
+    17500, 20000, 25000, 30000, 35000, 40000,
+)
+
+# Seconds to wait for the cookie popup, which a reused browser profile does not show
+COOKIE_POPUP_WAIT_SECONDS = 2
+
+# Search bounds of a shard: min price, max price, min bedrooms, max bedrooms
+ShardBounds = Tuple[str, str, str, str]
+
 
 class RightmoveScraper:
     def __init__(
@@ -30,6 +56,16 @@ class RightmoveScraper:
         floorplan_required: bool,
         max_days_since_added: str,
         exclude: list[str],
+        exclude_descriptions: Optional[List[str]] = None,
+        include: Optional[List[str]] = None,
+        exclude_postcode_districts: Optional[List[str]] = None,
+        driver_lease: Optional[DriverLease] = None,
+        search_backend: str = "selenium",
+        search_client: Optional[RightmoveSearchClient] = None,
+        location_cache: Optional[LocationIdentifierCache] = None,
+        detail_concurrency: int = 8,
+        shard_workers: int = 4,
+        base_url: str = RIGHTMOVE_BASE_URL,
     ) -> None:
         """
         Initialize the RightmoveScraper with search criteria for property listings.
@@ -45,7 +81,18 @@ class RightmoveScraper:
         min_let_date (str): Let available date.
         floorplan_required (bool): Is a floorplan required?
         max_days_since_added (str): Number of days since property added to site. Valid vaues are "Anytime", 1, 3, 7 and 14.
-        exclude (list): Filter out properties based on these keywords.
+        exclude (list): Filter out properties whose address contains these keywords.
+        exclude_descriptions (list): Filter out properties whose description contains these keywords.
+        include (list): Keep properties whose address or description contains these keywords, even if excluded.
+        exclude_postcode_districts (list): Filter out properties in these postcode districts or areas, e.g. "E1" or "IG".
+        driver_lease (DriverLease): Optional WebDriver session leased from a DriverPool. Page loads are counted against the lease, and the scraper leaves quitting the driver to the pool.
+        search_backend (str): "selenium" to page through results in the browser, or "http" to fetch result pages directly and decode their JSON model.
+        search_client (RightmoveSearchClient): Optional shared client for the "http" backend.
+        location_cache (LocationIdentifierCache): Optional persistent cache of location identifiers. A hit skips the homepage search entirely.
+        detail_concurrency (int): Maximum number of property pages fetched at once by fetch_letting_details_many.
+        shard_workers (int): Number of search shards paged through at once by the "http" backend, for searches with
+                             more results than Rightmove will paginate through.
+        base_url (str): The site to search, e.g. a local stand-in server for benchmarks.
         """
         self.location = location
         self.min_price = min_price
@@ -60,28 +107,110 @@ class RightmoveScraper:
         self.floorplan_required = floorplan_required
         self.max_days_since_added = max_days_since_added
         self.exclude = exclude
-        self.longest_exclude = max([len(x.split()) for x in exclude])
-        self.driver = self._init_driver()
-        self.wait = WebDriverWait(self.driver, 10)
+        self.keyword_filter = KeywordFilter(
+            exclude,
+            exclude_descriptions=exclude_descriptions or (),
+            include=include or (),
+            exclude_postcode_districts=exclude_postcode_districts or (),
+        )
+        if search_backend not in ("selenium", "http"):
+            raise ValueError(f"Unknown search backend: {search_backend}")
+        self.search_backend = search_backend
+        self.search_client = search_client or (RightmoveSearchClient() if search_backend == "http" else None)
+        self.search_url = ""
+        self.location_cache = location_cache
+        self.detail_concurrency = detail_concurrency
+        self.shard_workers = shard_workers
+        self.base_url = base_url.rstrip("/")
+        self._location_identifier = None
+        self.driver_lease = driver_lease
+        self._driver = None
+        self._wait = None
+        self.pages_loaded = 0
+
+    @property
+    def driver(self) -> "webdriver.Chrome":
+        """
+        The WebDriver session, launched on first use so that the "http" backend only starts Chrome when it is needed.
+        """
+        if self.driver_lease is not None:
+            return self.driver_lease.driver
+        if self._driver is None:
+            self._driver = self._init_driver()
+        return self._driver
+
+    @property
+    def wait(self) -> "WebDriverWait":
+        """
+        A WebDriverWait bound to the driver.
+        """
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        if self._wait is None:
+            self._wait = WebDriverWait(self.driver, 10)
+        return self._wait
 
-    def _init_driver(self) -> webdriver.Chrome:
+    def _init_driver(self) -> "webdriver.Chrome":
         """
         Initializes and returns a Chrome WebDriver.
 
         Returns:
         WebDriver: An instance of Chrome WebDriver.
         """
-        # Set up Chrome options
-        chrome_options = webdriver.ChromeOptions()
-        return webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
+        return create_chrome_driver()
+
+    def _load_page(self, url: str, page: str) -> None:
+        """
+        Navigates the driver to a URL, counting the page load so that pooled drivers can be recycled. The load waits
+        for a slot within the shared HTTP client's limits for the host, so browser and HTTP traffic are paced together.
+
+        Load times, requests made and blocked, and bytes received are recorded per kind of page and browser profile,
+        so that profiles can be compared page by page.
+
+        Args:
+        url (str): The URL to load.
+        page (str): The kind of page, e.g. "home", "search" or "property".
+        """
+        profile = self._profile_name()
+        timer = metrics.timed("page_load_seconds", backend="selenium", page=page, profile=profile)
+        with http_client.throttle(url), timer:
+            self.driver.get(url)
+        record_page_load(self.driver, page, profile)
+        self._count_page_load()
+
+    def _profile_name(self) -> str:
+        """
+        Returns the name of the driver's browser profile, used to label page load timings.
+        """
+        return self.driver_lease.profile if self.driver_lease is not None else "default"
+
+    def _count_page_load(self) -> None:
+        """
+        Records a page load, against the driver lease if there is one.
+        """
+        self.pages_loaded += 1
+        if self.driver_lease is not None:
+            self.driver_lease.pages_loaded += 1
 
     def accept_cookies(self) -> None:
         """
         Accepts cookies on the Rightmove website by clicking the 'Accept all' button.
         """
-        # Wait for the cookie popup to be present and then locate the 'Accept all' button
-        wait = WebDriverWait(self.driver, 10)
-        accept_button = wait.until(EC.element_to_be_clickable((By.XPATH, '//button[text()="Accept all"]')))
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        # A reused browser profile remembers that cookies were accepted, so the popup is not shown. Waiting briefly,
+        # rather than for the full page wait, keeps that from costing every homepage load.
+        locator = (By.XPATH, '//button[text()="Accept all"]')
+        try:
+            accept_button = WebDriverWait(self.driver, COOKIE_POPUP_WAIT_SECONDS).until(
+                EC.element_to_be_clickable(locator)
+            )
+        except TimeoutException:
+            logging.info("No cookie popup shown. Cookies were already accepted.")
+            return
 
         # Click the 'Accept all' button
         accept_button.click()
@@ -93,8 +222,29 @@ class RightmoveScraper:
         Returns:
         str: The location identifier if found.
         """
+        if self.location_cache is not None:
+            location_identifier = self.location_cache.get(self.location)
+            if location_identifier:
+                logging.info(f"Using cached location identifier for {self.location}: {location_identifier}")
+                return location_identifier
+
+        location_identifier = self._search_location_identifier()
+        if location_identifier and self.location_cache is not None:
+            self.location_cache.set(self.location, location_identifier)
+        return location_identifier
+
+    def _search_location_identifier(self) -> str:
+        """
+        Looks up the location identifier by searching for the location on the Rightmove homepage.
+
+        Returns:
+        str: The location identifier if found.
+        """
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+
         # Perform initial search to get the location identifier
-        self.driver.get("https://www.rightmove.co.uk")
+        self._load_page(self.base_url, "home")
 
         self.accept_cookies()
 
@@ -116,22 +266,36 @@ class RightmoveScraper:
         location_identifier_match = re.search(r"locationIdentifier=([^&]+)", current_url)
         return location_identifier_match.group(1) if location_identifier_match else ""
 
-    def construct_search_url(self) -> str:
+    def construct_search_url(
+        self,
+        min_price: Optional[str] = None,
+        max_price: Optional[str] = None,
+        min_bedrooms: Optional[str] = None,
+        max_bedrooms: Optional[str] = None,
+    ) -> str:
         """
         Constructs the search URL for the property listing based on the given criteria.
 
+        Args:
+        min_price (str): Optionally overrides the minimum price, e.g. for one shard of a search.
+        max_price (str): Optionally overrides the maximum price.
+        min_bedrooms (str): Optionally overrides the minimum number of bedrooms.
+        max_bedrooms (str): Optionally overrides the maximum number of bedrooms.
+
         Returns:
         str: The constructed search URL if possible.
         """
-        location_identifier = self.get_location_identifier()
+        if not self._location_identifier:
+            self._location_identifier = self.get_location_identifier()
+        location_identifier = self._location_identifier
         if location_identifier:
             search_url = (
-                f"https://www.rightmove.co.uk/property-to-rent/find.html?"
+                f"{self.base_url}/property-to-rent/find.html?"
                 f"locationIdentifier={location_identifier}&"
-                f"maxBedrooms={self.max_bedrooms}&"
-                f"minBedrooms={self.min_bedrooms}&"
-                f"maxPrice={self.max_price}&"
-                f"minPrice={self.min_price}&"
+                f"maxBedrooms={self.max_bedrooms if max_bedrooms is None else max_bedrooms}&"
+                f"minBedrooms={self.min_bedrooms if min_bedrooms is None else min_bedrooms}&"
+                f"maxPrice={self.max_price if max_price is None else max_price}&"
+                f"minPrice={self.min_price if min_price is None else min_price}&"
                 f"propertyTypes={self.property_type}&"
                 f"includeLetAgreed=false&"
                 f"mustHave=&"
@@ -154,31 +318,205 @@ class RightmoveScraper:
         """
         Navigates to the constructed search URL and initiates the property search.
         """
-        search_url = self.construct_search_url()
-        if search_url:
-            self.driver.get(search_url)
+        self.search_url = self.construct_search_url()
+        if self.search_url:
+            # The http backend fetches result pages itself in get_property_details
+            if self.search_backend == "selenium":
+                self._load_page(self.search_url, "search")
         else:
             logging.error("Search URL is not available.")
 
-    def keyword_filtering(self, text: str) -> bool:
+    def keyword_filtering(self, text: str, description: str = "") -> bool:
         """
-        Checks if the provided text contains any of the excluded keywords.
+        Checks if the provided address, or description, contains any of the excluded keywords.
         """
-        n_grams = word_ngrams(text, self.longest_exclude)
-        if n_grams & set(self.exclude):
-            return True
-        else:
+        return self.keyword_filter.excluded_by(text, description) is not None
+
+    def passes_card_filters(self, address: str, num_bathrooms: int, has_floorplan: bool, description: str = "") -> bool:
+        """
+        Applies the filters that only need the information on a search result card.
+
+        Args:
+        address (str): The property's display address.
+        num_bathrooms (int): Number of bathrooms.
+        has_floorplan (bool): Whether the card advertises a floorplan.
+        description (str): The property's description on the card.
+
+        Returns:
+        bool: True if the property should be kept.
+        """
+        # Filter out properties if their address or description contains an excluded keyword
+        excluded_by = self.keyword_filter.excluded_by(address, description)
+        if excluded_by is not None:
+            logging.info(f"Filter out {address} ({excluded_by})")
+            metrics.increment("rejections_total", stage="search_card", reason="keyword")
             return False
 
+        if self.floorplan_required and not has_floorplan:
+            metrics.increment("rejections_total", stage="search_card", reason="no_floorplan")
+            return False
+
+        # Keep only properties with enough bathrooms
+        if num_bathrooms < self.min_bathrooms:
+            metrics.increment("rejections_total", stage="search_card", reason="bathrooms")
+            return False
+        return True
+
     def get_property_details(self) -> List[Dict[str, str]]:
         """
-        Scrapes property details from the search results pages.
+        Scrapes property details from the search results pages, using the configured search backend.
 
         Returns:
         List[Dict[str, str]]: A list of dictionaries, each containing details of a property.
         """
-        # Initialize an empty list to store property details
-        property_details = []
+        return list(self.iter_property_details())
+
+    def iter_property_details(self) -> Iterator[Dict[str, str]]:
+        """
+        Yields property details as each search result card is read, so that later stages can start before the last
+        results page has loaded.
+
+        Yields:
+        Dict[str, str]: The details of a property that passed the search result filters.
+        """
+        if self.search_backend == "http":
+            return self._iter_property_details_http()
+        return self._iter_property_details_selenium()
+
+    @staticmethod
+    def _split_shard(bounds: ShardBounds) -> Optional[List[ShardBounds]]:
+        """
+        Splits a shard's search bounds in two, by bedrooms while there is a range of them, otherwise by price.
+
+        Bedroom ranges are split into disjoint halves. Prices are split at the price step nearest the middle of the
+        range. Rightmove's price limits are inclusive, so the two halves share that one price, and listings at exactly
+        that price are deduplicated later.
+
+        Returns:
+        List[ShardBounds]: The two halves, or None if the shard cannot be split further.
+        """
+        min_price, max_price, min_bedrooms, max_bedrooms = bounds
+        try:
+            low, high = int(min_bedrooms), int(max_bedrooms)
+        except ValueError:
+            low = high = 0
+        if low < high:
+            middle = (low + high) // 2
+            return [
+                (min_price, max_price, str(low), str(middle)),
+                (min_price, max_price, str(middle + 1), str(high)),
+            ]
+
+        try:
+            low, high = int(min_price), int(max_price)
+        except ValueError:
+            return None
+        steps = [step for step in PRICE_STEPS if low < step < high]
+        if not steps:
+            return None
+        middle = min(steps, key=lambda step: abs(2 * step - low - high))
+        return [
+            (str(low), str(middle), min_bedrooms, max_bedrooms),
+            (str(middle), str(high), min_bedrooms, max_bedrooms),
+        ]
+
+    def plan_search_shards(self) -> List[Tuple[str, dict]]:
+        """
+        Splits the search into shards small enough for Rightmove to paginate through completely.
+
+        Rightmove stops paginating after MAX_RESULTS results, so a search with more is split into bedroom sub-ranges
+        and then price bands, using the result count on each shard's first page, until every shard fits.
+
+        Returns:
+        List[Tuple[str, dict]]: The search URL of each shard, with its first results page.
+        """
+        pending = [(str(self.min_price), str(self.max_price), str(self.min_bedrooms), str(self.max_bedrooms))]
+        shards = []
+        while pending:
+            bounds = pending.pop()
+            search_url = self.construct_search_url(*bounds)
+            first_page = self.search_client.fetch_search_page(search_url)
+            count = result_count(first_page)
+            if count > MAX_RESULTS:
+                halves = self._split_shard(bounds)
+                if halves:
+                    pending.extend(halves)
+                    continue
+                logging.warning(f"Search {search_url} has {count} results and cannot be split. Some will be missed.")
+            shards.append((search_url, first_page))
+
+        if len(shards) > 1:
+            logging.info(f"Split the search for {self.location} into {len(shards)} shards.")
+        return shards
+
+    def _iter_property_details_http(self) -> Iterator[Dict[str, str]]:
+        """
+        Fetches every results page over HTTP and builds the property details from the embedded JSON model.
+
+        Searches with more results than Rightmove paginates through are sharded and the shards fetched concurrently.
+
+        Yields:
+        Dict[str, str]: The details of a property that passed the search result filters.
+        """
+        if not self.search_url:
+            logging.error("Search URL is not available.")
+            return
+
+        shards = self.plan_search_shards()
+        if len(shards) == 1:
+            pages = self.search_client.iter_result_pages(*shards[0])
+        else:
+            pages = self.search_client.iter_result_pages_many(shards, workers=self.shard_workers)
+
+        # Neighbouring shards overlap at their price boundary
+        seen = set()
+        # Closed with this generator, so that the shard workers stop if the caller stops early
+        with closing(pages):
+            for model in pages:
+                for card in model.get("properties", []):
+                    property_detail = property_from_card(card, self.base_url)
+                    property_id = property_id_from_url(property_detail["url"])
+                    if property_id in seen:
+                        continue
+                    seen.add(property_id)
+                    if self.passes_card_filters(
+                        property_detail["address"],
+                        int(property_detail["bathrooms"]),
+                        property_detail["has_floorplan"],
+                        property_detail["summary"],
+                    ):
+                        yield property_detail
+
+    def _warn_if_truncated(self) -> None:
+        """
+        Warns if the search loaded in the browser has more results than Rightmove paginates through. The browser pages
+        through a single search, so only the "http" backend splits such searches into shards.
+        """
+        try:
+            count = self.driver.execute_script("return (window.jsonModel || {}).resultCount")
+            count = result_count({"resultCount": count})
+        except Exception as e:
+            logging.debug(f"Unable to read the result count: {e}")
+            return
+        if count > MAX_RESULTS:
+            logging.warning(
+                f"Search for {self.location} has {count} results, but only the first {MAX_RESULTS} can be paged "
+                f"through in the browser. Narrow the search or use the http search backend, which splits it up."
+            )
+            metrics.increment("truncated_searches_total", backend="selenium")
+
+    def _iter_property_details_selenium(self) -> Iterator[Dict[str, str]]:
+        """
+        Scrapes property details by paging through the search results in the browser.
+
+        Yields:
+        Dict[str, str]: The details of a property that passed the search result filters.
+        """
+        from selenium.common.exceptions import NoSuchElementException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+
+        self._warn_if_truncated()
 
         # Start processing pages
         page_number = 1
@@ -196,49 +534,46 @@ class RightmoveScraper:
                     address_element = property.find_element(By.CSS_SELECTOR, "address.propertyCard-address")
                     address = address_element.text
 
-                    # Filter out properties if their address contains an excluded keyword
-                    if self.keyword_filtering(address):
-                        logging.info(f"Filter out {address}")
-                        continue
-
                     # Check if the property has enough bathrooms
                     bathroom_icon = property.find_element(By.CSS_SELECTOR, "span.no-svg-bathroom-icon + span.text")
                     num_bathrooms = int(bathroom_icon.get_attribute("textContent"))
 
-                    try:
-                        # Check if the property card mentions a floorplan
-                        floorplan_element = property.find_element(By.CSS_SELECTOR, 'a[data-test="property-floorplan-icon"]')
-                    except NoSuchElementException:
-                        if self.floorplan_required:
-                            continue
-                        else:
-                            floorplan_element = None
-
-                    # Process only if the property has enough bathrooms
-                    if num_bathrooms >= self.min_bathrooms:
-                        # Extract property URL
-                        property_url_element = property.find_element(By.CSS_SELECTOR, "a.propertyCard-link")
-                        property_url = property_url_element.get_attribute("href")
-
-                        # Extract price
-                        price_element = property.find_element(By.CSS_SELECTOR, "span.propertyCard-priceValue")
-                        price_pcm = price_element.text
-
-                        # Extract number of bedrooms
-                        bedrooms_element = property.find_element(By.CSS_SELECTOR, "span.no-svg-bed-icon + span.text")
-                        bedrooms = bedrooms_element.get_attribute("textContent").strip()
-
-                        # Append the details to the list
-                        property_details.append(
-                            {
-                                "has_floorplan": True if floorplan_element else False,
-                                "url": property_url,
-                                "price_pcm": price_pcm,
-                                "bedrooms": bedrooms,
-                                "bathrooms": str(num_bathrooms),
-                                "address": address,
-                            }
-                        )
+                    # Check if the property card mentions a floorplan
+                    has_floorplan = bool(property.find_elements(By.CSS_SELECTOR, 'a[data-test="property-floorplan-icon"]'))
+
+                    # The description is optional on a card
+                    description_elements = property.find_elements(
+                        By.CSS_SELECTOR, "span[data-test='property-description']"
+                    )
+                    description = description_elements[0].text if description_elements else ""
+
+                    if not self.passes_card_filters(address, num_bathrooms, has_floorplan, description):
+                        continue
+
+                    # Extract property URL
+                    property_url_element = property.find_element(By.CSS_SELECTOR, "a.propertyCard-link")
+                    property_url = property_url_element.get_attribute("href")
+
+                    # Extract price
+                    price_element = property.find_element(By.CSS_SELECTOR, "span.propertyCard-priceValue")
+                    price_pcm = price_element.text
+
+                    # Extract number of bedrooms
+                    bedrooms_element = property.find_element(By.CSS_SELECTOR, "span.no-svg-bed-icon + span.text")
+                    bedrooms = bedrooms_element.get_attribute("textContent").strip()
+
+                    yield {
+                        "has_floorplan": has_floorplan,
+                        "url": property_url,
+                        "price_pcm": price_pcm,
+                        "bedrooms": bedrooms,
+                        "bathrooms": str(num_bathrooms),
+                        "address": address,
+                        "summary": description,
+                        # Cards in the browser do not show coordinates, so these properties are geocoded
+                        "latitude": None,
+                        "longitude": None,
+                    }
 
                 except NoSuchElementException:
                     # If an element is not found, skip this property
@@ -253,9 +588,38 @@ class RightmoveScraper:
             else:
                 # If the button is not disabled, click it to go to the next page
                 page_number += 1
-                ActionChains(self.driver).move_to_element(next_button).click().perform()
+                self._next_results_page(next_button, properties[0])
+
+    def _next_results_page(self, next_button, first_card) -> None:
+        """
+        Clicks through to the next page of search results and waits for it to load, recording the load like
+        _load_page does.
 
-        return property_details
+        Args:
+        next_button (WebElement): The "Next" pagination button.
+        first_card (WebElement): The first result card of the current page, which the next page replaces.
+        """
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.action_chains import ActionChains
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+
+        profile = self._profile_name()
+        timer = metrics.timed("page_load_seconds", backend="selenium", page="search", profile=profile)
+        with http_client.throttle(self.driver.current_url), timer:
+            ActionChains(self.driver).move_to_element(next_button).click().perform()
+            try:
+                # The next page has loaded once the current page's cards are gone and new ones are present
+                self.wait.until(EC.staleness_of(first_card))
+                self.wait.until(
+                    EC.presence_of_all_elements_located(
+                        (By.CSS_SELECTOR, 'div.l-searchResult[data-test*="propertyCard"]')
+                    )
+                )
+            except TimeoutException:
+                logging.warning("Timed out waiting for the next page of search results to load.")
+        record_page_load(self.driver, "search", profile)
+        self._count_page_load()
 
     def get_property_letting_details(self, url: str) -> Dict[str, str]:
         """
@@ -267,7 +631,10 @@ class RightmoveScraper:
         Returns:
         Dict[str, str]: Letting details including available date, furnish type, and let type.
         """
-        self.driver.get(url)
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+
+        self._load_page(url, "property")
 
         # Locate the article element containing "Letting details"
         article_element = self.wait.until(
@@ -291,6 +658,9 @@ class RightmoveScraper:
         Returns:
         str: The extracted detail.
         """
+        from selenium.common.exceptions import NoSuchElementException
+        from selenium.webdriver.common.by import By
+
         try:
             detail_element = parent_element.find_element(
                 By.XPATH,
@@ -300,20 +670,53 @@ class RightmoveScraper:
         except NoSuchElementException:
             return ""
 
-    def meets_criteria(self, url: str) -> bool:
+    def fetch_page_models_many(self, urls: List[str]) -> Dict[str, PageModel]:
         """
-        Checks if a property meets the specified criteria.
+        Fetches many property pages concurrently over HTTP and extracts their JSON models, each page parsed once.
 
         Args:
-        url (str): URL of the property's page.
+        urls (List[str]): URLs of the properties' pages.
 
         Returns:
-        bool: True if the property meets the criteria, False otherwise.
+        Dict[str, PageModel]: Page models keyed by URL. Pages that could not be fetched or parsed are left out.
+        """
+        with metrics.timed("letting_details_seconds", method="http"):
+            pages = fetch_pages_concurrently(urls, concurrency=self.detail_concurrency)
+        page_models = {}
+        for url, html in pages.items():
+            page_model = PageModel.from_html(html)
+            if page_model is None:
+                logging.warning(f"No page model found at {url}")
+                continue
+            page_models[url] = page_model
+        return page_models
+
+    def fetch_letting_details_many(self, urls: List[str]) -> Dict[str, Dict[str, str]]:
+        """
+        Fetches the letting details of many properties concurrently over HTTP, reading them from each page's JSON model.
+
+        Args:
+        urls (List[str]): URLs of the properties' pages.
+
+        Returns:
+        Dict[str, Dict[str, str]]: Letting details keyed by URL. Pages that could not be fetched or parsed are left out.
         """
-        details = self.get_property_letting_details(url)
+        return {url: page_model.letting_details() for url, page_model in self.fetch_page_models_many(urls).items()}
+
+    def letting_details_meet_criteria(self, details: Dict[str, str]) -> bool:
+        """
+        Checks letting details against the specified criteria.
+
+        Args:
+        details (Dict[str, str]): Letting details, as returned by get_property_letting_details.
 
+        Returns:
+        bool: True if the property meets the criteria, False otherwise.
+        """
         # Check let available date
         let_date_str = details["let_available_date"]
+        if let_date_str == "Now":
+            return datetime.datetime.now() >= self.min_let_date
         if let_date_str != "Ask agent":
             try:
                 let_date = datetime.datetime.strptime(let_date_str, "%d/%m/%Y")
@@ -325,20 +728,42 @@ class RightmoveScraper:
 
         return True
 
+    def meets_criteria(self, url: str) -> bool:
+        """
+        Checks if a property meets the specified criteria.
+
+        Args:
+        url (str): URL of the property's page.
+
+        Returns:
+        bool: True if the property meets the criteria, False otherwise.
+        """
+        with metrics.timed("letting_details_seconds", method="selenium"):
+            details = self.get_property_letting_details(url)
+        return self.letting_details_meet_criteria(details)
+
     def filter_properties(self, property_urls: List[str]) -> List[str]:
         """
         Filters properties based on criteria only on the property page.
 
+        Pages are fetched concurrently over HTTP. Any page that cannot be fetched that way is checked in the browser instead.
+
         Args:
         property_urls (List[str]): List of property URLs to process.
 
         Returns:
         List[str]: URLs of properties that meet the criteria.
         """
-        return [url for url in property_urls if self.meets_criteria(url)]
+        details = self.fetch_letting_details_many(property_urls)
+        return [
+            url
+            for url in property_urls
+            if (self.letting_details_meet_criteria(details[url]) if url in details else self.meets_criteria(url))
+        ]
 
     def close(self) -> None:
         """
-        Closes the WebDriver session.
+        Closes the WebDriver session, unless it was supplied by the caller.
         """
-        self.driver.quit()
+        if self._driver is not None:
+            self._driver.quit()
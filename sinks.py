@@ -0,0 +1,168 @@
+import csv
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import threading
+import time
+from typing import Dict, List
+import requests
+from http_client import http_client
+from page_model import parse_price_pcm
+from records import OUTPUT_COLUMNS
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+
+def _row(property_detail: Dict) -> Dict:
+    """
+    Picks the output columns of a property, with its price parsed as in properties.csv.
+    """
+    row = {column: property_detail.get(column) for column in OUTPUT_COLUMNS}
+    row["price_pcm"] = parse_price_pcm(str(property_detail.get("price_pcm", ""))) or property_detail.get("price_pcm")
+    return row
+
+
+class CsvSink:
+    name = "csv"
+
+    def __init__(self, path: str) -> None:
+        """
+        Initialize a sink that appends each property to a CSV file with the columns of properties.csv, plus the time
+        it was found. The header is written when the file is new.
+
+        Args:
+        path (str): The CSV file.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, property_detail: Dict) -> None:
+        row = {**_row(property_detail), "found_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+        with self._lock:
+            new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            with open(self.path, "a", newline="") as file:
+                writer = csv.DictWriter(file, fieldnames=OUTPUT_COLUMNS + ["found_at"])
+                if new_file:
+                    writer.writeheader()
+                writer.writerow(row)
+
+    def close(self) -> None:
+        pass
+
+
+class JsonlSink:
+    name = "jsonl"
+
+    def __init__(self, path: str) -> None:
+        """
+        Initialize a sink that appends each property, with everything the filter stages recorded about it, to a JSON
+        lines file.
+
+        Args:
+        path (str): The JSON lines file.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, property_detail: Dict) -> None:
+        line = json.dumps({**property_detail, "found_at": time.time()}, default=str)
+        with self._lock, open(self.path, "a") as file:
+            file.write(line + "\n")
+
+    def close(self) -> None:
+        pass
+
+
+class WebhookSink:
+    name = "webhook"
+
+    def __init__(self, url: str, timeout: float = 10.0) -> None:
+        """
+        Initialize a sink that POSTs each property as JSON to a URL, e.g. a local chat bot or home automation hook.
+        Requests go over the shared HTTP client, which retries connection errors and 5xx responses. A request that
+        still fails is logged and the property is not sent again.
+
+        Args:
+        url (str): The URL to POST to.
+        timeout (float): Request timeout in seconds.
+        """
+        self.url = url
+        self.timeout = timeout
+
+    def emit(self, property_detail: Dict) -> None:
+        try:
+            response = http_client.post(self.url, json=_row(property_detail), timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logging.warning(f"Failed to send {property_detail['url']} to {self.url}: {e}")
+
+    def close(self) -> None:
+        pass
+
+
+class DesktopNotificationSink:
+    name = "desktop"
+
+    def __init__(self) -> None:
+        """
+        Initialize a sink that shows a desktop notification for each property, with notify-send on Linux or
+        osascript on macOS.
+        """
+        self.system = platform.system()
+        if self.system == "Linux" and not shutil.which("notify-send"):
+            logging.warning("notify-send is not installed. Desktop notifications are disabled.")
+            self.system = ""
+
+    def emit(self, property_detail: Dict) -> None:
+        title = f"New property: {property_detail.get('price_pcm', '')}"
+        area = f", {property_detail['area']:.0f} sq ft" if property_detail.get("area") else ""
+        message = f"{property_detail.get('address', '')}{area}\n{property_detail['url']}"
+        if self.system == "Linux":
+            command = ["notify-send", title, message]
+        elif self.system == "Darwin":
+            command = ["osascript", "-e", f"display notification {json.dumps(message)} with title {json.dumps(title)}"]
+        else:
+            return
+        try:
+            subprocess.run(command, check=False, timeout=10)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logging.warning(f"Failed to show a desktop notification: {e}")
+
+    def close(self) -> None:
+        pass
+
+
+def create_sinks(settings: List[Dict]) -> List:
+    """
+    Builds the sinks listed in the config, e.g. [{"type": "jsonl", "path": "new_properties.jsonl"}].
+
+    Args:
+    settings (List[Dict]): One entry per sink, with its type and the type's settings.
+
+    Returns:
+    List: The sinks, each with emit(property_detail) and close().
+
+    Raises:
+    ValueError: If a sink type is unknown.
+    """
+    sinks = []
+    for sink_settings in settings:
+        sink_settings = dict(sink_settings)
+        sink_type = sink_settings.pop("type")
+        if sink_type == "csv":
+            sinks.append(CsvSink(**sink_settings))
+        elif sink_type == "jsonl":
+            sinks.append(JsonlSink(**sink_settings))
+        elif sink_type == "webhook":
+            sinks.append(WebhookSink(**sink_settings))
+        elif sink_type == "desktop":
+            sinks.append(DesktopNotificationSink(**sink_settings))
+        else:
+            raise ValueError(f"Unknown sink type: {sink_type}")
+    return sinks
@@ -0,0 +1,50 @@
+import pytest
+from floorplan_analyser import SQ_FT_PER_SQ_M, extract_area_from_text
+
+
+@pytest.mark.parametrize(
+    "text, area",
+    [
+        ("Approx. Gross Internal Area 812 sq ft / 75.4 sq m", 812.0),
+        ("TOTAL FLOOR AREA: 1,024 sq.ft. (95.1 sq.m.) approx.", 1024.0),
+        ("Floor area 650 SQ FT", 650.0),
+        ("Kitchen 3.2m x 2.8m Total approx 70 m²", round(70 * SQ_FT_PER_SQ_M, 1)),
+    ],
+)
+def test_reads_single_area(text, area):
+    assert extract_area_from_text(text) == area
+
+
+def test_same_area_in_both_units_counts_once():
+    # 75.4 sq m is 811.6 sq ft, within rounding of the printed sq ft figure
+    assert extract_area_from_text("812 sq ft (75.4 sq m)") == 812.0
+
+
+def test_prefers_labelled_total_over_floors():
+    text = "Ground Floor 410 sq ft (38.1 sq m) First Floor 402 sq ft (37.3 sq m) Total Area 812 sq ft (75.4 sq m)"
+    assert extract_area_from_text(text) == 812.0
+
+
+def test_largest_labelled_total_wins():
+    text = "Approx. internal area 640 sq ft, plus outbuilding. Gross internal area 810 sq ft"
+    assert extract_area_from_text(text) == 810.0
+
+
+def test_unlabelled_disagreeing_areas_are_ambiguous():
+    assert extract_area_from_text("Flat A 540 sq ft Flat B 720 sq ft") is None
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "Bedroom 12'4 x 10'2 (3.76m x 3.10m)",
+        # Outside the plausible range of a whole property
+        "Store 12 sq ft",
+        "Site 50,000 sq ft",
+        # Millimetres are not square metres
+        "Wall 812 mm",
+    ],
+)
+def test_no_area(text):
+    assert extract_area_from_text(text) is None
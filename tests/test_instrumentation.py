@@ -0,0 +1,35 @@
+import pstats
+import threading
+import time
+from instrumentation import Metrics, StageProfiler
+
+
+def test_prometheus_label_values_are_escaped():
+    metrics = Metrics()
+    metrics.increment("rejections_total", borough='Say "Hi"\\Bye\nNow')
+    line = next(line for line in metrics.prometheus_text().splitlines() if not line.startswith("#"))
+    assert line == 'rightmove_rejections_total{borough="Say \\"Hi\\"\\\\Bye\\nNow"} 1'
+
+
+def test_stage_profiler_profiles_one_call_at_a_time(tmp_path):
+    profiler = StageProfiler()
+    running = threading.Barrier(4)
+
+    def stage(batch):
+        running.wait(timeout=5)
+        time.sleep(0.05)
+        return batch
+
+    profiled = profiler.wrap(stage)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(profiled([1]))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [[1]] * 4
+    # The four calls overlap, so one is profiled and the rest run unprofiled
+    assert (profiler.profiled_calls, profiler.unprofiled_calls) == (1, 3)
+    path = profiler.write(str(tmp_path / "profile"))
+    assert any(function[2] == "stage" for function in pstats.Stats(path).stats)
@@ -0,0 +1,38 @@
+from keyword_filter import KeywordFilter
+
+
+def test_matches_whole_words_ignoring_case_and_punctuation():
+    keyword_filter = KeywordFilter(exclude=["Canning Town", "E1"])
+    assert keyword_filter.excluded_by("12 High St, canning town, London") == "Canning Town"
+    assert keyword_filter.excluded_by("Cable Street, London E1,") == "E1"
+    assert keyword_filter.excluded_by("Westferry Road, London E14") is None
+    assert keyword_filter.excluded_by("Canning Road, London") is None
+
+
+def test_description_keywords_only_check_the_description():
+    keyword_filter = KeywordFilter(exclude_descriptions=["house share"])
+    assert keyword_filter.excluded_by("House Share Lane, London") is None
+    assert keyword_filter.excluded_by("Bow Road, London", "A room in a House-Share near Bow") == "house share"
+    assert keyword_filter.excluded_by("Bow Road, London") is None
+
+
+def test_include_overrides_exclusions():
+    keyword_filter = KeywordFilter(
+        exclude=["Silvertown"], exclude_postcode_districts=["E16"], include=["Royal Wharf"]
+    )
+    assert keyword_filter.excluded_by("Royal Wharf, Silvertown, London E16 2PG") is None
+    assert keyword_filter.excluded_by("Silvertown, London", "Apartment at Royal Wharf") is None
+    assert keyword_filter.excluded_by("Silvertown Way, London E16 1AA") == "Silvertown"
+
+
+def test_postcode_districts_cover_sub_districts_only():
+    keyword_filter = KeywordFilter(exclude_postcode_districts=["E1", " ", "ig"])
+    assert keyword_filter.excluded_by("Wapping, London E1W 3TJ") == "E1"
+    assert keyword_filter.excluded_by("Whitechapel, London E1 6AA") == "E1"
+    assert keyword_filter.excluded_by("Canary Wharf, London E14 9GE") is None
+    assert keyword_filter.excluded_by("Ilford, IG1 1AA") == "IG"
+    assert keyword_filter.excluded_by("Clerkenwell, London EC1A 1BB") is None
+
+
+def test_empty_filter_keeps_everything():
+    assert KeywordFilter().excluded_by("Anywhere, London E1 6AA", "house share") is None
@@ -0,0 +1,70 @@
+import os
+import socket
+import stat
+import threading
+import pytest
+from floorplan_analyser import AreaAnswer, FloorplanAnalyser
+from model_server import FloorplanModelServer, RemoteFloorplanAnalyser, default_socket_path
+
+
+class StubAnalyser:
+    def extract_areas(self, question, image_paths, batch_size=8):
+        return {image_path: AreaAnswer(812.0, "regex") for image_path in image_paths}
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = FloorplanModelServer(str(tmp_path / "model.sock"), StubAnalyser())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_socket_is_private_to_the_user(server):
+    assert stat.S_IMODE(os.stat(server.socket_path).st_mode) == 0o600
+
+
+def test_client_uses_the_server(server):
+    analyser = RemoteFloorplanAnalyser(server.socket_path)
+    assert analyser.is_available()
+    answers = analyser.extract_areas("Total area?", ["plan.jpeg"])
+    assert answers == {"plan.jpeg": AreaAnswer(812.0, "regex")}
+
+
+def test_client_falls_back_to_local_inference_on_timeout(tmp_path, monkeypatch):
+    # Accepts connections but never answers, like a hung server
+    socket_path = str(tmp_path / "hung.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen()
+    local_calls = []
+
+    def extract_areas_locally(self, question, image_paths, batch_size=8, use_regex=True):
+        local_calls.append(image_paths)
+        return {image_path: AreaAnswer(650.0, "model") for image_path in image_paths}
+
+    monkeypatch.setattr(FloorplanAnalyser, "extract_areas", extract_areas_locally)
+    try:
+        analyser = RemoteFloorplanAnalyser(socket_path, timeout=0.2)
+        assert analyser.extract_areas("Total area?", ["plan.jpeg"]) == {"plan.jpeg": AreaAnswer(650.0, "model")}
+        # Later requests go straight to the local model
+        analyser.extract_areas("Total area?", ["other.jpeg"])
+        assert local_calls == [["plan.jpeg"], ["other.jpeg"]]
+    finally:
+        listener.close()
+
+
+def test_default_socket_path_is_per_user(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    assert default_socket_path() == str(tmp_path / "rightmove-floorplan-model.sock")
+
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    monkeypatch.setattr("tempfile.gettempdir", lambda: str(tmp_path))
+    directory = os.path.dirname(default_socket_path())
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+
+    os.chmod(directory, 0o777)
+    with pytest.raises(PermissionError):
+        default_socket_path()
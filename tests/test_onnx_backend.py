@@ -0,0 +1,75 @@
+"""
+Smoke tests of the ONNX backend on a small, randomly initialised LayoutLM question answering model, so that no model
+download or Tesseract is needed. They check that the export runs, that the quantised model's logits track the PyTorch
+model's, and that a pipeline switched to it still answers a question. The accuracy of the real model on floorplans is
+measured by benchmarks/onnx_accuracy.py.
+"""
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("onnxruntime")
+transformers = pytest.importorskip("transformers")
+
+from onnx_backend import OnnxQuestionAnsweringModel, export_quantized_model, use_onnx_model  # noqa: E402
+
+WORDS = ["kitchen", "bedroom", "total", "area", "approx", "650", "sq", "ft", "60", "m"]
+
+
+@pytest.fixture
+def tiny_model():
+    torch.manual_seed(0)
+    config = transformers.LayoutLMConfig(
+        vocab_size=len(WORDS) + 5,
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+    )
+    return transformers.LayoutLMForQuestionAnswering(config).eval()
+
+
+@pytest.fixture
+def tiny_tokenizer(tmp_path):
+    vocab_path = tmp_path / "vocab.txt"
+    vocab_path.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS) + "\n")
+    return transformers.LayoutLMTokenizerFast(vocab_file=str(vocab_path))
+
+
+def test_quantized_logits_track_pytorch(tiny_model, tmp_path):
+    model_path = export_quantized_model(tiny_model, str(tmp_path / "onnx"))
+    onnx_model = OnnxQuestionAnsweringModel(model_path, tiny_model.config)
+
+    # A longer batch than the export example, to exercise the dynamic axes
+    inputs = {
+        "input_ids": torch.randint(0, tiny_model.config.vocab_size, (2, 24)),
+        "bbox": torch.randint(0, 500, (2, 24, 2)).repeat(1, 1, 2),
+        "attention_mask": torch.ones((2, 24), dtype=torch.long),
+        "token_type_ids": torch.zeros((2, 24), dtype=torch.long),
+    }
+    with torch.no_grad():
+        expected = tiny_model(**inputs)
+    actual = onnx_model(**inputs)
+
+    for name in ("start_logits", "end_logits"):
+        assert actual[name].shape == expected[name].shape
+        error = (actual[name] - expected[name]).abs().mean()
+        assert error < 0.1 * expected[name].std()
+
+
+def test_pipeline_answers_with_onnx_model(tiny_model, tiny_tokenizer, tmp_path):
+    from PIL import Image
+
+    qa_pipeline = transformers.pipeline(
+        task="document-question-answering", model=tiny_model, tokenizer=tiny_tokenizer
+    )
+    use_onnx_model(qa_pipeline, str(tmp_path / "onnx"))
+    assert isinstance(qa_pipeline.model, OnnxQuestionAnsweringModel)
+
+    word_boxes = [(word, [index * 90, 100, index * 90 + 80, 120]) for index, word in enumerate(WORDS)]
+    answers = qa_pipeline(
+        [{"image": Image.new("RGB", (1000, 200), "white"), "question": "total area sq ft", "word_boxes": word_boxes}]
+    )
+    answer = answers[0][0] if isinstance(answers[0], list) else answers[0]
+    assert answer["answer"] in " ".join(WORDS)
+    assert 0.0 <= answer["score"] <= 1.0
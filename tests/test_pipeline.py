@@ -0,0 +1,56 @@
+import threading
+import time
+from pipeline import Stage, StreamingPipeline
+
+
+def pipeline_threads():
+    return [thread for thread in threading.enumerate() if thread.name.startswith("pipeline-")]
+
+
+def test_bad_item_does_not_discard_its_batch():
+    def check(batch):
+        if any(item == 3 for item in batch):
+            raise ValueError("bad item")
+        return [item for item in batch if item % 2 == 0]
+
+    stage = Stage("check", check, batch_size=4, batch_timeout=0.05)
+    passed = list(StreamingPipeline([stage]).run(range(8)))
+
+    assert sorted(passed) == [0, 2, 4, 6]
+    assert (stage.received, stage.passed, stage.errors) == (8, 4, 1)
+
+
+def test_stages_pass_items_in_batches():
+    batches = []
+
+    def record(batch):
+        batches.append(len(batch))
+        return batch
+
+    stages = [Stage("first", lambda batch: batch, workers=2), Stage("second", record, batch_size=5, batch_timeout=1.0)]
+    assert sorted(StreamingPipeline(stages, queue_size=2).run(range(20))) == list(range(20))
+    assert sum(batches) == 20 and max(batches) == 5
+
+
+def test_abandoned_run_stops_its_threads():
+    closed = threading.Event()
+
+    def source():
+        try:
+            for item in range(10_000):
+                yield item
+        finally:
+            closed.set()
+
+    pipeline = StreamingPipeline([Stage("pass", lambda batch: batch, workers=2)], queue_size=2)
+    items = pipeline.run(source())
+    assert next(items) is not None
+    # Every queue is full and every thread blocked on one when the caller gives up
+    time.sleep(0.2)
+    items.close()
+
+    deadline = time.monotonic() + 5
+    while pipeline_threads() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not pipeline_threads()
+    assert closed.is_set()
@@ -0,0 +1,69 @@
+import numpy as np
+from records import PropertyBatch
+
+
+def property_detail(url, price_pcm, bedrooms="2", area=None, has_floorplan=True, **fields):
+    return {
+        "url": url,
+        "price_pcm": price_pcm,
+        "bedrooms": bedrooms,
+        "bathrooms": "1",
+        "address": f"{url} Road, London",
+        "area": area,
+        "has_floorplan": has_floorplan,
+        **fields,
+    }
+
+
+def test_from_dicts_parses_and_marks_unknowns():
+    batch = PropertyBatch.from_dicts(
+        [
+            property_detail("a", "£2,500 pcm", area=812.0, within_travel_time="unknown"),
+            property_detail("b", "POA", bedrooms=None, borough="Hackney"),
+        ],
+        borough="Camden",
+    )
+    assert batch["price_pcm"].tolist() == [2500, -1]
+    assert batch["bedrooms"].tolist() == [2, -1]
+    assert batch["area"][0] == 812.0 and np.isnan(batch["area"][1])
+    assert batch["within_travel_time"].tolist() == [-1, 1]
+    assert [batch.boroughs[code] for code in batch["borough"]] == ["Camden", "Hackney"]
+
+
+def test_filter_mask_keeps_unknown_values():
+    batch = PropertyBatch.from_dicts(
+        [
+            property_detail("cheap", "£1,200 pcm"),
+            property_detail("ok", "£2,000 pcm", bedrooms="3", area=800.0),
+            property_detail("dear", "£4,000 pcm"),
+            property_detail("unknown price", "POA", bedrooms=None, has_floorplan=False),
+            property_detail("small", "£2,000 pcm", area=500.0),
+            property_detail("no floorplan", "£2,000 pcm", has_floorplan=False),
+        ]
+    )
+    mask = batch.filter_mask(min_price=1500, max_price=3000, min_bedrooms=2, max_bedrooms=3, min_area=700)
+    assert batch["url"][mask].tolist() == ["ok", "unknown price", "no floorplan"]
+    assert batch.filter_mask().all()
+
+
+def test_sorted_for_output_orders_and_deduplicates():
+    batch = PropertyBatch.concat(
+        [
+            PropertyBatch.from_dicts(
+                [
+                    property_detail("b", "£2,000 pcm", area=700.0),
+                    property_detail("unknown", "POA"),
+                    property_detail("c", "£1,500 pcm"),
+                ],
+                borough="Camden",
+            ),
+            PropertyBatch.from_dicts(
+                [property_detail("a", "£2,000 pcm", area=900.0), property_detail("b", "£2,000 pcm", area=700.0)],
+                borough="Hackney",
+            ),
+        ]
+    )
+    output = batch.sorted_for_output()
+    # Price ascending, then area descending, unknown prices last, and the first of each URL kept
+    assert output["url"].tolist() == ["c", "a", "b", "unknown"]
+    assert [output.boroughs[code] for code in output["borough"]] == ["Camden", "Hackney", "Camden", "Camden"]
@@ -0,0 +1,40 @@
+import threading
+import time
+from rightmove_api import RightmoveSearchClient
+
+
+def shard_threads():
+    return [thread for thread in threading.enumerate() if thread.name.startswith("search-shard-")]
+
+
+def client_with_pages(pages_per_search):
+    client = RightmoveSearchClient()
+
+    def iter_result_pages(search_url, first_page=None):
+        for index in range(pages_per_search):
+            yield {"search": search_url, "properties": [index]}
+
+    client.iter_result_pages = iter_result_pages
+    return client
+
+
+def test_pages_every_search():
+    client = client_with_pages(5)
+    pages = list(client.iter_result_pages_many([("a", None), ("b", None), ("c", None)], workers=2))
+    assert sorted((page["search"], page["properties"][0]) for page in pages) == [
+        (search, index) for search in "abc" for index in range(5)
+    ]
+
+
+def test_closing_early_stops_the_workers():
+    client = client_with_pages(1000)
+    pages = client.iter_result_pages_many([("a", None), ("b", None), ("c", None)], workers=3)
+    next(pages)
+    # The workers fill the queue and block on it
+    time.sleep(0.2)
+    pages.close()
+
+    deadline = time.monotonic() + 5
+    while shard_threads() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not shard_threads()
@@ -0,0 +1,68 @@
+import pytest
+from rightmove_scraper import PRICE_STEPS, RightmoveScraper
+
+
+def split_fully(bounds):
+    """
+    Splits a search until no shard can be split further, as plan_search_shards does when every shard is too big.
+    """
+    halves = RightmoveScraper._split_shard(bounds)
+    if not halves:
+        return [bounds]
+    return [leaf for half in halves for leaf in split_fully(half)]
+
+
+def test_splits_bedrooms_first():
+    assert RightmoveScraper._split_shard(("1500", "3000", "1", "4")) == [
+        ("1500", "3000", "1", "2"),
+        ("1500", "3000", "3", "4"),
+    ]
+
+
+def test_splits_price_at_the_step_nearest_the_middle():
+    assert RightmoveScraper._split_shard(("1500", "3000", "2", "2")) == [
+        ("1500", "2250", "2", "2"),
+        ("2250", "3000", "2", "2"),
+    ]
+    # Limits that are not price steps themselves are kept as they are
+    assert RightmoveScraper._split_shard(("2400", "2900", "2", "2")) == [
+        ("2400", "2750", "2", "2"),
+        ("2750", "2900", "2", "2"),
+    ]
+
+
+def test_open_bedroom_range_splits_by_price():
+    assert RightmoveScraper._split_shard(("1000", "2000", "", "")) == [
+        ("1000", "1500", "", ""),
+        ("1500", "2000", "", ""),
+    ]
+
+
+def test_stops_when_no_price_step_is_left_inside_the_range():
+    assert RightmoveScraper._split_shard(("1200", "1250", "2", "2")) is None
+    assert RightmoveScraper._split_shard(("2000", "2200", "2", "2")) is None
+    assert RightmoveScraper._split_shard(("", "2000", "2", "2")) is None
+
+
+@pytest.mark.parametrize("bounds", [("1000", "3600", "1", "4"), ("2400", "2900", "0", "3"), ("100", "40000", "2", "2")])
+def test_shards_tile_the_search(bounds):
+    min_price, max_price, min_bedrooms, max_bedrooms = bounds
+    shards = split_fully(bounds)
+
+    # Bedroom ranges are disjoint and contiguous
+    bedroom_ranges = sorted({(int(shard[2]), int(shard[3])) for shard in shards})
+    assert bedroom_ranges[0][0] == int(min_bedrooms) and bedroom_ranges[-1][1] == int(max_bedrooms)
+    for (_, high), (low, _) in zip(bedroom_ranges, bedroom_ranges[1:]):
+        assert low == high + 1
+
+    for bedroom_range in bedroom_ranges:
+        bands = sorted(
+            (int(shard[0]), int(shard[1])) for shard in shards if (int(shard[2]), int(shard[3])) == bedroom_range
+        )
+        assert bands[0][0] == int(min_price) and bands[-1][1] == int(max_price)
+        for (_, high), (low, _) in zip(bands, bands[1:]):
+            # Inclusive limits: neighbouring bands share exactly one price, so nothing falls between them
+            assert low == high
+            assert low in PRICE_STEPS
+        for low, high in bands:
+            assert low < high
@@ -1,64 +1,200 @@
+import json
 import os
-import requests
 from requests.structures import CaseInsensitiveDict
-from geopy.geocoders import Nominatim
-from shapely.geometry import shape, Point
+import numpy as np
+import shapely
+from shapely.geometry import shape
+from shapely.geometry.base import BaseGeometry
+from shapely.strtree import STRtree
 from dotenv import load_dotenv
 import logging
-from typing import Union
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from geocoding import Geocoder, NominatimBackend
+from http_client import http_client
+from instrumentation import metrics
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 
 class IsochroneMapAnalyser:
-    def __init__(self, user_agent: str = "rightmove-filtering") -> None:
+    def __init__(
+        self,
+        user_agent: str = "rightmove-filtering",
+        geocoder: Optional[Geocoder] = None,
+        isoline_cache_directory: Optional[str] = None,
+    ) -> None:
         """
         Initialize the IsochroneMapAnalyser with a specific user agent.
 
         Args:
         user_agent (str): A user agent string for Nominatim geocoding service.
+        geocoder (Geocoder): Optional geocoder, e.g. with a persistent cache or an offline backend. Defaults to uncached Nominatim.
+        isoline_cache_directory (str): Optional directory where downloaded isolines are kept as GeoJSON and reused.
         """
         load_dotenv()
-        self.geolocator = Nominatim(user_agent=user_agent)
+        self.isoline_cache_directory = isoline_cache_directory
+        self.geocoder = geocoder or Geocoder(NominatimBackend(user_agent=user_agent))
         self.api_key = os.getenv("GEOAPIFY_ISOLINE_KEY")
         self.isochrone_map = None
+        self._components = None
+        self._component_tree = None
 
-    def create_isochrone_map(self, address: str, travel_time: int, mode: str = "approximated_transit") -> None:
+    def _isoline_cache_path(self, lat: float, lon: float, travel_time: int, mode: str) -> Optional[str]:
         """
-        Creates an isochrone map based on the given address, travel time, and mode of transport.
+        Returns the GeoJSON cache file for an isoline, or None if caching is disabled.
+        """
+        if not self.isoline_cache_directory:
+            return None
+        return os.path.join(self.isoline_cache_directory, f"{lat:.6f}_{lon:.6f}_{mode}_{travel_time}.geojson")
+
+    def fetch_isoline(self, lat: float, lon: float, travel_time: int, mode: str = "approximated_transit") -> BaseGeometry:
+        """
+        Fetches the isoline around a point from Geoapify, or from the on-disk cache if it was fetched before.
 
         Args:
-        address (str): The address to base the isochrone map on.
+        lat (float): Latitude of the origin.
+        lon (float): Longitude of the origin.
         travel_time (int): The travel time in seconds.
-        mode (str): The mode of transport, default is 'approximated_transit'.
+        mode (str): The mode of transport.
+
+        Returns:
+        BaseGeometry: The isoline geometry.
 
         Raises:
-        ValueError: If the address cannot be geocoded.
         ConnectionError: If the API call is unsuccessful.
         """
-        location = self.geolocator.geocode(address)
-        if not location:
-            raise ValueError(f"Unable to geocode address: {address}")
+        cache_path = self._isoline_cache_path(lat, lon, travel_time, mode)
+        if cache_path and os.path.exists(cache_path):
+            metrics.cache_lookup("isolines", 1, 0)
+            with open(cache_path, "r") as file:
+                return shape(json.load(file)["features"][0]["geometry"])
+        metrics.cache_lookup("isolines", 0, 1)
 
-        lat, lon = location.latitude, location.longitude
         url = f"https://api.geoapify.com/v1/isoline?lat={lat}&lon={lon}&type=time&mode={mode}&range={travel_time}&apiKey={self.api_key}"
 
         headers = CaseInsensitiveDict()
         headers["Accept"] = "application/json"
 
-        response = requests.get(url, headers=headers)
+        with metrics.timed("isoline_seconds"):
+            response = http_client.get(url, headers=headers)
+        metrics.increment("network_bytes_total", len(response.content), source="isoline")
         if response.status_code != 200:
             raise ConnectionError(f"Failed to fetch isochrone map: {response.text}")
 
-        self.isochrone_map = shape(response.json()["features"][0]["geometry"])
+        if cache_path:
+            os.makedirs(self.isoline_cache_directory, exist_ok=True)
+            with open(cache_path, "w") as file:
+                file.write(response.text)
+
+        return shape(response.json()["features"][0]["geometry"])
+
+    def _target_isoline(self, address: str, travel_time: int, mode: str) -> BaseGeometry:
+        """
+        Geocodes a target address and returns its isoline.
+        """
+        location = self.geocoder.geocode(address)
+        if not location:
+            raise ValueError(f"Unable to geocode address: {address}")
+
+        lat, lon = location
+        return self.fetch_isoline(lat, lon, travel_time, mode)
+
+    def create_isochrone_map(self, address: str, travel_time: int, mode: str = "approximated_transit") -> None:
+        """
+        Creates an isochrone map based on the given address, travel time, and mode of transport.
+
+        Args:
+        address (str): The address to base the isochrone map on.
+        travel_time (int): The travel time in seconds.
+        mode (str): The mode of transport, default is 'approximated_transit'.
+
+        Raises:
+        ValueError: If the address cannot be geocoded.
+        ConnectionError: If the API call is unsuccessful.
+        """
+        self.set_isochrone_map(self._target_isoline(address, travel_time, mode))
+
+    def create_combined_isochrone_map(self, targets: List[Dict], match: str = "all") -> None:
+        """
+        Creates one isochrone map covering several commute targets, so each property is tested against a single geometry.
+
+        Args:
+        targets (List[Dict]): Commute targets, each with a "location", a "travel_time" in seconds and an optional "mode".
+        match (str): "all" to require every target to be within reach (intersection), "any" for at least one (union).
+
+        Raises:
+        ValueError: If match is not "all" or "any", there are no targets, or a target cannot be geocoded.
+        ConnectionError: If an API call is unsuccessful.
+        """
+        if match not in ("all", "any"):
+            raise ValueError(f"Unknown commute match: {match}")
+        if not targets:
+            raise ValueError("No commute targets provided.")
+
+        isolines = [
+            self._target_isoline(target["location"], target["travel_time"], target.get("mode", "approximated_transit"))
+            for target in targets
+        ]
+        combined = shapely.intersection_all(isolines) if match == "all" else shapely.union_all(isolines)
+        if combined.is_empty:
+            logging.warning("Commute targets have no area in common. No property will be within travel time.")
+        self.set_isochrone_map(combined)
+
+    def set_isochrone_map(self, geometry: BaseGeometry) -> None:
+        """
+        Sets the isochrone map and indexes it for fast point-in-polygon tests.
+
+        Isolines are large multipolygons, so each component polygon is prepared once and an STRtree over the components
+        lets a point be tested only against the components whose bounding box contains it.
 
-    def is_within_isochrone(self, address: str) -> Union[bool, str]:
+        Args:
+        geometry (BaseGeometry): The isochrone polygon or multipolygon.
+        """
+        self.isochrone_map = geometry
+        self._components = np.array(shapely.get_parts(geometry))
+        shapely.prepare(self._components)
+        self._component_tree = STRtree(self._components)
+
+    def contains_many(self, lons: Sequence[float], lats: Sequence[float]) -> np.ndarray:
+        """
+        Checks many points against the isochrone map in one vectorised call.
+
+        Args:
+        lons (Sequence[float]): Longitudes of the points.
+        lats (Sequence[float]): Latitudes of the points.
+
+        Returns:
+        np.ndarray: Boolean array, True where the point is within the isochrone map.
+
+        Raises:
+        ValueError: If the isochrone map is not yet created.
+        """
+        if self.isochrone_map is None:
+            raise ValueError("Isochrone map not created. Call create_isochrone_map first.")
+
+        lons = np.asarray(lons, dtype=float)
+        lats = np.asarray(lats, dtype=float)
+        within = np.zeros(lons.shape, dtype=bool)
+        if not lons.size:
+            return within
+
+        # Candidate (point, component) pairs whose bounding boxes intersect
+        point_indices, component_indices = self._component_tree.query(shapely.points(lons, lats))
+        for component_index in np.unique(component_indices):
+            candidates = point_indices[component_indices == component_index]
+            within[candidates] |= shapely.contains_xy(
+                self._components[component_index], lons[candidates], lats[candidates]
+            )
+        return within
+
+    def is_within_isochrone(self, address: str, location: Optional[Tuple[float, float]] = None) -> Union[bool, str]:
         """
         Checks if the given address is within the previously created isochrone map.
 
         Args:
         address (str): The address to check.
+        location (Tuple[float, float]): The (latitude, longitude) of the address, if known. Otherwise it is geocoded.
 
         Returns:
         bool or str: True if within the isochrone map, False if not, 'unknown' if address cannot be geocoded.
@@ -66,13 +202,79 @@ class IsochroneMapAnalyser:
         Raises:
         ValueError: If the isochrone map is not yet created.
         """
-        if not self.isochrone_map:
+        if self.isochrone_map is None:
             raise ValueError("Isochrone map not created. Call create_isochrone_map first.")
 
-        location = self.geolocator.geocode(address)
+        if location is None:
+            location = self.geocoder.geocode(address)
         if not location:
-            logging.info(f"Unable to geocode address: {address}")
             return "unknown"
 
-        point = Point(location.longitude, location.latitude)
-        return self.isochrone_map.contains(point)
+        return bool(self.contains_many([location[1]], [location[0]])[0])
+
+    def is_within_isochrone_many(self, addresses: Iterable[str]) -> Dict[str, Union[bool, str]]:
+        """
+        Checks many addresses against the isochrone map, geocoding them in one deduplicated batch.
+
+        Args:
+        addresses (Iterable[str]): The addresses to check.
+
+        Returns:
+        Dict[str, Union[bool, str]]: True, False or 'unknown' for each address, as for is_within_isochrone.
+
+        Raises:
+        ValueError: If the isochrone map is not yet created.
+        """
+        if self.isochrone_map is None:
+            raise ValueError("Isochrone map not created. Call create_isochrone_map first.")
+
+        locations = self.geocoder.geocode_many(addresses)
+        geocoded = [address for address, location in locations.items() if location]
+        within = self.contains_many(
+            [locations[address][1] for address in geocoded], [locations[address][0] for address in geocoded]
+        )
+
+        results: Dict[str, Union[bool, str]] = {address: "unknown" for address in locations}
+        results.update({address: bool(is_within) for address, is_within in zip(geocoded, within)})
+        return results
+
+    def is_within_isochrone_located(
+        self, addresses: Sequence[str], locations: Sequence[Optional[Tuple[float, float]]]
+    ) -> List[Union[bool, str]]:
+        """
+        Checks many properties against the isochrone map, using their coordinates where known.
+
+        Only the addresses without coordinates are geocoded, in one deduplicated batch, so properties whose listing gives
+        their coordinates are checked without any network requests.
+
+        Args:
+        addresses (Sequence[str]): The addresses of the properties.
+        locations (Sequence[Optional[Tuple[float, float]]]): The (latitude, longitude) of each property, or None.
+
+        Returns:
+        List[Union[bool, str]]: True, False or 'unknown' for each property, in order, as for is_within_isochrone.
+
+        Raises:
+        ValueError: If the isochrone map is not yet created.
+        """
+        if self.isochrone_map is None:
+            raise ValueError("Isochrone map not created. Call create_isochrone_map first.")
+
+        missing = [address for address, location in zip(addresses, locations) if location is None]
+        metrics.increment("travel_locations_total", len(addresses) - len(missing), source="listing")
+        if missing:
+            metrics.increment("travel_locations_total", len(missing), source="geocoded")
+            geocoded = self.geocoder.geocode_many(missing)
+            locations = [
+                geocoded[address] if location is None else location for address, location in zip(addresses, locations)
+            ]
+
+        located = [index for index, location in enumerate(locations) if location]
+        within = self.contains_many(
+            [locations[index][1] for index in located], [locations[index][0] for index in located]
+        )
+
+        results: List[Union[bool, str]] = ["unknown"] * len(addresses)
+        for index, is_within in zip(located, within):
+            results[index] = bool(is_within)
+        return results
@@ -0,0 +1,269 @@
+import argparse
+import heapq
+import logging
+import os
+import random
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List
+from http_client import configure_http_client, http_client
+from instrumentation import metrics
+from main import (
+    create_driver_pool,
+    create_floorplan_analyser,
+    create_floorplan_downloader,
+    create_inference_executor,
+    create_listing_store,
+    create_location_cache,
+    create_travel_analyser,
+    load_config,
+    process_borough,
+)
+from rightmove_api import RightmoveSearchClient, property_id_from_url
+from sinks import create_sinks
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+
+class InFlightListings:
+    def __init__(self) -> None:
+        """
+        Initialize a watcher-wide record of the listings being evaluated by a poll that has not finished yet.
+
+        The listing store asks for any listing without an outcome to be evaluated, which includes listings another
+        borough's poll is evaluating at that moment. Claiming listings here means overlapping polls evaluate and report
+        each one once. Claims are released when their poll finishes, by which time the store has its outcome, or it has
+        none and the next poll tries it again. The record is safe to share between threads.
+        """
+        self._claimed = set()
+        self._lock = threading.Lock()
+
+    def claim(self, property_id: str) -> bool:
+        """
+        Claims a listing for the calling poll.
+
+        Returns:
+        bool: True if no running poll had claimed the listing.
+        """
+        with self._lock:
+            if property_id in self._claimed:
+                return False
+            self._claimed.add(property_id)
+            return True
+
+    def release(self, property_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._claimed.difference_update(property_ids)
+
+    def poll(self) -> "PollClaims":
+        return PollClaims(self)
+
+
+class PollClaims:
+    def __init__(self, in_flight: InFlightListings) -> None:
+        """
+        Initialize the claims of one poll, used in place of SeenListings by process_borough.
+
+        Args:
+        in_flight (InFlightListings): The listings claimed by every running poll.
+        """
+        self.in_flight = in_flight
+        self._claimed = set()
+        self.duplicates = 0
+
+    def first_sighting(self, property_detail: Dict, location: str = "") -> bool:
+        """
+        Claims a listing found in the search results.
+
+        Returns:
+        bool: True if no running poll, this one included, has claimed the listing.
+        """
+        property_id = property_id_from_url(property_detail["url"])
+        if property_id in self._claimed:
+            metrics.increment("rejections_total", stage="search", reason="duplicate")
+            return False
+        if not self.in_flight.claim(property_id):
+            self.duplicates += 1
+            metrics.increment("rejections_total", stage="search", reason="in_flight")
+            return False
+        self._claimed.add(property_id)
+        return True
+
+    def release(self) -> None:
+        self.in_flight.release(self._claimed)
+        self._claimed.clear()
+
+    def __len__(self) -> int:
+        return len(self._claimed)
+
+
+class Watcher:
+    def __init__(self, config: dict) -> None:
+        """
+        Initialize a long-running watch over every borough in the config.
+
+        The models, Chrome sessions, caches and connection pools are created once and kept warm between polls. Each
+        borough is polled on its own interval, with jitter so that polls do not line up, and only listings the listing
+        store has not evaluated at their current price go through the filter stages. Each property that passes is
+        handed to the sinks as soon as its outcome is recorded.
+
+        Args:
+        config (dict): The loaded config, with its `watch` settings.
+        """
+        self.config = config
+        watch_settings = config.get("watch", {})
+        self.poll_minutes = watch_settings.get("poll_minutes", 10)
+        self.jitter = watch_settings.get("jitter", 0.2)
+        self.borough_poll_minutes = watch_settings.get("borough_poll_minutes") or {}
+        self.sinks = create_sinks(watch_settings.get("sinks") or [])
+        self.report_directory = config.get("instrumentation", {}).get("report_directory")
+
+        os.makedirs(config["images_directory"], exist_ok=True)
+        configure_http_client(config.get("http"))
+        self.floorplan_analyser = create_floorplan_analyser(config)
+        self.floorplan_downloader = create_floorplan_downloader(config)
+        self.travel_analyser = create_travel_analyser(config)
+        self.driver_pool = create_driver_pool(config)
+        self.search_client = RightmoveSearchClient()
+        self.location_cache = create_location_cache(config)
+        self.listing_store = create_listing_store(config)
+        self.inference_executor = create_inference_executor(config, self.floorplan_analyser)
+        self.in_flight = InFlightListings()
+        self.stopping = threading.Event()
+
+    def interval(self, borough: str) -> float:
+        """
+        Returns the seconds until a borough's next poll: its poll interval, varied by up to the jitter either way.
+        """
+        minutes = self.borough_poll_minutes.get(borough, self.poll_minutes)
+        return minutes * 60 * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def emit(self, property_detail: Dict) -> None:
+        metrics.increment("watch_matches_total", borough=property_detail.get("borough", ""))
+        logging.info(f"New match: {property_detail['url']} ({property_detail.get('price_pcm')})")
+        for sink in self.sinks:
+            # One failing sink must not stop the others, nor the poll
+            try:
+                sink.emit(property_detail)
+            except Exception as e:
+                logging.error(f"Sink {sink.name} failed on {property_detail['url']}: {e}")
+
+    def poll(self, borough: str) -> int:
+        """
+        Searches a borough and runs its new listings through the filter stages.
+
+        Returns:
+        int: Number of new matches.
+        """
+        claims = self.in_flight.poll()
+        try:
+            with metrics.timed("watch_poll_seconds", borough=borough):
+                matches = process_borough(
+                    borough,
+                    self.config,
+                    self.driver_pool,
+                    self.search_client,
+                    self.location_cache,
+                    self.floorplan_analyser,
+                    self.travel_analyser,
+                    inference_executor=self.inference_executor,
+                    listing_store=self.listing_store,
+                    incremental=True,
+                    seen_listings=claims,
+                    floorplan_downloader=self.floorplan_downloader,
+                    on_accepted=self.emit,
+                )
+        finally:
+            claims.release()
+        if claims.duplicates:
+            logging.info(f"Skipped {claims.duplicates} listings in {borough} already being evaluated by another poll.")
+        return len(matches)
+
+    def run(self, once: bool = False) -> None:
+        """
+        Polls every borough until stopped, each borough at most once at a time.
+
+        Args:
+        once (bool): Poll every borough once, then return.
+        """
+        boroughs: List[str] = list(self.config["london_boroughs"])
+        # Heap of (due time, borough); every borough is due straight away
+        schedule = [(time.monotonic(), borough) for borough in boroughs]
+        heapq.heapify(schedule)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.driver_pool.size) as executor:
+            while not self.stopping.is_set() and (schedule or running):
+                now = time.monotonic()
+                while schedule and schedule[0][0] <= now and len(running) < self.driver_pool.size:
+                    _, borough = heapq.heappop(schedule)
+                    running[executor.submit(self.poll, borough)] = borough
+
+                # Wake when the next borough is due, a poll finishes, or at least every second to notice a stop request
+                timeout = 1.0
+                if schedule and len(running) < self.driver_pool.size:
+                    timeout = min(max(schedule[0][0] - now, 0), timeout)
+                if not running:
+                    self.stopping.wait(timeout)
+                    continue
+                done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    borough = running.pop(future)
+                    try:
+                        matches = future.result()
+                        logging.info(f"Polled {borough}: {matches} new matches.")
+                    except Exception as e:
+                        logging.error(f"Error polling {borough}: {e}")
+                    if not once:
+                        heapq.heappush(schedule, (time.monotonic() + self.interval(borough), borough))
+                if done and self.report_directory:
+                    metrics.write_report(self.report_directory, name="watch_report")
+
+            if running:
+                logging.info(f"Waiting for {len(running)} running polls to finish.")
+
+    def stop(self, *_) -> None:
+        logging.info("Stopping after the running polls finish.")
+        self.stopping.set()
+
+    def close(self) -> None:
+        self.driver_pool.close()
+        http_client.close()
+        self.location_cache.close()
+        if self.travel_analyser is not None:
+            self.travel_analyser.geocoder.close()
+        self.listing_store.close()
+        self.floorplan_downloader.close()
+        if self.inference_executor is not None:
+            self.inference_executor.shutdown()
+        for sink in self.sinks:
+            sink.close()
+        metrics.log_summary()
+        if self.report_directory:
+            metrics.write_report(self.report_directory, name="watch_report")
+
+
+def main(config_file: str = "config.yaml", once: bool = False) -> None:
+    watcher = Watcher(load_config(config_file))
+    signal.signal(signal.SIGTERM, watcher.stop)
+    try:
+        watcher.run(once=once)
+    except KeyboardInterrupt:
+        watcher.stop()
+    finally:
+        watcher.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Poll each borough on its own schedule and report new matches as they are found.")
+    parser.add_argument("--config", default="config.yaml", help="Path to the config file.")
+    parser.add_argument("--once", action="store_true", help="Poll every borough once, then exit.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.config, once=args.once)